@@ -0,0 +1,211 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: Bit-sliced Hamming encoder/decoder.  Batches of messages are 
+transposed so that each 64-bit word holds the same bit position of 64 
+different messages ("slices").  Every parity bit, syndrome bit and correction 
+then becomes a few XOR/AND operations on whole words, handling 64 codes at a 
+time.
+"""
+import math
+import numpy as np
+import Utilities as utils
+
+def sliceBits(Rows):
+    """
+    Transposes a batch of bit vectors (one per row) into bit slices.
+
+    Parameters
+    ----------
+    Rows : 2D array
+        N vectors of m bits each, one per row, as 1s and 0s.
+
+    Returns
+    -------
+    Slices : 2D NumPy array (uint64)
+        Shape (m, ceil(N/64)): bit b of Slices[j, w] is bit j of row 64w+b.  
+        Missing rows at the end are 0.
+
+    """
+    Rows = np.asarray(Rows, dtype=np.uint8)
+    NumRows, NumCols = Rows.shape
+    NumWords = -(-NumRows // 64)
+    Padded = np.zeros((NumCols, NumWords*64), dtype=np.uint8)
+    Padded[:, :NumRows] = Rows.T
+    return np.packbits(Padded, axis=1, bitorder='little').view('<u8').astype(np.uint64)
+
+def unsliceBits(Slices, NumRows):
+    """
+    Inverse of sliceBits.
+
+    Parameters
+    ----------
+    Slices : 2D NumPy array (uint64)
+        The bit slices, shape (m, words).
+    NumRows : integer
+        The number of vectors to recover.
+
+    Returns
+    -------
+    Rows : 2D NumPy array (uint8)
+        The vectors, one per row, shape (NumRows, m).
+
+    """
+    Bytes = np.ascontiguousarray(Slices, dtype='<u8').view(np.uint8)
+    return np.ascontiguousarray(np.unpackbits(Bytes, axis=1, bitorder='little')[:, :NumRows].T)
+
+def encodeSliced(Slices):
+    """
+    Encodes bit-sliced messages: data slices are copied to their positions, 
+    and each parity slice is the XOR of the data slices its row of the 
+    G-matrix selects.
+
+    Parameters
+    ----------
+    Slices : 2D NumPy array (uint64)
+        The sliced messages, shape (data bits, words).
+
+    Returns
+    -------
+    Codes : 2D NumPy array (uint64)
+        The sliced codes, shape (code bits, words).
+
+    """
+    NumBits, NumWords = Slices.shape
+    Tables = utils.getCodeTables(NumBits)
+    GMatrix = Tables[('GArray', NumBits)]
+    Width, Height = utils.getHMatrixShape(None, NumBits)
+    Codes = np.zeros((Width, NumWords), dtype=np.uint64)
+    Codes[Tables[('DataIndex', Width)]] = Slices
+    for i in range(Height):
+        Codes[2**i - 1] = np.bitwise_xor.reduce(Slices[np.flatnonzero(GMatrix[2**i - 1])], axis=0)
+    return Codes
+
+def syndromeSliced(Codes):
+    """
+    Calculates the syndromes of bit-sliced codes: syndrome slice i is the XOR 
+    of the code slices whose position has bit i set.
+
+    Parameters
+    ----------
+    Codes : 2D NumPy array (uint64)
+        The sliced received codes, shape (code bits, words).
+
+    Returns
+    -------
+    Syndromes : 2D NumPy array (uint64)
+        The sliced syndromes, shape (parity bits, words).
+
+    """
+    Width = Codes.shape[0]
+    Height = math.ceil(math.log2(Width + 1))
+    Positions = np.arange(1, Width + 1)
+    return np.stack([np.bitwise_xor.reduce(Codes[np.flatnonzero((Positions >> i) & 1)], axis=0)
+                     for i in range(Height)])
+
+def correctSliced(Codes, Syndromes):
+    """
+    Corrects bit-sliced codes in place.  The error mask of position p is the 
+    AND, over the syndrome bits, of the syndrome slice (where p has that bit 
+    set) or its complement (where it does not) - it marks the codes whose 
+    syndrome equals p.
+
+    Parameters
+    ----------
+    Codes : 2D NumPy array (uint64)
+        The sliced received codes.  Modified in place.
+    Syndromes : 2D NumPy array (uint64)
+        Their sliced syndromes, from syndromeSliced.
+
+    Returns
+    -------
+    Corrected : 1D NumPy array (uint64)
+        Bit b of word w is set when code 64w+b had a bit corrected.
+
+    """
+    Inverted = ~Syndromes
+    Corrected = np.zeros(Codes.shape[1], dtype=np.uint64)
+    for Position in range(1, Codes.shape[0] + 1):
+        Mask = np.bitwise_and.reduce([Syndromes[i] if (Position >> i) & 1 else Inverted[i]
+                                      for i in range(len(Syndromes))])
+        Codes[Position - 1] ^= Mask
+        Corrected |= Mask
+    return Corrected
+
+def decodeSliced(Codes):
+    """
+    Picks the data slices out of bit-sliced (corrected) codes.
+
+    Parameters
+    ----------
+    Codes : 2D NumPy array (uint64)
+        The sliced codes, shape (code bits, words).
+
+    Returns
+    -------
+    Slices : 2D NumPy array (uint64)
+        The sliced messages, shape (data bits, words).
+
+    """
+    return Codes[utils.genDataIndex(Codes.shape[0])]
+
+def encodeBatchSliced(Messages):
+    """
+    Bit-sliced version of Utilities.genXMatrixBatch, with the same result.
+
+    Parameters
+    ----------
+    Messages : 2D array
+        The original messages, one per row.
+
+    Returns
+    -------
+    XMatrix : 2D NumPy array (uint8)
+        The coded messages, one per row.
+
+    """
+    Messages = np.asarray(Messages, dtype=np.uint8)
+    return unsliceBits(encodeSliced(sliceBits(Messages)), Messages.shape[0])
+
+def decodeBatchSliced(Recvd):
+    """
+    Bit-sliced version of Utilities.decodeBatch (except that Recvd is not 
+    corrected in place).
+
+    Parameters
+    ----------
+    Recvd : 2D array
+        The received messages, one per row.
+
+    Returns
+    -------
+    Decoded : 2D NumPy array (uint8)
+        The decoded original messages, one per row.
+    Corrected : 1D NumPy array (bool)
+        True for every row in which a bit error was corrected.
+
+    """
+    Recvd = np.asarray(Recvd, dtype=np.uint8)
+    NumRows = Recvd.shape[0]
+    Codes = sliceBits(Recvd)
+    Corrected = correctSliced(Codes, syndromeSliced(Codes))
+    Decoded = unsliceBits(decodeSliced(Codes), NumRows)
+    return Decoded, unsliceBits(Corrected[None, :], NumRows)[:, 0].astype(bool)
@@ -0,0 +1,218 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: Vectorized transmission channel models - the batch counterparts 
+of Utilities.genPossibleTransError.  Every channel has the signature 
+Channel(Shape, Rng, ...) and returns an error mask (uint8, 1 where a bit is 
+flipped) of the given shape, so it can be bound with functools.partial and 
+passed to the functions in Simulation.py.  The block interleaver that sits 
+between encoding and the channel is also defined here.
+"""
+import numpy as np
+
+def binarySymmetricChannel(Shape, Rng, FlipProb):
+    """
+    Binary symmetric channel: every bit is flipped independently with 
+    probability FlipProb.
+
+    Parameters
+    ----------
+    Shape : tuple
+        The shape of the transmitted block of codes, (codes, bits per code).
+    Rng : numpy.random.Generator
+        The random number generator to draw from.
+    FlipProb : float
+        The probability that a bit is flipped.
+
+    Returns
+    -------
+    Errors : NumPy array (uint8)
+        The error mask.
+
+    """
+    return (Rng.random(Shape) < FlipProb).view(np.uint8)
+
+def sparseBinarySymmetricChannel(NumCodes, CodeBits, Rng, FlipProb):
+    """
+    Sparse binary symmetric channel: returns only where the bit errors are, 
+    rather than a full error mask.  The total number of flips is drawn from 
+    the binomial distribution and their positions uniformly without 
+    replacement, which is the same distribution as flipping every bit 
+    independently, at a cost that scales with the number of errors.
+
+    Parameters
+    ----------
+    NumCodes : integer
+        The number of codes transmitted.
+    CodeBits : integer
+        The number of bits per code.
+    Rng : numpy.random.Generator
+        The random number generator to draw from.
+    FlipProb : float
+        The probability that a bit is flipped.
+
+    Returns
+    -------
+    Rows : 1D NumPy array (int64)
+        The code each error belongs to, in increasing order.
+    ErrorBits : 1D NumPy array (int64)
+        The flipped bit number of each error, starting at position 1.
+
+    """
+    Length = NumCodes*CodeBits
+    NumErrors = Rng.binomial(Length, FlipProb)
+    Flat = np.sort(Rng.choice(Length, size=NumErrors, replace=False))
+    Rows, Bits = np.divmod(Flat, CodeBits)
+    return Rows, Bits + 1
+
+def fixedBurstChannel(Shape, Rng, BurstRate, BurstLength):
+    """
+    Fixed-length burst channel: a burst starts at each bit (in transmission 
+    order) with probability BurstRate, and flips that bit and the 
+    BurstLength-1 bits after it.  Overlapping bursts do not flip a bit back.
+
+    Parameters
+    ----------
+    Shape : tuple
+        The shape of the transmitted block of codes; bits are sent in C 
+        (row-major) order.
+    Rng : numpy.random.Generator
+        The random number generator to draw from.
+    BurstRate : float
+        The probability that a burst starts at any given bit.
+    BurstLength : integer
+        The number of bits flipped by each burst.
+
+    Returns
+    -------
+    Errors : NumPy array (uint8)
+        The error mask.
+
+    """
+    Length = int(np.prod(Shape))
+    Errors = np.zeros(Length, dtype=np.uint8)
+    Starts = np.flatnonzero(Rng.random(Length) < BurstRate)
+    if Starts.size and BurstLength > 0:
+        Positions = (Starts[:, None] + np.arange(BurstLength)).ravel()
+        Errors[Positions[Positions < Length]] = 1
+    return Errors.reshape(Shape)
+
+def gilbertElliottChannel(Shape, Rng, PGoodToBad, PBadToGood, FlipProbGood=0.0, FlipProbBad=0.5):
+    """
+    Gilbert-Elliott burst channel: a two-state (good/bad) Markov chain, with 
+    a low flip probability in the good state and a high one in the bad state.  
+    Rather than stepping the chain bit by bit, the lengths of the good and bad 
+    runs are drawn directly (they are geometric), so the whole block is 
+    generated with array operations.
+
+    Parameters
+    ----------
+    Shape : tuple
+        The shape of the transmitted block of codes; bits are sent in C 
+        (row-major) order.
+    Rng : numpy.random.Generator
+        The random number generator to draw from.
+    PGoodToBad : float
+        The probability of moving from the good to the bad state after a bit.
+    PBadToGood : float
+        The probability of moving from the bad to the good state after a bit.
+    FlipProbGood : float
+        The probability that a bit is flipped in the good state.
+    FlipProbBad : float
+        The probability that a bit is flipped in the bad state.
+
+    Returns
+    -------
+    Errors : NumPy array (uint8)
+        The error mask.
+
+    """
+    if not (0 < PGoodToBad <= 1 and 0 < PBadToGood <= 1):
+        raise ValueError("Transition probabilities must be in (0, 1]")
+    Length = int(np.prod(Shape))
+    #Start in the stationary distribution of the chain.
+    Bad = Rng.random() < PGoodToBad/(PGoodToBad + PBadToGood)
+    MeanPair = 1/PGoodToBad + 1/PBadToGood
+    RunLengths = []
+    Total = 0
+    while Total < Length:
+        NumPairs = int((Length - Total)/MeanPair) + 16
+        Runs = np.empty(2*NumPairs, dtype=np.int64)
+        #Runs alternate, starting with the current state; each chunk holds
+        #whole good/bad pairs, so the alternation carries over between chunks.
+        Runs[int(not Bad)::2] = Rng.geometric(PBadToGood, NumPairs)
+        Runs[int(Bad)::2] = Rng.geometric(PGoodToBad, NumPairs)
+        RunLengths.append(Runs)
+        Total = Total + int(Runs.sum())
+    Runs = np.concatenate(RunLengths)
+    States = np.zeros(len(Runs), dtype=bool)
+    States[int(not Bad)::2] = True
+    BadBits = np.repeat(States, Runs)[:Length]
+    FlipProbs = np.where(BadBits, FlipProbBad, FlipProbGood)
+    return (Rng.random(Length) < FlipProbs).view(np.uint8).reshape(Shape)
+
+def interleave(Codes, Depth):
+    """
+    Block interleaver: groups of Depth codes are sent column by column, so a 
+    burst of up to Depth bits hits each code at most once.  Returns a strided 
+    view, not a copy - flipping bits in the result (e.g. View ^= Errors) 
+    flips them in Codes.
+
+    Parameters
+    ----------
+    Codes : 2D NumPy array
+        The coded messages, one per row (C-contiguous, as from 
+        Utilities.genXMatrixBatch).  The number of rows must be a multiple of 
+        Depth.
+    Depth : integer
+        The interleaving depth (codes per group).  1 means no interleaving.
+
+    Returns
+    -------
+    Stream : 3D NumPy array
+        View of shape (groups, bits per code, Depth), whose C (row-major) 
+        order is the transmission order.
+
+    """
+    NumCodes, CodeBits = Codes.shape
+    if Depth <= 0 or NumCodes % Depth != 0:
+        raise ValueError("The number of codes must be a multiple of Depth")
+    return Codes.reshape(NumCodes//Depth, Depth, CodeBits).transpose(0, 2, 1)
+
+def deinterleave(Stream):
+    """
+    Inverse of interleave: turns an interleaved stream back into one code per 
+    row.  For a view made by interleave this is again a view; a contiguous 
+    received stream has to be copied once.
+
+    Parameters
+    ----------
+    Stream : 3D NumPy array
+        The interleaved stream, shape (groups, bits per code, Depth).
+
+    Returns
+    -------
+    Codes : 2D NumPy array
+        The coded messages, one per row.
+
+    """
+    Groups, CodeBits, Depth = Stream.shape
+    return Stream.transpose(0, 2, 1).reshape(Groups*Depth, CodeBits)
@@ -0,0 +1,294 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: Compiled Hamming codec.  The Utilities.py functions re-derive 
+the shape of the code from the message length on every call; a HammingCode 
+works all of that out once, so encoding or decoding a single (packed) block 
+is only a handful of integer operations.  For the common Hamming(7,4) case over 
+byte strings there is also a table-driven codec (encodeBytes74 and friends).
+"""
+import numpy as np
+import Utilities as utils
+
+#Bound here, as the encode and syndrome loops call it for every row.
+_popcount = utils._popcount
+
+class HammingCode:
+    """
+    The Hamming code for a fixed number of data bits, with everything needed 
+    to encode and decode precomputed.  Messages and codes are packed integers 
+    (see Utilities.packBits): bit i holds element i of the list form.
+
+    Attributes
+    ----------
+    NumBits : integer
+        The number of data bits per message.
+    Length : integer
+        The number of bits per code.
+    NumParity : integer
+        The number of parity bits per code.
+    DataIndex : tuple of integers
+        The index (starting at 0) of every data bit in a code.
+    Segments : tuple
+        The runs of consecutive data bits, as (message bit, code bit, mask) 
+        triples, used to scatter/gather data bits a run at a time.
+    GeneratorRows : tuple
+        The parity rows of the G-matrix, packed over the data bits, each with 
+        the mask of its parity bit in the code: the parity bit is set when 
+        (message AND row) has odd parity.
+    ParityMasks : tuple of integers
+        One packed mask per row of the H-matrix.
+
+    """
+    __slots__ = ('NumBits', 'Length', 'NumParity', 'DataIndex', 'Segments',
+                 'GeneratorRows', 'ParityMasks')
+
+    def __init__(self, NumBits):
+        if NumBits <= 0:
+            raise ValueError("NumBits must be positive")
+        self.NumBits = NumBits
+        self.Length, self.NumParity = utils.getHMatrixShape(None, NumBits)
+        self.DataIndex = tuple(utils.genDataIndex(self.Length).tolist())
+        Segments = []
+        for DataBit, CodeBit in enumerate(self.DataIndex):
+            if Segments and Segments[-1][1] + Segments[-1][2] == CodeBit:
+                Segments[-1][2] = Segments[-1][2] + 1
+            else:
+                Segments.append([DataBit, CodeBit, 1])
+        self.Segments = tuple((DataBit, CodeBit, (1 << Width) - 1)
+                              for DataBit, CodeBit, Width in Segments)
+        #Parity bit 2^i checks every data bit whose position has bit i set, 
+        #so its row of G is read straight off the data positions.
+        Positions = np.array(self.DataIndex, dtype=np.int64) + 1
+        self.GeneratorRows = tuple(
+            (int.from_bytes(np.packbits((Positions >> i) & 1, bitorder='little').tobytes(),
+                            'little'), 1 << (2**i - 1))
+            for i in range(self.NumParity))
+        self.ParityMasks = utils.genParityMasks(NumBits)
+
+    def __repr__(self):
+        return 'HammingCode(%d)' % self.NumBits
+
+    def encode(self, Message):
+        """
+        Encodes a packed message; the packed equivalent of Utilities.genXMatrix.
+
+        Parameters
+        ----------
+        Message : integer
+            The packed original message.
+
+        Returns
+        -------
+        Code : integer
+            The packed coded message.
+
+        """
+        Code = 0
+        for DataBit, CodeBit, Mask in self.Segments:
+            Code |= ((Message >> DataBit) & Mask) << CodeBit
+        for Row, ParityBit in self.GeneratorRows:
+            if _popcount(Message & Row) & 1:
+                Code |= ParityBit
+        return Code
+
+    def syndrome(self, Code):
+        """
+        Calculates the syndrome of a packed received code.
+
+        Parameters
+        ----------
+        Code : integer
+            The packed received code.
+
+        Returns
+        -------
+        Syndrome : integer
+            The syndrome, which is also the position of the bit in error 
+            (0 for none).
+
+        """
+        Syndrome = 0
+        Bit = 1
+        for Mask in self.ParityMasks:
+            if _popcount(Code & Mask) & 1:
+                Syndrome |= Bit
+            Bit <<= 1
+        return Syndrome
+
+    def correct(self, Code):
+        """
+        Corrects a single bit error in a packed received code.  A syndrome 
+        pointing past the end of the code is left alone.
+
+        Parameters
+        ----------
+        Code : integer
+            The packed received code.
+
+        Returns
+        -------
+        Code : integer
+            The corrected code.
+
+        """
+        Syndrome = self.syndrome(Code)
+        if 0 < Syndrome <= self.Length:
+            Code ^= 1 << (Syndrome - 1)
+        return Code
+
+    def decode(self, Code):
+        """
+        Gathers the data bits out of a packed (corrected) code; the packed 
+        equivalent of Utilities.decodeOriginalMessage.
+
+        Parameters
+        ----------
+        Code : integer
+            The packed error-corrected code.
+
+        Returns
+        -------
+        Message : integer
+            The packed original message.
+
+        """
+        Message = 0
+        for DataBit, CodeBit, Mask in self.Segments:
+            Message |= ((Code >> CodeBit) & Mask) << DataBit
+        return Message
+
+def _buildTables74():
+    """
+    Builds the lookup tables of the byte-oriented Hamming(7,4)/(8,4) codec 
+    from genXMatrix and calcSyndromeXor, so they match the generic code 
+    exactly.  A nibble's bits are taken most significant first (as by 
+    numpy.unpackbits), and code bit 1 is the most significant bit of the 
+    code byte; bit 0 of the byte is the overall parity bit of the extended 
+    (8,4) code, or 0 for (7,4).
+    """
+    Encode = np.zeros((2, 16), dtype=np.uint8)
+    for Nibble in range(16):
+        Code = utils.genXMatrix([(Nibble >> Shift) & 1 for Shift in (3, 2, 1, 0)])
+        Byte = int(np.packbits(Code)[0])
+        Encode[0, Nibble] = Byte
+        Encode[1, Nibble] = Byte | (sum(Code) & 1)
+    Decode = np.zeros((2, 256), dtype=np.uint8)
+    Status = np.zeros((2, 256), dtype=np.uint8)
+    for Byte in range(256):
+        Bits = np.unpackbits(np.array([Byte], dtype=np.uint8)).tolist()
+        Code = Bits[:7]
+        Syndrome = utils.calcSyndromeXor(Code)
+        utils.correctErrorInMessage(Code, Syndrome)
+        Nibble = 0
+        for Bit in utils.decodeOriginalMessage(Code):
+            Nibble = (Nibble << 1) | Bit
+        Decode[0, Byte] = Nibble
+        Status[0, Byte] = STATUS_CORRECTED if Syndrome else STATUS_OK
+        #Extended code: an overall parity error means a single (correctable)
+        #error; a syndrome with good overall parity means two errors.
+        if sum(Bits) & 1:
+            Decode[1, Byte] = Nibble
+            Status[1, Byte] = STATUS_CORRECTED
+        elif Syndrome:
+            Decode[1, Byte] = (Bits[2] << 3) | (Bits[4] << 2) | (Bits[5] << 1) | Bits[6]
+            Status[1, Byte] = STATUS_UNCORRECTABLE
+        else:
+            Decode[1, Byte] = Nibble
+    #Whole bytes: one data byte <-> two code bytes (high nibble first).
+    EncodePair = np.stack((np.repeat(Encode, 16, axis=1), np.tile(Encode, 16)), axis=2)
+    DecodePair = ((Decode[:, :, None] << 4) | Decode[:, None, :]).reshape(2, 65536)
+    for Table in (Encode, Decode, Status, EncodePair, DecodePair):
+        Table.flags.writeable = False
+    return Encode, Decode, Status, EncodePair, DecodePair
+
+STATUS_OK = 0
+STATUS_CORRECTED = 1
+STATUS_UNCORRECTABLE = 2
+
+ENCODE74, DECODE74, STATUS74, ENCODE74_PAIR, DECODE74_PAIR = _buildTables74()
+
+def encodeBytes74(Data, Extended=False):
+    """
+    Hamming(7,4) (or extended (8,4)) encodes a byte string with table 
+    lookups: each data byte becomes two code bytes, high nibble first.  The 
+    code bits are identical to genXMatrix of each nibble (see ENCODE74).
+
+    Parameters
+    ----------
+    Data : bytes-like
+        The data to encode (bytes, bytearray, memoryview, uint8 array).
+    Extended : boolean
+        Use the extended (8,4) code, with an overall parity bit.
+
+    Returns
+    -------
+    Encoded : bytes
+        The code bytes, twice as long as Data.
+
+    """
+    return ENCODE74_PAIR[int(Extended)].take(np.frombuffer(Data, dtype=np.uint8), axis=0).tobytes()
+
+def decodeBytes74(Data, Extended=False):
+    """
+    Corrects and decodes a byte string made by encodeBytes74, looking up each 
+    pair of code bytes in a 64K-entry table.  Errors the extended code 
+    detects but cannot correct are left in the data; use checkBytes74 to 
+    count them.
+
+    Parameters
+    ----------
+    Data : bytes-like
+        The code bytes (an even number of them).
+    Extended : boolean
+        Whether the extended (8,4) code was used.
+
+    Returns
+    -------
+    Decoded : bytes
+        The decoded data, half as long as Data.
+
+    """
+    Pairs = np.frombuffer(Data, dtype='>u2')
+    return DECODE74_PAIR[int(Extended)].take(Pairs).tobytes()
+
+def checkBytes74(Data, Extended=False):
+    """
+    Counts the code bytes in Data that had an error corrected, or (extended 
+    code only) an uncorrectable double error detected.
+
+    Parameters
+    ----------
+    Data : bytes-like
+        The code bytes.
+    Extended : boolean
+        Whether the extended (8,4) code was used.
+
+    Returns
+    -------
+    Counts : dictionary
+        The number of 'corrected' and 'uncorrectable' code bytes.
+
+    """
+    Counts = np.bincount(STATUS74[int(Extended)].take(np.frombuffer(Data, dtype=np.uint8)),
+                         minlength=3)
+    return {'corrected': int(Counts[STATUS_CORRECTED]),
+            'uncorrectable': int(Counts[STATUS_UNCORRECTABLE])}
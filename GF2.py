@@ -0,0 +1,185 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: GF(2) linear algebra on bit-packed rows.  Matrix-matrix products 
+use the Method of Four Russians: the rows of the right-hand matrix are taken 
+8 at a time, all 256 XOR combinations of them are tabulated, and each row of 
+the product then needs one table lookup per 8 columns of the left-hand matrix 
+instead of 8 row additions.  Matrix-vector products AND packed rows with the 
+packed vector and take the parity of the result.
+"""
+import numpy as np
+
+#Parity of every byte value.
+_PARITY8 = (np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1) & 1).astype(np.uint8)
+_PARITY8.flags.writeable = False
+
+def packRows(Matrix):
+    """
+    Packs the rows of a 0/1 matrix, 8 bits per byte.
+
+    Parameters
+    ----------
+    Matrix : 2D array
+        The matrix, as 1s and 0s.
+
+    Returns
+    -------
+    Packed : 2D NumPy array (uint8)
+        The packed rows, shape (rows, ceil(columns/8)); bit j of a row is 
+        the (j % 8)-th most significant bit of byte j // 8.
+
+    """
+    return np.packbits(np.asarray(Matrix, dtype=np.uint8), axis=1)
+
+def multiplyVector(Packed, Vector, Width=None):
+    """
+    GF(2) matrix-vector product, Matrix x Vector, using packed rows.
+
+    Parameters
+    ----------
+    Packed : 2D NumPy array (uint8)
+        The matrix, packed with packRows.
+    Vector : 1D array (vector)
+        The vector, as 1s and 0s.
+    Width : integer, optional
+        The number of columns of the matrix.  The vector must have exactly 
+        this length; without it, the length is only checked against the 
+        number of packed bytes per row.
+
+    Returns
+    -------
+    Product : 1D NumPy array (uint8)
+        The product, as 1s and 0s.
+
+    """
+    Vector = np.asarray(Vector, dtype=np.uint8)
+    if Width is not None and len(Vector) != Width:
+        raise ValueError("Matrix shapes do not match")
+    PackedVector = np.packbits(Vector)
+    if len(PackedVector) != Packed.shape[1]:
+        raise ValueError("Matrix shapes do not match")
+    if Packed.shape[1] == 0:
+        return np.zeros(Packed.shape[0], dtype=np.uint8)
+    return _PARITY8[np.bitwise_xor.reduce(Packed & PackedVector, axis=1)]
+
+def multiply(Left, Right):
+    """
+    GF(2) matrix-matrix product, Left x Right, by the Method of Four Russians.
+
+    Parameters
+    ----------
+    Left : 2D array
+        The left-hand matrix (m x n), as 1s and 0s.
+    Right : 2D array
+        The right-hand matrix (n x p), as 1s and 0s.
+
+    Returns
+    -------
+    Product : 2D NumPy array (uint8)
+        The product (m x p), as 1s and 0s.
+
+    """
+    Right = np.asarray(Right, dtype=np.uint8)
+    return multiplyPacked(Left, packRows(Right), Right.shape[1])
+
+def _fillTable(Table, Rows):
+    """Fills Table[i] with the XOR of the Rows selected by the bits of i."""
+    for j in range(len(Rows)):
+        np.bitwise_xor(Table[:2**j], Rows[j], out=Table[2**j:2**(j+1)])
+
+def buildTables(Packed):
+    """
+    Tabulates the XOR of every combination of each group of 8 rows of a 
+    packed matrix - the lookup tables of the Four Russians product.  Building 
+    them costs about as much as a product of a few hundred rows, so a matrix 
+    used many times can have them built once and passed to multiplyPacked.
+
+    Parameters
+    ----------
+    Packed : 2D NumPy array (uint8)
+        The matrix (n x p), packed with packRows.
+
+    Returns
+    -------
+    Tables : 3D NumPy array (uint8)
+        Tables[c][i] is the XOR of the rows 8c..8c+7 selected by the bits of 
+        i, shape (ceil(n/8), 256, ceil(p/8)).
+
+    """
+    NumChunks = -(-Packed.shape[0] // 8)
+    Tables = np.zeros((NumChunks, 256, Packed.shape[1]), dtype=np.uint8)
+    for Chunk in range(NumChunks):
+        _fillTable(Tables[Chunk], Packed[8*Chunk:8*Chunk + 8])
+    return Tables
+
+def multiplyPacked(Left, Packed, Width, Out=None, Tables=None):
+    """
+    Version of multiply taking the right-hand matrix already packed, to save 
+    repacking a matrix (such as G or H) that is used many times.
+
+    Parameters
+    ----------
+    Left : 2D array
+        The left-hand matrix (m x n), as 1s and 0s.
+    Packed : 2D NumPy array (uint8)
+        The right-hand matrix (n x p), packed with packRows.
+    Width : integer
+        The number of columns, p, of the right-hand matrix.
+    Out : 2D NumPy array (uint8), optional
+        Where to unpack the product (m x p), instead of a new array.
+    Tables : 3D NumPy array (uint8), optional
+        The lookup tables of Packed, from buildTables.  Without them, they 
+        are built afresh for this product.
+
+    Returns
+    -------
+    Product : 2D NumPy array (uint8)
+        The product (m x p), as 1s and 0s (Out, if given).
+
+    """
+    Left = np.asarray(Left, dtype=np.uint8)
+    NumRows, Inner = Left.shape
+    if Packed.shape[0] != Inner:
+        raise ValueError("Matrix shapes do not match")
+    if Out is not None and Out.shape != (NumRows, Width):
+        raise ValueError("Out must have shape (%d, %d)" % (NumRows, Width))
+    #Byte c of a packed row of Left indexes the table of rows 8c..8c+7 of Right.
+    Indices = np.packbits(Left, axis=1, bitorder='little')
+    if Tables is not None and Tables.shape != (Indices.shape[1], 256, Packed.shape[1]):
+        raise ValueError("Tables do not match the matrix")
+    Product = np.zeros((NumRows, Packed.shape[1]), dtype=np.uint8)
+    Table = np.zeros((256, Packed.shape[1]), dtype=np.uint8) if Tables is None else None
+    for Chunk in range(Indices.shape[1]):
+        if Tables is None:
+            _fillTable(Table, Packed[8*Chunk:8*Chunk + 8])
+        else:
+            Table = Tables[Chunk]
+        Product ^= Table[Indices[:, Chunk]]
+    if Out is None:
+        return np.unpackbits(Product, axis=1, count=Width)
+    #Column 8c+b of the product is bit b (from the top) of byte c.
+    Shifted = np.empty_like(Product)
+    for Bit in range(min(8, Width)):
+        Columns = Out[:, Bit::8]
+        np.right_shift(Product[:, :Columns.shape[1]], 7 - Bit, out=Shifted[:, :Columns.shape[1]])
+        np.bitwise_and(Shifted[:, :Columns.shape[1]], 1, out=Columns)
+    return Out
@@ -26,8 +26,15 @@ Created on Sun Jan 31 15:36:48 2021
 @description: Error detection and correction simulator.  Used to demonstrate
 the Hamming parity check method.
 """
+import argparse
+import asyncio
+import sys
 import Utilities as utils
 import UI as ui
+import Streaming
+import Parallel
+import Service
+import Instrumentation
 
 def Hamming():
     """The main method called to run the program."""
@@ -51,4 +58,157 @@ def Hamming():
     
     return 0
 
-Hamming()
\ No newline at end of file
+def HammingStream(Args):
+    """
+    Runs the streaming encoder/decoder selected on the command line.
+
+    Parameters
+    ----------
+    Args : argparse.Namespace
+        The parsed command line.
+
+    Returns
+    -------
+    Stats : dictionary
+        The statistics reported by Streaming.encodeStream/decodeStream, or 
+        the report from Parallel.encodeParallel/decodeParallel.
+
+    """
+    InStream = sys.stdin.buffer if Args.input == '-' else open(Args.input, 'rb')
+    OutStream = sys.stdout.buffer if Args.output == '-' else open(Args.output, 'wb')
+    try:
+        if Args.jobs > 1 and Args.input != '-':
+            if Args.command == 'encode':
+                Stats = Parallel.encodeParallel(Args.input, OutStream, Args.bits,
+                                                Args.block_size, Args.jobs)
+            else:
+                Stats = Parallel.decodeParallel(Args.input, OutStream, Args.jobs)
+        elif Args.command == 'encode':
+            Stats = Streaming.encodeStream(InStream, OutStream, Args.bits, Args.block_size)
+        else:
+            Stats = Streaming.decodeStream(InStream, OutStream)
+        OutStream.flush()
+    finally:
+        if InStream is not sys.stdin.buffer:
+            InStream.close()
+        if OutStream is not sys.stdout.buffer:
+            OutStream.close()
+    return Stats
+
+def HammingService(Args):
+    """
+    Runs the encode/decode service, or the load generator, selected on the 
+    command line.
+
+    Parameters
+    ----------
+    Args : argparse.Namespace
+        The parsed command line.
+
+    Returns
+    -------
+    Report : dictionary
+        The load generator report ('loadtest' only).
+
+    """
+    if Args.command == 'serve':
+        async def Serve():
+            async with Service.FECServer(MaxDelay=Args.delay/1000,
+                                         MaxNumBits=Args.max_bits) as Server:
+                print('Listening on', await Server.start(Args.host, Args.port, Args.unix),
+                      file=sys.stderr)
+                await Server.serveForever()
+        try:
+            asyncio.run(Serve())
+        except KeyboardInterrupt:
+            pass
+        return None
+    Options = {'NumBits': Args.bits, 'FrameSize': Args.frame_size, 'NumFrames': Args.frames,
+               'Connections': Args.connections, 'Concurrency': Args.concurrency,
+               'Op': Service.OP_ENCODE if Args.op == 'encode' else Service.OP_DECODE}
+    if Args.port is None and Args.unix is None:
+        return asyncio.run(Service.loopbackTest({'MaxDelay': Args.delay/1000}, **Options))
+    return asyncio.run(Service.loadTest(Args.host, Args.port, Args.unix, **Options))
+
+def main(Argv=None):
+    """
+    Parses the command line.  With no command, runs the interactive Hamming() 
+    simulation; 'encode' and 'decode' stream a file (or stdin) through the 
+    Hamming code instead, 'serve' runs the encode/decode service and 
+    'loadtest' measures it.
+    """
+    Parser = argparse.ArgumentParser(description='Hamming error correction.')
+    Parser.add_argument('--metrics', metavar='FILE',
+                        help='write timing and counters of Utilities.py to FILE on exit '
+                        '(Prometheus text format if FILE ends in .prom, else JSON); '
+                        'only counts this process, so it cannot be used with -j')
+    Commands = Parser.add_subparsers(dest='command')
+    Encode = Commands.add_parser('encode', help='Hamming-encode a file or stdin.')
+    Encode.add_argument('-k', '--bits', type=int, default=4,
+                        help='data bits per code (default: 4)')
+    Encode.add_argument('-b', '--block-size', type=int,
+                        default=Streaming.DEFAULT_BLOCK_SIZE,
+                        help='bytes read per frame (default: %(default)s)')
+    Decode = Commands.add_parser('decode', help='Correct and decode an encoded stream.')
+    for Command in (Encode, Decode):
+        Command.add_argument('input', nargs='?', default='-',
+                             help="input file ('-' for stdin)")
+        Command.add_argument('output', nargs='?', default='-',
+                             help="output file ('-' for stdout)")
+        Command.add_argument('-j', '--jobs', type=int, default=1,
+                             help='worker processes for file input (default: 1)')
+        Command.add_argument('-v', '--verbose', action='store_true',
+                             help='print statistics to stderr')
+    Serve = Commands.add_parser('serve', help='Run the encode/decode service.')
+    LoadTest = Commands.add_parser('loadtest', help='Measure the encode/decode service '
+                                   '(a local one unless --port or --unix is given).')
+    for Command in (Serve, LoadTest):
+        Command.add_argument('--host', default='127.0.0.1',
+                             help='TCP host (default: %(default)s)')
+        Command.add_argument('--unix', help='Unix socket path, instead of TCP')
+        Command.add_argument('--delay', type=float, default=0.0,
+                             help='milliseconds the service waits to fill a batch '
+                             '(default: 0)')
+    Serve.add_argument('--port', type=int, default=8470,
+                       help='TCP port (default: %(default)s)')
+    Serve.add_argument('--max-bits', type=int, default=Service.DEFAULT_MAX_NUMBITS,
+                       help='largest code (data bits) a request may use '
+                       '(default: %(default)s)')
+    LoadTest.add_argument('--port', type=int, help='TCP port of the service')
+    LoadTest.add_argument('-k', '--bits', type=int, default=4,
+                          help='data bits per code (default: 4)')
+    LoadTest.add_argument('--op', choices=('encode', 'decode'), default='encode',
+                          help='request type (default: %(default)s)')
+    LoadTest.add_argument('--frame-size', type=int, default=1024,
+                          help='bytes per request (default: %(default)s)')
+    LoadTest.add_argument('--frames', type=int, default=10000,
+                          help='number of requests (default: %(default)s)')
+    LoadTest.add_argument('--connections', type=int, default=4,
+                          help='connections (default: %(default)s)')
+    LoadTest.add_argument('--concurrency', type=int, default=16,
+                          help='requests in flight per connection (default: %(default)s)')
+    Args = Parser.parse_args(Argv)
+    if Args.metrics and getattr(Args, 'jobs', 1) > 1:
+        Parser.error('--metrics only counts this process; it cannot be used with -j')
+    if Args.metrics:
+        Instrumentation.enable()
+    try:
+        if Args.command is None:
+            return Hamming()
+        if Args.command in ('serve', 'loadtest'):
+            Report = HammingService(Args)
+            if Report is not None:
+                print(Report)
+            return 0
+        Stats = HammingStream(Args)
+        if Args.verbose:
+            print(Stats, file=sys.stderr)
+        return 0
+    finally:
+        if Args.metrics:
+            Instrumentation.disable()
+            Instrumentation.writeMetrics(Args.metrics, 'prometheus' if Args.metrics.endswith('.prom')
+                                         else 'json')
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,315 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: Built-in timing and counters for Utilities.py (and the GF(2)
+routines it uses).  enable() replaces the functions of those modules with
+timed wrappers and disable() puts the originals back, so when instrumentation
+is off nothing is wrapped and it costs nothing.  Each function records its
+calls, total and self (excluding instrumented callees) time, recent latencies
+for percentiles, and the bytes and blocks passed to it.  Matrix build time and
+multiply time are summed separately, and the matrix cache hit/miss counters
+are included.  snapshot() gives everything as a dictionary; toJSON() and
+toPrometheus() format it, and writeMetrics() and serveMetrics() publish it to
+a file or a local HTTP endpoint for scraping.
+"""
+import collections
+import functools
+import inspect
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import Utilities as utils
+import GF2
+
+#The number of recent latencies kept per function for the percentiles.
+LATENCY_WINDOW = 4096
+PERCENTILES = (50, 90, 99)
+
+#Functions whose (self) time counts as building matrices or multiplying.
+BUILD_FUNCTIONS = ('_buildGMatrix', '_buildHMatrix', '_buildRMatrix', '_buildMatrixArray',
+                   'buildParityBitMatrix', 'packRows', 'buildTables')
+MULTIPLY_FUNCTIONS = ('genXMatrix', 'genXMatrixBatch', 'genXMatrixPacked', 'encodeInto',
+                      'calcSyndromeVec', 'calcSyndromeVecBatch', 'calcSyndromeVecPacked',
+                      'multiply', 'multiplyPacked', 'multiplyVector')
+
+_Originals = {}
+_Stats = {}
+_Lock = threading.Lock()
+_Local = threading.local()
+
+def _newStats():
+    """Returns the empty counters of one function."""
+    return {'calls': 0, 'seconds': 0.0, 'self_seconds': 0.0, 'bytes': 0, 'blocks': 0,
+            'latencies': collections.deque(maxlen=LATENCY_WINDOW)}
+
+def _measure(Value):
+    """Returns the (bytes, blocks) of a function's first argument: the rows of
+    a 2D array are blocks, anything else with a length is one block."""
+    if isinstance(Value, np.ndarray):
+        return Value.nbytes, (Value.shape[0] if Value.ndim > 1 else 1)
+    if isinstance(Value, (bytes, bytearray, memoryview, list, tuple)):
+        return len(Value), 1
+    return 0, 0
+
+def _wrap(Name, Function):
+    """Returns a timed wrapper of a function."""
+    Stats = _Stats.setdefault(Name, _newStats())
+    @functools.wraps(Function)
+    def Wrapper(*Args, **Kwargs):
+        #Each active call keeps the time of its instrumented callees on a
+        #per-thread stack, to work out its self time.
+        Stack = getattr(_Local, 'Stack', None)
+        if Stack is None:
+            Stack = _Local.Stack = []
+        Stack.append(0.0)
+        Start = time.perf_counter()
+        try:
+            return Function(*Args, **Kwargs)
+        finally:
+            Elapsed = time.perf_counter() - Start
+            Children = Stack.pop()
+            if Stack:
+                Stack[-1] = Stack[-1] + Elapsed
+            Bytes, Blocks = _measure(Args[0]) if Args else (0, 0)
+            with _Lock:
+                Stats['calls'] = Stats['calls'] + 1
+                Stats['seconds'] = Stats['seconds'] + Elapsed
+                Stats['self_seconds'] = Stats['self_seconds'] + Elapsed - Children
+                Stats['bytes'] = Stats['bytes'] + Bytes
+                Stats['blocks'] = Stats['blocks'] + Blocks
+                Stats['latencies'].append(Elapsed)
+    return Wrapper
+
+def _targets():
+    """Returns the (module, name) of every function to instrument: the
+    public functions of Utilities and GF2, and the matrix builders."""
+    Targets = []
+    for Module in (utils, GF2):
+        for Name, Function in inspect.getmembers(Module, inspect.isfunction):
+            if Function.__module__ != Module.__name__:
+                continue
+            if Name in ('clearMatrixCache', 'getMatrixCacheInfo'):
+                continue
+            if not Name.startswith('_') or Name in BUILD_FUNCTIONS:
+                Targets.append((Module, Name))
+    return Targets
+
+def enable():
+    """
+    Turns instrumentation on, replacing the Utilities and GF2 functions with
+    timed wrappers.  Calling it again while on does nothing.
+
+    Returns
+    -------
+    None.
+
+    """
+    if _Originals:
+        return
+    for Module, Name in _targets():
+        Function = getattr(Module, Name)
+        _Originals[(Module, Name)] = Function
+        setattr(Module, Name, _wrap(Name, Function))
+
+def disable():
+    """
+    Turns instrumentation off, putting the original functions back.  The
+    counters are kept until reset().
+
+    Returns
+    -------
+    None.
+
+    """
+    for (Module, Name), Function in _Originals.items():
+        setattr(Module, Name, Function)
+    _Originals.clear()
+
+def isEnabled():
+    """Returns True while instrumentation is on."""
+    return bool(_Originals)
+
+def reset():
+    """Clears every counter (the wrappers in place keep counting)."""
+    with _Lock:
+        for Stats in _Stats.values():
+            Stats.update(_newStats())
+
+def snapshot():
+    """
+    Collects the counters.
+
+    Returns
+    -------
+    Metrics : dictionary
+        'functions' - for every function called so far: calls, seconds,
+        self_seconds, bytes, blocks and p50/p90/p99 latency in seconds (over
+        the last LATENCY_WINDOW calls); 'build_seconds' and
+        'multiply_seconds' - the summed self time of the BUILD_FUNCTIONS and
+        MULTIPLY_FUNCTIONS; 'matrix_cache' - Utilities.getMatrixCacheInfo().
+
+    """
+    Functions = {}
+    with _Lock:
+        for Name, Stats in sorted(_Stats.items()):
+            if Stats['calls'] == 0:
+                continue
+            Entry = {Key: Value for Key, Value in Stats.items() if Key != 'latencies'}
+            Latencies = np.percentile(np.array(Stats['latencies']), PERCENTILES)
+            for Percentile, Latency in zip(PERCENTILES, Latencies):
+                Entry['p%d' % Percentile] = float(Latency)
+            Functions[Name] = Entry
+    return {'enabled': isEnabled(),
+            'functions': Functions,
+            'build_seconds': sum(Functions[Name]['self_seconds'] for Name in BUILD_FUNCTIONS
+                                 if Name in Functions),
+            'multiply_seconds': sum(Functions[Name]['self_seconds'] for Name in MULTIPLY_FUNCTIONS
+                                    if Name in Functions),
+            'matrix_cache': utils.getMatrixCacheInfo()}
+
+def toJSON(Metrics=None):
+    """Returns the metrics (default: snapshot()) as a JSON string."""
+    return json.dumps(snapshot() if Metrics is None else Metrics, indent=2, sort_keys=True)
+
+def toPrometheus(Metrics=None):
+    """
+    Formats the metrics (default: snapshot()) in the Prometheus text
+    exposition format.
+
+    Returns
+    -------
+    Text : string
+        The metrics, one sample per line.
+
+    """
+    Metrics = snapshot() if Metrics is None else Metrics
+    Lines = []
+    def Metric(Name, Kind, Help, Samples):
+        Lines.append('# HELP hamming_%s %s' % (Name, Help))
+        Lines.append('# TYPE hamming_%s %s' % (Name, Kind))
+        for Labels, Value in Samples:
+            Label = ','.join('%s="%s"' % Pair for Pair in Labels)
+            Lines.append('hamming_%s%s %r' % (Name, '{%s}' % Label if Label else '', Value))
+    Functions = Metrics['functions']
+    Latency = []
+    for Name, Entry in Functions.items():
+        for Percentile in PERCENTILES:
+            Latency.append(((('function', Name), ('quantile', str(Percentile/100))),
+                            Entry['p%d' % Percentile]))
+    Metric('latency_seconds', 'summary', 'Call latency per function.', Latency)
+    Lines.extend('hamming_latency_seconds_sum{function="%s"} %r' % (Name, Entry['seconds'])
+                 for Name, Entry in Functions.items())
+    Lines.extend('hamming_latency_seconds_count{function="%s"} %d' % (Name, Entry['calls'])
+                 for Name, Entry in Functions.items())
+    for Key, Help in (('self_seconds', 'Time per function excluding instrumented callees.'),
+                      ('bytes', 'Bytes passed to each function.'),
+                      ('blocks', 'Blocks (messages) passed to each function.')):
+        Metric(Key + '_total', 'counter', Help,
+               [((('function', Name),), Entry[Key]) for Name, Entry in Functions.items()])
+    Metric('build_seconds_total', 'counter', 'Time spent building matrices.',
+           [((), Metrics['build_seconds'])])
+    Metric('multiply_seconds_total', 'counter', 'Time spent in encode and syndrome products.',
+           [((), Metrics['multiply_seconds'])])
+    Cache = Metrics['matrix_cache']
+    Metric('matrix_cache_hits_total', 'counter', 'Matrix cache hits.', [((), Cache['hits'])])
+    Metric('matrix_cache_misses_total', 'counter', 'Matrix cache misses.',
+           [((), Cache['misses'])])
+    Metric('matrix_cache_codes', 'gauge', 'Codes in the matrix cache.', [((), Cache['size'])])
+    Metric('matrix_cache_tables', 'gauge', 'Tables held for the cached codes.',
+           [((), Cache['tables'])])
+    return '\n'.join(Lines) + '\n'
+
+def writeMetrics(Path, Format='json'):
+    """
+    Writes the current metrics to a file (replacing it atomically, so a
+    scraper never reads it half-written).
+
+    Parameters
+    ----------
+    Path : string
+        The file to write.
+    Format : string
+        'json' or 'prometheus'.
+
+    Returns
+    -------
+    None.
+
+    """
+    if Format not in ('json', 'prometheus'):
+        raise ValueError("Format must be 'json' or 'prometheus'")
+    Text = toJSON() if Format == 'json' else toPrometheus()
+    Handle, TempPath = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(Path)),
+                                        suffix='.tmp')
+    try:
+        with os.fdopen(Handle, 'w') as File:
+            File.write(Text)
+        os.replace(TempPath, Path)
+    except BaseException:
+        os.unlink(TempPath)
+        raise
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves /metrics (Prometheus) and /metrics.json."""
+    def do_GET(self):
+        if self.path == '/metrics':
+            Body, Type = toPrometheus(), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            Body, Type = toJSON(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        Body = Body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', Type)
+        self.send_header('Content-Length', str(len(Body)))
+        self.end_headers()
+        self.wfile.write(Body)
+
+    def log_message(self, *Args):
+        pass
+
+def serveMetrics(Port=0, Host='127.0.0.1'):
+    """
+    Serves the metrics over HTTP from a background thread: /metrics in the
+    Prometheus format and /metrics.json as JSON.
+
+    Parameters
+    ----------
+    Port : integer
+        The TCP port (0 picks a free one).
+    Host : string
+        The address to listen on.
+
+    Returns
+    -------
+    Server : http.server.ThreadingHTTPServer
+        The server; its server_address holds the real port.  Call its
+        shutdown() method to stop it.
+
+    """
+    Server = ThreadingHTTPServer((Host, Port), _MetricsHandler)
+    threading.Thread(target=Server.serve_forever, daemon=True).start()
+    return Server
@@ -0,0 +1,236 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: Persistent on-disk store for the generated code matrices.  Each 
+matrix is saved once as a .npy file (with a SHA-256 checksum next to it) in a 
+cache directory, keyed by its kind, size and the store format version.  Later 
+loads memory-map the file read-only, so every process using the same code 
+shares the same pages instead of building its own copy.
+"""
+import hashlib
+import os
+import tempfile
+import numpy as np
+import Utilities as utils
+
+FORMAT_VERSION = 1
+
+#How to build each kind of matrix that can be stored, from its size.  The
+#matrices are built straight as arrays, without going through (or filling)
+#the tuple-of-tuples matrices in the Utilities cache.
+BUILDERS = {'G': lambda Size: utils._buildMatrixArray('G', Size),
+            'H': lambda Size: utils._buildMatrixArray('H', Size),
+            'R': lambda Size: utils._buildMatrixArray('R', Size),
+            'DataIndex': lambda Size: utils.genDataIndex(Size)}
+
+def defaultCacheDir():
+    """
+    Returns the default store directory: $HAMMING_CACHE_DIR if set, otherwise 
+    'hamming' in the user's cache directory ($XDG_CACHE_HOME or ~/.cache).
+    """
+    if os.environ.get('HAMMING_CACHE_DIR'):
+        return os.environ['HAMMING_CACHE_DIR']
+    Base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(Base, 'hamming')
+
+def matrixPath(Kind, Size, Directory=None):
+    """
+    Returns the path of the stored matrix of the given kind and size.
+
+    Parameters
+    ----------
+    Kind : string
+        'G', 'H', 'R' or 'DataIndex'.
+    Size : integer
+        The argument of the matching Utilities function (genGMatrix, ...).
+    Directory : string
+        The store directory (default: defaultCacheDir()).
+
+    Returns
+    -------
+    Path : string
+        The path of the .npy file.
+
+    """
+    if Kind not in BUILDERS:
+        raise ValueError("Unknown matrix kind: %r" % (Kind,))
+    return os.path.join(Directory or defaultCacheDir(),
+                        '%s_%d_v%d.npy' % (Kind, Size, FORMAT_VERSION))
+
+def _fileDigest(Path):
+    """Returns the SHA-256 hex digest of a file."""
+    Digest = hashlib.sha256()
+    with open(Path, 'rb') as File:
+        for Chunk in iter(lambda: File.read(1 << 20), b''):
+            Digest.update(Chunk)
+    return Digest.hexdigest()
+
+def _writeAtomically(Path, Write):
+    """Writes a file through a temporary file and a rename, so readers never 
+    see it half-written."""
+    Handle, TempPath = tempfile.mkstemp(dir=os.path.dirname(Path), suffix='.tmp')
+    try:
+        with os.fdopen(Handle, 'wb') as File:
+            Write(File)
+        os.replace(TempPath, Path)
+    except BaseException:
+        os.unlink(TempPath)
+        raise
+
+def _fileStamp(Path):
+    """Returns the size and modification time of a file, as a string."""
+    Stat = os.stat(Path)
+    return '%d %d' % (Stat.st_size, Stat.st_mtime_ns)
+
+def _writeChecksum(Path, Digest):
+    """Writes the checksum file of a stored matrix: its digest, and the stamp 
+    (size and modification time) of the file it was checked against."""
+    Text = '%s\n%s\n' % (Digest, _fileStamp(Path))
+    _writeAtomically(Path + '.sha256', lambda File: File.write(Text.encode('ascii')))
+
+def saveMatrix(Kind, Size, Matrix, Directory=None):
+    """
+    Saves a matrix to the store, with its checksum.
+
+    Parameters
+    ----------
+    Kind : string
+        'G', 'H', 'R' or 'DataIndex'.
+    Size : integer
+        The argument of the matching Utilities function.
+    Matrix : NumPy array
+        The matrix to store.
+    Directory : string
+        The store directory (default: defaultCacheDir()).
+
+    Returns
+    -------
+    Path : string
+        The path of the stored .npy file.
+
+    """
+    Path = matrixPath(Kind, Size, Directory)
+    os.makedirs(os.path.dirname(Path), exist_ok=True)
+    _writeAtomically(Path, lambda File: np.save(File, np.asarray(Matrix), allow_pickle=False))
+    _writeChecksum(Path, _fileDigest(Path))
+    return Path
+
+def loadMatrix(Kind, Size, Directory=None, Verify=True):
+    """
+    Memory-maps a stored matrix (read-only).  Missing or corrupt entries give 
+    None; corrupt ones are removed so they get rebuilt.
+
+    Parameters
+    ----------
+    Kind : string
+        'G', 'H', 'R' or 'DataIndex'.
+    Size : integer
+        The argument of the matching Utilities function.
+    Directory : string
+        The store directory (default: defaultCacheDir()).
+    Verify : boolean
+        Check the file against its checksum first.  The whole file is only 
+        hashed when it is new to the store or has changed since it was last 
+        checked (its size or modification time differ from the ones recorded 
+        with the checksum); otherwise only its size and header are checked.
+
+    Returns
+    -------
+    Matrix : numpy.memmap or None
+        The stored matrix, or None if there is no valid entry.
+
+    """
+    Path = matrixPath(Kind, Size, Directory)
+    try:
+        if Verify:
+            with open(Path + '.sha256', 'rb') as File:
+                Fields = File.read().decode('ascii').split('\n')
+            Expected, Stamp = Fields[0].strip(), Fields[1].strip() if len(Fields) > 1 else ''
+            if Stamp != _fileStamp(Path):
+                if _fileDigest(Path) != Expected:
+                    raise ValueError("Checksum mismatch")
+                _writeChecksum(Path, Expected)
+        return np.load(Path, mmap_mode='r', allow_pickle=False)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        for Stale in (Path, Path + '.sha256'):
+            try:
+                os.unlink(Stale)
+            except FileNotFoundError:
+                pass
+        return None
+
+def getMatrix(Kind, Size, Directory=None, Verify=True):
+    """
+    Loads a matrix from the store, building and saving it first if it is not 
+    there (or is corrupt).
+
+    Parameters
+    ----------
+    Kind : string
+        'G', 'H', 'R' or 'DataIndex'.
+    Size : integer
+        The argument of the matching Utilities function.
+    Directory : string
+        The store directory (default: defaultCacheDir()).
+    Verify : boolean
+        Check stored files against their checksums.
+
+    Returns
+    -------
+    Matrix : numpy.memmap
+        The matrix, memory-mapped read-only.
+
+    """
+    Matrix = loadMatrix(Kind, Size, Directory, Verify)
+    if Matrix is None:
+        saveMatrix(Kind, Size, BUILDERS[Kind](Size), Directory)
+        Matrix = np.load(matrixPath(Kind, Size, Directory), mmap_mode='r', allow_pickle=False)
+    return Matrix
+
+def loadCodeTables(NumBits, Directory=None, Verify=True):
+    """
+    Loads the tables the batch functions need for the code of NumBits data 
+    bits from the store (building any that are missing), and installs them in 
+    the Utilities matrix cache, so nothing is built in this process.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The number of data bits per message.
+    Directory : string
+        The store directory (default: defaultCacheDir()).
+    Verify : boolean
+        Check stored files against their checksums.
+
+    Returns
+    -------
+    Tables : dictionary
+        The memory-mapped tables, keyed as by Utilities.getCodeTables.
+
+    """
+    Width, Height = utils.getHMatrixShape(None, NumBits)
+    Tables = {('GArray', NumBits): getMatrix('G', NumBits, Directory, Verify),
+              ('HArray', NumBits): getMatrix('H', NumBits, Directory, Verify),
+              ('DataIndex', Width): getMatrix('DataIndex', Width, Directory, Verify)}
+    utils.loadCodeTables(Tables)
+    return Tables
@@ -0,0 +1,223 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: Multi-process encoding and decoding of large inputs.  The input 
+is split into shards of whole blocks (as used by Streaming.py), and the shards 
+are encoded or decoded in a process pool.  The code tables are built once in 
+the parent and published in shared memory (SharedTables.py), and each worker 
+attaches to them when it starts.  Output is byte-for-byte the same as 
+Streaming.encodeStream/decodeStream.
+"""
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import Streaming
+import SharedTables
+
+DEFAULT_SHARD_BLOCKS = 16
+
+def _readShard(Source, Offset, Length):
+    """Returns Length bytes at Offset of a file path or bytes-like Source
+    (a buffer shard arrives already sliced, at offset 0)."""
+    if isinstance(Source, str):
+        with open(Source, 'rb') as File:
+            File.seek(Offset)
+            return File.read(Length)
+    return bytes(Source[Offset:Offset + Length])
+
+def _shardTask(Source, Offset, Length):
+    """Returns the (source, offset) a worker reads a shard from: the path and 
+    offset for a file, or just the shard's bytes for a buffer, so no task 
+    carries the whole input."""
+    if isinstance(Source, str):
+        return Source, Offset
+    return bytes(Source[Offset:Offset + Length]), 0
+
+def _encodeShard(Task):
+    """Worker: encodes every block of one shard into frames."""
+    Source, Offset, Length, NumBits, BlockSize = Task
+    Start = time.perf_counter()
+    Data = _readShard(Source, Offset, Length)
+    Frames = []
+    for Index in range(0, len(Data), BlockSize):
+        Block = Data[Index:Index + BlockSize]
+        Frames.append(Streaming.packFrameLength(len(Block)))
+        Frames.append(Streaming.encodeBlock(Block, NumBits))
+    return os.getpid(), Length, time.perf_counter() - Start, b''.join(Frames), 0
+
+def _decodeShard(Task):
+    """Worker: corrects and decodes every frame of one shard."""
+    Source, Offset, Length, NumBits, BlockSize = Task
+    Start = time.perf_counter()
+    Data = memoryview(_readShard(Source, Offset, Length))
+    Blocks = []
+    NumCorrected = 0
+    Index = 0
+    while Index < len(Data):
+        BlockLength = Streaming.unpackFrameLength(Data[Index:Index + Streaming.FRAME_SIZE],
+                                                  BlockSize)
+        Index = Index + Streaming.FRAME_SIZE
+        Size = Streaming.frameSize(BlockLength, NumBits)
+        Block, Corrected = Streaming.decodeBlock(Data[Index:Index + Size], BlockLength, NumBits)
+        Blocks.append(Block)
+        NumCorrected = NumCorrected + Corrected
+        Index = Index + Size
+    return os.getpid(), Length, time.perf_counter() - Start, b''.join(Blocks), NumCorrected
+
+def _orderedMap(Executor, Fn, Tasks, Window):
+    """
+    Like Executor.map, but with at most Window tasks in flight, so a slow 
+    consumer does not make finished shards pile up in memory.
+    """
+    Pending = deque()
+    for Task in Tasks:
+        Pending.append(Executor.submit(Fn, Task))
+        if len(Pending) >= Window:
+            yield Pending.popleft().result()
+    while Pending:
+        yield Pending.popleft().result()
+
+def _run(Fn, Tasks, NumBits, OutStream, Workers):
+    """Runs the shard tasks in a process pool, writing output in order."""
+    Workers = Workers or os.cpu_count() or 1
+    Report = {'shards': 0, 'bytes': 0, 'corrected': 0, 'workers': {}}
+    Start = time.perf_counter()
+    with SharedTables.SharedTables() as Registry, \
+         ProcessPoolExecutor(max_workers=Workers, initializer=SharedTables.attachTables,
+                             initargs=(Registry.publishCode(NumBits),)) as Executor:
+        for Pid, Length, Seconds, Output, Corrected in _orderedMap(Executor, Fn, Tasks, 2*Workers):
+            OutStream.write(Output)
+            Worker = Report['workers'].setdefault(Pid, {'shards': 0, 'bytes': 0, 'seconds': 0.0})
+            Worker['shards'] = Worker['shards'] + 1
+            Worker['bytes'] = Worker['bytes'] + Length
+            Worker['seconds'] = Worker['seconds'] + Seconds
+            Report['shards'] = Report['shards'] + 1
+            Report['bytes'] = Report['bytes'] + Length
+            Report['corrected'] = Report['corrected'] + Corrected
+    Report['seconds'] = time.perf_counter() - Start
+    for Worker in Report['workers'].values():
+        Worker['throughput'] = Worker['bytes']/Worker['seconds'] if Worker['seconds'] else 0.0
+    Report['throughput'] = Report['bytes']/Report['seconds'] if Report['seconds'] else 0.0
+    return Report
+
+def _sourceSize(Source):
+    """Returns the size of a file path or bytes-like Source."""
+    if isinstance(Source, str):
+        return os.path.getsize(Source)
+    return len(Source)
+
+def encodeParallel(Source, OutStream, NumBits, BlockSize=Streaming.DEFAULT_BLOCK_SIZE,
+                   Workers=None, ShardBlocks=DEFAULT_SHARD_BLOCKS):
+    """
+    Encodes a file or buffer in parallel.  Writes the same stream as 
+    Streaming.encodeStream.
+
+    Parameters
+    ----------
+    Source : string or bytes-like
+        The path of the file to encode, or the data itself.  Workers read 
+        their own shard of a file, so the data does not pass through the 
+        parent.
+    OutStream : binary file object
+        Where the encoded stream is written.
+    NumBits : integer
+        The number of data bits per code.
+    BlockSize : integer
+        The size of each block (frame), in bytes.
+    Workers : integer
+        The number of worker processes (default: one per CPU).
+    ShardBlocks : integer
+        The number of blocks per shard.
+
+    Returns
+    -------
+    Report : dictionary
+        Totals ('shards', 'bytes', 'seconds', 'throughput' in bytes per second) 
+        and the same figures per worker process, keyed by PID, in 'workers'.
+
+    """
+    if NumBits <= 0 or NumBits > 0xFFFF:
+        raise ValueError("NumBits must be between 1 and 65535")
+    if BlockSize <= 0 or ShardBlocks <= 0:
+        raise ValueError("BlockSize and ShardBlocks must be positive")
+    Size = _sourceSize(Source)
+    ShardSize = BlockSize*ShardBlocks
+    Tasks = (_shardTask(Source, Offset, min(ShardSize, Size - Offset))
+             + (min(ShardSize, Size - Offset), NumBits, BlockSize)
+             for Offset in range(0, Size, ShardSize))
+    OutStream.write(Streaming.packHeader(NumBits, BlockSize))
+    return _run(_encodeShard, Tasks, NumBits, OutStream, Workers)
+
+def _frameShards(Source, NumBits, BlockSize, ShardBlocks):
+    """Generator yielding (offset, length) of each shard of frames in Source, 
+    checking the frame lengths as Streaming.readFrames does."""
+    Size = _sourceSize(Source)
+    Offset = Streaming.HEADER_SIZE
+    BlockLength = BlockSize
+    while Offset < Size:
+        Start = Offset
+        for i in range(ShardBlocks):
+            if Offset >= Size:
+                break
+            Prefix = _readShard(Source, Offset, Streaming.FRAME_SIZE)
+            if len(Prefix) < Streaming.FRAME_SIZE:
+                raise ValueError("Truncated frame header")
+            if BlockLength < BlockSize:
+                raise ValueError("Corrupt frame header: short frame before the end")
+            BlockLength = Streaming.unpackFrameLength(Prefix, BlockSize)
+            Offset = Offset + Streaming.FRAME_SIZE + Streaming.frameSize(BlockLength, NumBits)
+        if Offset > Size:
+            raise ValueError("Truncated frame")
+        yield Start, Offset - Start
+
+def decodeParallel(Source, OutStream, Workers=None, ShardBlocks=DEFAULT_SHARD_BLOCKS):
+    """
+    Corrects and decodes an encoded file or buffer in parallel.  Writes the 
+    same data as Streaming.decodeStream.
+
+    Parameters
+    ----------
+    Source : string or bytes-like
+        The path of the encoded file, or the encoded stream itself.
+    OutStream : binary file object
+        Where the decoded data is written.
+    Workers : integer
+        The number of worker processes (default: one per CPU).
+    ShardBlocks : integer
+        The number of frames per shard.
+
+    Returns
+    -------
+    Report : dictionary
+        As for encodeParallel, plus the number of 'corrected' codes.  Bytes 
+        are counted on the encoded side.
+
+    """
+    if ShardBlocks <= 0:
+        raise ValueError("ShardBlocks must be positive")
+    Header = io.BytesIO(_readShard(Source, 0, Streaming.HEADER_SIZE))
+    NumBits, BlockSize = Streaming.readHeader(Header)
+    Tasks = (_shardTask(Source, Offset, Length) + (Length, NumBits, BlockSize)
+             for Offset, Length in _frameShards(Source, NumBits, BlockSize, ShardBlocks))
+    return _run(_decodeShard, Tasks, NumBits, OutStream, Workers)
+
@@ -0,0 +1,381 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: Producer/consumer stage pipeline.  The steps of Hamming()
+(generate -> encode -> channel -> syndrome -> correct -> decode) run as
+separate stages connected by bounded queues, each with its own pool of thread
+or process workers, so stages that release the GIL (NumPy batches, file I/O)
+overlap.  runPipeline reports the queue depth and utilisation of every stage,
+which shows the bottleneck under sustained load.
+"""
+import functools
+import heapq
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import Utilities as utils
+import Channels
+import Simulation
+
+DEFAULT_QUEUE_SIZE = 8
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+#Put on a queue once per worker of the stage reading it, to stop it.
+_STOP = object()
+
+class Stage:
+    """
+    One stage of a pipeline.
+
+    Parameters
+    ----------
+    Name : string
+        The name used in the report.
+    Function : callable
+        Maps one item to the next stage's item.  Must be picklable (a
+        module-level function or a functools.partial of one) for process
+        workers.
+    Workers : integer
+        The number of workers.
+    Kind : string
+        'thread' or 'process'.
+    QueueSize : integer
+        The size of the bounded queue feeding this stage.
+    """
+    def __init__(self, Name, Function, Workers=1, Kind='thread', QueueSize=DEFAULT_QUEUE_SIZE):
+        if Kind not in ('thread', 'process'):
+            raise ValueError("Kind must be 'thread' or 'process'")
+        if Workers <= 0 or QueueSize <= 0:
+            raise ValueError("Workers and QueueSize must be positive")
+        self.Name = Name
+        self.Function = Function
+        self.Workers = Workers
+        self.Kind = Kind
+        self.QueueSize = QueueSize
+
+def _runStage(Stage, Inbox, Outbox, Stops, Stats, Live, Lock, Failed, Executor):
+    """Worker thread: applies a stage to items until it is stopped.  Process
+    stages hand each item to the stage's process pool and wait for it, which
+    releases the GIL."""
+    while True:
+        Item = Inbox.get()
+        if Item is _STOP:
+            break
+        Sequence, Value = Item
+        if Failed:
+            continue
+        Start = time.perf_counter()
+        try:
+            if Executor is None:
+                Value = Stage.Function(Value)
+            else:
+                Value = Executor.submit(Stage.Function, Value).result()
+        except BaseException as Error:
+            Failed.append(Error)
+            continue
+        Busy = time.perf_counter() - Start
+        with Lock:
+            Stats['items'] = Stats['items'] + 1
+            Stats['busy_seconds'] = Stats['busy_seconds'] + Busy
+        Outbox.put((Sequence, Value))
+    with Lock:
+        Live[0] = Live[0] - 1
+        Last = Live[0] == 0
+    #The last worker out stops the next stage.
+    if Last:
+        for i in range(Stops):
+            Outbox.put(_STOP)
+
+def _sampleQueues(Queues, Stats, Done, Interval):
+    """Monitor thread: samples the depth of every stage's input queue."""
+    while not Done.wait(Interval):
+        for Inbox, StageStats in zip(Queues, Stats):
+            Depth = Inbox.qsize()
+            StageStats['samples'] = StageStats['samples'] + 1
+            StageStats['depth_total'] = StageStats['depth_total'] + Depth
+            StageStats['max_queue_depth'] = max(StageStats['max_queue_depth'], Depth)
+
+def runPipeline(Source, Stages, Sink=None, Ordered=False,
+                SampleInterval=DEFAULT_SAMPLE_INTERVAL):
+    """
+    Runs every item of Source through the stages, in their own workers, and
+    hands the results to Sink.
+
+    Parameters
+    ----------
+    Source : iterable
+        The items fed to the first stage.
+    Stages : list of Stage
+        The stages, in order.
+    Sink : callable
+        Called (in this thread) with each result.  Without one, the results
+        are returned in the report under 'results'.
+    Ordered : boolean
+        Pass results to Sink in the order of Source.  Stages with more than
+        one worker can otherwise reorder them.
+    SampleInterval : float
+        How often (in seconds) the queue depths are sampled.
+
+    Returns
+    -------
+    Report : dictionary
+        The number of items and elapsed seconds, and for every stage (under
+        'stages', by name) its workers, items, busy seconds, utilisation
+        (busy time over elapsed time per worker) and mean/max input queue
+        depth.
+
+    """
+    Queues = [queue.Queue(Stage.QueueSize) for Stage in Stages]
+    Results = queue.Queue(max([Stage.QueueSize for Stage in Stages] + [1]))
+    #The number of workers reading each queue, each needing a stop.
+    Stops = [Stage.Workers for Stage in Stages] + [1]
+    Stats = [{'kind': Stage.Kind, 'workers': Stage.Workers, 'items': 0, 'busy_seconds': 0.0,
+              'samples': 0, 'depth_total': 0, 'max_queue_depth': 0} for Stage in Stages]
+    Failed = []
+    Executors = []
+    Threads = []
+    Done = threading.Event()
+    Start = time.perf_counter()
+    try:
+        for Index, Stage in enumerate(Stages):
+            Executor = None
+            if Stage.Kind == 'process':
+                Executor = ProcessPoolExecutor(max_workers=Stage.Workers)
+                Executors.append(Executor)
+            Outbox = Queues[Index + 1] if Index + 1 < len(Stages) else Results
+            Live = [Stage.Workers]
+            Lock = threading.Lock()
+            for i in range(Stage.Workers):
+                Threads.append(threading.Thread(
+                    target=_runStage, daemon=True,
+                    args=(Stage, Queues[Index], Outbox, Stops[Index + 1], Stats[Index], Live,
+                          Lock, Failed, Executor)))
+        Threads.append(threading.Thread(target=_sampleQueues, daemon=True,
+                                        args=(Queues, Stats, Done, SampleInterval)))
+        #The source is fed from its own thread, so this one is free to drain
+        #the results.
+        def Feed():
+            Target = Queues[0] if Stages else Results
+            try:
+                for Sequence, Item in enumerate(Source):
+                    if Failed:
+                        break
+                    Target.put((Sequence, Item))
+            except BaseException as Error:
+                Failed.append(Error)
+            for i in range(Stops[0]):
+                Target.put(_STOP)
+        Threads.append(threading.Thread(target=Feed, daemon=True))
+        for Thread in Threads:
+            Thread.start()
+        Collected = []
+        Waiting = []
+        Next = 0
+        Count = 0
+        while True:
+            Item = Results.get()
+            if Item is _STOP:
+                break
+            Count = Count + 1
+            if Failed:
+                continue
+            if Ordered:
+                heapq.heappush(Waiting, (Item[0], Count, Item[1]))
+                Ready = []
+                while Waiting and Waiting[0][0] == Next:
+                    Ready.append(heapq.heappop(Waiting)[2])
+                    Next = Next + 1
+            else:
+                Ready = [Item[1]]
+            for Value in Ready:
+                try:
+                    if Sink is None:
+                        Collected.append(Value)
+                    else:
+                        Sink(Value)
+                except BaseException as Error:
+                    Failed.append(Error)
+                    break
+    finally:
+        Done.set()
+        for Executor in Executors:
+            Executor.shutdown()
+    if Failed:
+        raise Failed[0]
+    Seconds = time.perf_counter() - Start
+    Report = {'items': Count, 'seconds': Seconds, 'stages': {}}
+    for Stage, StageStats in zip(Stages, Stats):
+        Samples = StageStats.pop('samples')
+        DepthTotal = StageStats.pop('depth_total')
+        StageStats['utilisation'] = (StageStats['busy_seconds']/(Seconds*Stage.Workers)
+                                     if Seconds else 0.0)
+        StageStats['mean_queue_depth'] = DepthTotal/Samples if Samples else 0.0
+        Report['stages'][Stage.Name] = StageStats
+    if Sink is None:
+        Report['results'] = Collected
+    return Report
+
+def messageSource(NumBits, NumBlocks, BatchSize, Seed=None):
+    """
+    Source of the Hamming pipeline: yields one small description per batch of 
+    messages.  The messages themselves are made by the generate stage, so the 
+    time spent on them shows up in the report.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The number of data bits per message.
+    NumBlocks : integer
+        The total number of messages.
+    BatchSize : integer
+        The number of messages per batch.
+    Seed : integer or None
+        Seed for the random number generators.
+
+    Yields
+    ------
+    Item : dictionary
+        'NumBits', 'Size' (the number of messages), and 'MessageSeed' and 
+        'ChannelSeed' (numpy.random.SeedSequence) for the generate and 
+        channel stages.
+
+    """
+    Seeds = np.random.SeedSequence(Seed)
+    for Start in range(0, NumBlocks, BatchSize):
+        MessageSeed, ChannelSeed = Seeds.spawn(2)
+        yield {'NumBits': NumBits, 'Size': min(BatchSize, NumBlocks - Start),
+               'MessageSeed': MessageSeed, 'ChannelSeed': ChannelSeed}
+
+def generateStage(Item):
+    """Generate stage: adds the random messages as 'Messages' (a 2D uint8 
+    array, one message per row)."""
+    Item['Messages'] = np.random.default_rng(Item['MessageSeed']).integers(
+        0, 2, (Item['Size'], Item['NumBits']), dtype=np.uint8)
+    return Item
+
+def encodeStage(Item):
+    """Encode stage: adds the coded messages as 'Sent'."""
+    Item['Sent'] = utils.genXMatrixBatch(Item['Messages'])
+    return Item
+
+def channelStage(Item, FlipProb):
+    """Channel stage: adds the received messages (through a binary symmetric
+    channel) as 'Recvd' and the number of flipped bits as 'ChannelErrors'."""
+    Errors = Channels.binarySymmetricChannel(Item['Sent'].shape,
+                                             np.random.default_rng(Item['ChannelSeed']), FlipProb)
+    Item['Recvd'] = Item['Sent'] ^ Errors
+    Item['ChannelErrors'] = int(np.count_nonzero(Errors))
+    return Item
+
+def syndromeStage(Item):
+    """Syndrome stage: adds the position of each bit error as 'ErrorBits'."""
+    Item['ErrorBits'] = utils.translateSynVecBatch(utils.calcSyndromeVecBatch(Item['Recvd']))
+    return Item
+
+def correctStage(Item):
+    """Correct stage: corrects 'Recvd' in place and adds 'Corrected'."""
+    Item['Corrected'] = utils.correctErrorInMessageBatch(Item['Recvd'], Item['ErrorBits'])
+    return Item
+
+def decodeStage(Item):
+    """Decode stage: adds the decoded messages as 'Decoded'."""
+    Item['Decoded'] = utils.decodeOriginalMessageBatch(Item['Recvd'])
+    return Item
+
+def hammingStages(FlipProb, Kinds=None, Workers=None, QueueSize=DEFAULT_QUEUE_SIZE):
+    """
+    Builds the stages of the Hamming() chain, fed by messageSource.
+
+    Parameters
+    ----------
+    FlipProb : float
+        The bit flip probability of the channel.
+    Kinds : dictionary
+        'thread' or 'process' for any stage, by name (default: 'thread').
+    Workers : dictionary
+        The number of workers for any stage, by name (default: 1).
+    QueueSize : integer
+        The size of each stage's input queue.
+
+    Returns
+    -------
+    Stages : list of Stage
+        The generate, encode, channel, syndrome, correct and decode stages.
+
+    """
+    Kinds = Kinds or {}
+    Workers = Workers or {}
+    Functions = [('generate', generateStage),
+                 ('encode', encodeStage),
+                 ('channel', functools.partial(channelStage, FlipProb=FlipProb)),
+                 ('syndrome', syndromeStage),
+                 ('correct', correctStage),
+                 ('decode', decodeStage)]
+    return [Stage(Name, Function, Workers.get(Name, 1), Kinds.get(Name, 'thread'), QueueSize)
+            for Name, Function in Functions]
+
+def hammingPipeline(NumBits, NumBlocks, FlipProb, Seed=None,
+                    BatchSize=Simulation.DEFAULT_BATCH_SIZE, **Options):
+    """
+    Runs the Hamming() chain over NumBlocks random messages as a pipeline,
+    counting errors as Simulation.py does.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The number of data bits per message.
+    NumBlocks : integer
+        The total number of messages.
+    FlipProb : float
+        The bit flip probability of the channel.
+    Seed : integer or None
+        Seed for the random number generators.
+    BatchSize : integer
+        The number of messages per pipeline item.
+    **Options :
+        Kinds, Workers and QueueSize, passed to hammingStages.
+
+    Returns
+    -------
+    Counts : dictionary
+        The simulation counters (see Simulation.newCounts).
+    Report : dictionary
+        The runPipeline report.
+
+    """
+    Counts = Simulation.newCounts()
+    def Sink(Item):
+        DataErrors = np.count_nonzero(Item['Decoded'] != Item['Messages'], axis=1)
+        BlockErrors = DataErrors > 0
+        Counts['blocks'] = Counts['blocks'] + len(Item['Messages'])
+        Counts['bits'] = Counts['bits'] + Item['Sent'].size
+        Counts['data_bits'] = Counts['data_bits'] + Item['Messages'].size
+        Counts['channel_errors'] = Counts['channel_errors'] + Item['ChannelErrors']
+        Counts['data_bit_errors'] = Counts['data_bit_errors'] + int(DataErrors.sum())
+        Counts['block_errors'] = Counts['block_errors'] + int(np.count_nonzero(BlockErrors))
+        Corrected = Item['Corrected']
+        Counts['corrected'] = Counts['corrected'] + int(np.count_nonzero(Corrected & ~BlockErrors))
+        Counts['miscorrected'] = Counts['miscorrected'] + int(np.count_nonzero(Corrected & BlockErrors))
+    Report = runPipeline(messageSource(NumBits, NumBlocks, BatchSize, Seed),
+                         hammingStages(FlipProb, **Options), Sink)
+    return Counts, Report
@@ -0,0 +1,444 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: asyncio encode/decode service.  Clients send length-prefixed
+request frames over TCP or a Unix socket and get one response frame back for
+each, in order.  A connection may have many requests in flight (pipelining);
+requests from all connections are coalesced into batches that are encoded or
+decoded with one pass of the batch functions (Streaming.encodeBlocks and
+decodeBlocks).  Bounded queues give backpressure: when the service falls
+behind it stops reading from the sockets.  FECClient and loadTest give a
+pipelined client and a load generator reporting latency and throughput.
+
+Protocol (all integers big-endian):
+    request  : op (uint8: 0 encode, 1 decode), data bits per code (uint16),
+               block length in bytes (uint32), payload size (uint32), payload
+               (the block to encode, or the frame payload to decode)
+    response : status (uint8: 0 ok, 1 error), corrected codes (uint32),
+               payload size (uint32), payload (the result, or an error
+               message)
+"""
+import asyncio
+import collections
+import os
+import struct
+import time
+import numpy as np
+import Streaming
+
+REQUEST = struct.Struct('>BHII')
+RESPONSE = struct.Struct('>BII')
+OP_ENCODE = 0
+OP_DECODE = 1
+STATUS_OK = 0
+STATUS_ERROR = 1
+MAX_PAYLOAD = 1 << 24
+DEFAULT_BATCH_BYTES = 1 << 20
+DEFAULT_IN_FLIGHT = 64
+DEFAULT_QUEUED = 1024
+DEFAULT_MAX_NUMBITS = 1024
+
+def _processGroup(Op, NumBits, Requests):
+    """Encodes or decodes (Length, Payload) requests of one operation and
+    code size in one pass of the batch functions.  Returns a (Corrected,
+    Payload) pair for each."""
+    if Op == OP_ENCODE:
+        Payloads = Streaming.encodeBlocks([Payload for Length, Payload in Requests], NumBits)
+        return [(0, Payload) for Payload in Payloads]
+    return [(Corrected, Block) for Block, Corrected in Streaming.decodeBlocks(Requests, NumBits)]
+
+def _processBatch(Batch):
+    """
+    Encodes or decodes a batch of requests, grouping them by operation and
+    code size so each group is one pass of the batch functions.  Returns a
+    (Corrected, Payload) pair or an exception for every request.  If a group
+    fails, its requests are retried one at a time, so only the bad ones get
+    the error.
+    """
+    Results = [None]*len(Batch)
+    Groups = collections.defaultdict(list)
+    for Index, (Op, NumBits, Length, Payload, Future) in enumerate(Batch):
+        Groups[(Op, NumBits)].append(Index)
+    for (Op, NumBits), Indices in Groups.items():
+        Requests = [(Batch[i][2], Batch[i][3]) for i in Indices]
+        try:
+            Outputs = _processGroup(Op, NumBits, Requests)
+        except Exception as Error:
+            if len(Requests) == 1:
+                Outputs = [Error]
+            else:
+                Outputs = []
+                for Request in Requests:
+                    try:
+                        Outputs.extend(_processGroup(Op, NumBits, [Request]))
+                    except Exception as Error:
+                        Outputs.append(Error)
+        for Index, Output in zip(Indices, Outputs):
+            Results[Index] = Output
+    return Results
+
+def _checkRequest(Op, NumBits, Length, Size, MaxNumBits=DEFAULT_MAX_NUMBITS):
+    """Returns an error message for an invalid request header, or None."""
+    if Op not in (OP_ENCODE, OP_DECODE):
+        return "Unknown operation %d" % Op
+    if not 1 <= NumBits <= MaxNumBits:
+        return "NumBits must be between 1 and %d" % MaxNumBits
+    Expected = Length if Op == OP_ENCODE else Streaming.frameSize(Length, NumBits)
+    if Size != Expected:
+        return "Payload size %d does not match block length %d" % (Size, Length)
+    return None
+
+class FECServer:
+    """
+    The encode/decode service.  Use as an async context manager, or call
+    start() and close().
+
+    Parameters
+    ----------
+    MaxBatchBytes : integer
+        Stop adding requests to a batch once it holds this many payload bytes.
+    MaxDelay : float
+        How long (in seconds) to wait for more requests before running a
+        batch.  With 0, a batch holds whatever arrived while the previous
+        batch ran.
+    MaxInFlight : integer
+        Requests a connection may have in flight before the service stops
+        reading from it.
+    MaxQueued : integer
+        Requests waiting for a batch (across all connections) before the
+        service stops reading from every connection.
+    MaxNumBits : integer
+        The largest code (data bits per code) a request may ask for; larger
+        ones get an error response, since every code size a client names
+        builds (and caches) its matrices.
+    """
+    def __init__(self, MaxBatchBytes=DEFAULT_BATCH_BYTES, MaxDelay=0.0,
+                 MaxInFlight=DEFAULT_IN_FLIGHT, MaxQueued=DEFAULT_QUEUED,
+                 MaxNumBits=DEFAULT_MAX_NUMBITS):
+        self.MaxBatchBytes = MaxBatchBytes
+        self.MaxDelay = MaxDelay
+        self.MaxInFlight = MaxInFlight
+        self.MaxQueued = MaxQueued
+        self.MaxNumBits = MaxNumBits
+        self.Stats = {'connections': 0, 'requests': 0, 'batches': 0, 'errors': 0,
+                      'bytes_in': 0, 'bytes_out': 0}
+        self._Server = None
+        self._Queue = None
+        self._Runner = None
+
+    async def start(self, Host='127.0.0.1', Port=0, Path=None):
+        """
+        Starts listening, on a Unix socket if Path is given, otherwise on TCP.
+
+        Returns
+        -------
+        Address : tuple or string
+            The address listened on (with the real port if Port was 0).
+
+        """
+        self._Queue = asyncio.Queue(self.MaxQueued)
+        self._Runner = asyncio.create_task(self._run())
+        if Path is not None:
+            self._Server = await asyncio.start_unix_server(self._handle, path=Path)
+        else:
+            self._Server = await asyncio.start_server(self._handle, Host, Port)
+        return self.address
+
+    @property
+    def address(self):
+        """The address the service listens on."""
+        return self._Server.sockets[0].getsockname()
+
+    async def serveForever(self):
+        """Serves until cancelled."""
+        await self._Server.serve_forever()
+
+    async def close(self):
+        """Stops listening and stops the batch runner."""
+        if self._Server is not None:
+            self._Server.close()
+            await self._Server.wait_closed()
+        if self._Runner is not None:
+            self._Runner.cancel()
+            try:
+                await self._Runner
+            except asyncio.CancelledError:
+                pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *Exc):
+        await self.close()
+
+    async def submit(self, Op, NumBits, Length, Payload):
+        """
+        Queues one request for the next batch, waiting while the queue is
+        full.  Returns a future for its (Corrected, Payload) result.
+        """
+        Future = asyncio.get_running_loop().create_future()
+        await self._Queue.put((Op, NumBits, Length, Payload, Future))
+        return Future
+
+    async def _run(self):
+        """Takes batches off the queue and processes them in a thread, so the
+        event loop keeps serving sockets meanwhile."""
+        Loop = asyncio.get_running_loop()
+        while True:
+            Batch = [await self._Queue.get()]
+            Size = len(Batch[0][3])
+            Deadline = Loop.time() + self.MaxDelay
+            while Size < self.MaxBatchBytes:
+                if self._Queue.empty():
+                    Remaining = Deadline - Loop.time()
+                    if Remaining <= 0:
+                        break
+                    try:
+                        Item = await asyncio.wait_for(self._Queue.get(), Remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    Item = self._Queue.get_nowait()
+                Batch.append(Item)
+                Size = Size + len(Item[3])
+            Results = await Loop.run_in_executor(None, _processBatch, Batch)
+            self.Stats['batches'] = self.Stats['batches'] + 1
+            for Item, Result in zip(Batch, Results):
+                if Item[4].done():
+                    continue
+                if isinstance(Result, Exception):
+                    Item[4].set_exception(Result)
+                else:
+                    Item[4].set_result(Result)
+
+    async def _respond(self, Writer, Pending):
+        """Writes the response of each request of a connection, in order.  If
+        the client goes away, the remaining responses are dropped."""
+        Connected = True
+        while True:
+            Future = await Pending.get()
+            if Future is None:
+                return
+            try:
+                Corrected, Payload = await Future
+                Status = STATUS_OK
+            except Exception as Error:
+                Corrected, Payload = 0, str(Error).encode('utf-8')
+                Status = STATUS_ERROR
+                self.Stats['errors'] = self.Stats['errors'] + 1
+            if not Connected:
+                continue
+            try:
+                Writer.write(RESPONSE.pack(Status, Corrected, len(Payload)))
+                Writer.write(Payload)
+                await Writer.drain()
+            except ConnectionError:
+                Connected = False
+                continue
+            self.Stats['bytes_out'] = self.Stats['bytes_out'] + RESPONSE.size + len(Payload)
+
+    async def _handle(self, Reader, Writer):
+        """Serves one connection: reads requests, queues them, and lets
+        _respond answer them in order."""
+        self.Stats['connections'] = self.Stats['connections'] + 1
+        Pending = asyncio.Queue(self.MaxInFlight)
+        Responder = asyncio.create_task(self._respond(Writer, Pending))
+        try:
+            while True:
+                try:
+                    Header = await Reader.readexactly(REQUEST.size)
+                    Op, NumBits, Length, Size = REQUEST.unpack(Header)
+                    if Size > MAX_PAYLOAD:
+                        break
+                    Payload = await Reader.readexactly(Size)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                self.Stats['requests'] = self.Stats['requests'] + 1
+                self.Stats['bytes_in'] = self.Stats['bytes_in'] + REQUEST.size + Size
+                Message = _checkRequest(Op, NumBits, Length, Size, self.MaxNumBits)
+                if Message is None:
+                    Future = await self.submit(Op, NumBits, Length, Payload)
+                else:
+                    Future = asyncio.get_running_loop().create_future()
+                    Future.set_exception(ValueError(Message))
+                await Pending.put(Future)
+            await Pending.put(None)
+            await Responder
+        finally:
+            Responder.cancel()
+            Writer.close()
+
+class FECClient:
+    """
+    Pipelined client for FECServer: any number of encode/decode calls may be
+    awaited at once on one connection.
+    """
+    def __init__(self, Reader, Writer):
+        self._Reader = Reader
+        self._Writer = Writer
+        self._Pending = collections.deque()
+        self._Receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, Host='127.0.0.1', Port=None, Path=None):
+        """Connects to a service on a Unix socket if Path is given, otherwise
+        on TCP."""
+        if Path is not None:
+            Reader, Writer = await asyncio.open_unix_connection(Path)
+        else:
+            Reader, Writer = await asyncio.open_connection(Host, Port)
+        return cls(Reader, Writer)
+
+    async def _receive(self):
+        """Matches responses to requests, in order."""
+        try:
+            while True:
+                Status, Corrected, Size = RESPONSE.unpack(
+                    await self._Reader.readexactly(RESPONSE.size))
+                Payload = await self._Reader.readexactly(Size)
+                Future = self._Pending.popleft()
+                if Status == STATUS_OK:
+                    Future.set_result((Payload, Corrected))
+                else:
+                    Future.set_exception(ValueError(Payload.decode('utf-8')))
+        except (asyncio.IncompleteReadError, ConnectionError) as Error:
+            while self._Pending:
+                self._Pending.popleft().set_exception(ConnectionError(str(Error)))
+
+    async def request(self, Op, NumBits, Length, Payload):
+        """
+        Sends one request and waits for its response.
+
+        Returns
+        -------
+        Payload : bytes
+            The encoded payload or decoded block.
+        Corrected : integer
+            The number of corrected codes (decode only).
+
+        """
+        Future = asyncio.get_running_loop().create_future()
+        self._Pending.append(Future)
+        self._Writer.write(REQUEST.pack(Op, NumBits, Length, len(Payload)))
+        self._Writer.write(Payload)
+        await self._Writer.drain()
+        return await Future
+
+    async def encode(self, Block, NumBits):
+        """Encodes a block; returns the frame payload."""
+        Payload, Corrected = await self.request(OP_ENCODE, NumBits, len(Block), Block)
+        return Payload
+
+    async def decode(self, Payload, Length, NumBits):
+        """Corrects and decodes a frame payload; returns the block and the
+        number of corrected codes."""
+        return await self.request(OP_DECODE, NumBits, Length, Payload)
+
+    async def close(self):
+        """Closes the connection."""
+        self._Writer.close()
+        try:
+            await self._Writer.wait_closed()
+        except ConnectionError:
+            pass
+        self._Receiver.cancel()
+
+async def loadTest(Host='127.0.0.1', Port=None, Path=None, NumBits=4, FrameSize=1024,
+                   NumFrames=10000, Connections=4, Concurrency=16, Op=OP_ENCODE):
+    """
+    Load generator: sends NumFrames random frames over several pipelined
+    connections and measures the latency of each request.
+
+    Parameters
+    ----------
+    Host, Port, Path :
+        The address of the service (Path for a Unix socket).
+    NumBits : integer
+        The number of data bits per code.
+    FrameSize : integer
+        The size of each block, in bytes.
+    NumFrames : integer
+        The total number of requests.
+    Connections : integer
+        The number of connections.
+    Concurrency : integer
+        The number of requests in flight on each connection.
+    Op : integer
+        OP_ENCODE or OP_DECODE.  Decoded frames are checked against the data.
+
+    Returns
+    -------
+    Report : dictionary
+        Frames sent, elapsed seconds, frames and data bytes per second, and
+        the p50/p99/max latency in milliseconds.
+
+    """
+    Block = os.urandom(FrameSize)
+    Payload = Streaming.encodeBlock(Block, NumBits)
+    Latencies = []
+    Remaining = [NumFrames]
+
+    async def Worker(Client):
+        while Remaining[0] > 0:
+            Remaining[0] = Remaining[0] - 1
+            Start = time.perf_counter()
+            if Op == OP_ENCODE:
+                await Client.encode(Block, NumBits)
+            else:
+                Decoded, Corrected = await Client.decode(Payload, FrameSize, NumBits)
+                if Decoded != Block:
+                    raise ValueError("Decoded frame does not match")
+            Latencies.append(time.perf_counter() - Start)
+
+    Clients = [await FECClient.connect(Host, Port, Path) for i in range(Connections)]
+    Start = time.perf_counter()
+    try:
+        await asyncio.gather(*[Worker(Client) for Client in Clients
+                               for i in range(Concurrency)])
+    finally:
+        Seconds = time.perf_counter() - Start
+        for Client in Clients:
+            await Client.close()
+    Milliseconds = np.array(Latencies)*1000
+    return {'frames': len(Latencies), 'seconds': Seconds,
+            'frames_per_second': len(Latencies)/Seconds if Seconds else 0.0,
+            'bytes_per_second': len(Latencies)*FrameSize/Seconds if Seconds else 0.0,
+            'p50_ms': float(np.percentile(Milliseconds, 50)) if len(Latencies) else 0.0,
+            'p99_ms': float(np.percentile(Milliseconds, 99)) if len(Latencies) else 0.0,
+            'max_ms': float(Milliseconds.max()) if len(Latencies) else 0.0}
+
+async def loopbackTest(ServerOptions=None, **Options):
+    """
+    Runs loadTest against a service started in this process on a free
+    loopback port.  Options are passed to loadTest, ServerOptions to
+    FECServer.
+
+    Returns
+    -------
+    Report : dictionary
+        The loadTest report, plus the server's statistics under 'server'.
+
+    """
+    async with FECServer(**(ServerOptions or {})) as Server:
+        Host, Port = (await Server.start('127.0.0.1', 0))[:2]
+        Report = await loadTest(Host, Port, **Options)
+        Report['server'] = dict(Server.Stats)
+    return Report
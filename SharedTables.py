@@ -0,0 +1,199 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: Sharing of the code tables between processes through 
+multiprocessing.shared_memory.  The parent publishes each table once in a 
+SharedTables registry and passes the (small, picklable) handle to its workers; 
+the workers attach read-only NumPy views of the same memory by name instead of 
+building or receiving their own copies.  Published tables are 
+reference-counted and unlinked when the last reference is released.
+"""
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+import Utilities as utils
+
+#Shared memory blocks attached by this process, kept open while views of 
+#them are in use.
+_Attached = {}
+
+class SharedTables:
+    """
+    Registry of tables published in shared memory by this process.  Use as a 
+    context manager, or call close() when done, so the blocks are unlinked.
+    """
+    def __init__(self):
+        #Key -> [SharedMemory, Shape, DType, RefCount]
+        self._Blocks = {}
+        
+    def publish(self, Tables):
+        """
+        Copies tables into shared memory (once per key; publishing a key 
+        again only adds a reference to it).
+
+        Parameters
+        ----------
+        Tables : dictionary
+            The NumPy tables, keyed by their matrix cache key.
+
+        Returns
+        -------
+        Handle : dictionary
+            Key -> (Name, Shape, DType) for each table; pass it to 
+            attachTables in the workers and to release when done.
+
+        """
+        Handle = {}
+        for Key, Table in Tables.items():
+            Block = self._Blocks.get(Key)
+            if Block is None:
+                Table = np.ascontiguousarray(Table)
+                Memory = shared_memory.SharedMemory(create=True, size=max(Table.nbytes, 1))
+                np.ndarray(Table.shape, Table.dtype, buffer=Memory.buf)[...] = Table
+                Block = self._Blocks[Key] = [Memory, Table.shape, Table.dtype.str, 0]
+            Block[3] = Block[3] + 1
+            Handle[Key] = (Block[0].name, Block[1], Block[2])
+        return Handle
+    
+    def publishCode(self, NumBits):
+        """
+        Publishes the tables used by the batch functions for the code of 
+        NumBits data bits (see Utilities.getCodeTables).
+
+        Parameters
+        ----------
+        NumBits : integer
+            The number of data bits per message.
+
+        Returns
+        -------
+        Handle : dictionary
+            As returned by publish.
+
+        """
+        return self.publish(utils.getCodeTables(NumBits))
+    
+    def release(self, Handle):
+        """
+        Drops one reference to each table of a handle, unlinking the tables 
+        that are no longer referenced.
+
+        Parameters
+        ----------
+        Handle : dictionary
+            As returned by publish.
+
+        Returns
+        -------
+        None.
+
+        """
+        for Key in Handle:
+            Block = self._Blocks.get(Key)
+            if Block is None:
+                continue
+            Block[3] = Block[3] - 1
+            if Block[3] <= 0:
+                del self._Blocks[Key]
+                Block[0].close()
+                Block[0].unlink()
+                
+    def refCount(self, Key):
+        """Returns the number of references to a published table (0 if it is 
+        not published)."""
+        Block = self._Blocks.get(Key)
+        return Block[3] if Block else 0
+    
+    def close(self):
+        """Unlinks every table still published."""
+        for Block in self._Blocks.values():
+            Block[0].close()
+            Block[0].unlink()
+        self._Blocks.clear()
+        
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *Exc):
+        self.close()
+        
+def _attachMemory(Name):
+    """Opens an existing shared memory block without making this process 
+    responsible for unlinking it."""
+    try:
+        return shared_memory.SharedMemory(name=Name, track=False)
+    except TypeError:
+        #Before Python 3.13 attaching also registers the block with the 
+        #resource tracker, which then reports or unlinks it as leaked.
+        Register = resource_tracker.register
+        resource_tracker.register = lambda Name, RType: None
+        try:
+            return shared_memory.SharedMemory(name=Name)
+        finally:
+            resource_tracker.register = Register
+    
+def attachTables(Handle, Install=True):
+    """
+    Attaches read-only views of published tables.  Can be used directly as a 
+    process pool initializer.
+
+    Parameters
+    ----------
+    Handle : dictionary
+        As returned by SharedTables.publish.
+    Install : boolean
+        Also store the views in this process's matrix cache (see 
+        Utilities.loadCodeTables), so the batch functions use them.
+
+    Returns
+    -------
+    Tables : dictionary
+        The views, keyed by their matrix cache key.
+
+    """
+    Tables = {}
+    for Key, (Name, Shape, DType) in Handle.items():
+        Memory = _Attached.get(Name)
+        if Memory is None:
+            Memory = _Attached[Name] = _attachMemory(Name)
+        Table = np.ndarray(Shape, DType, buffer=Memory.buf)
+        Table.flags.writeable = False
+        Tables[Key] = Table
+    if Install:
+        utils.loadCodeTables(Tables)
+    return Tables
+
+def detachTables():
+    """
+    Closes every block attached by this process.  Views of them must not be 
+    used afterwards, so the matrix cache is cleared too.
+
+    Returns
+    -------
+    None.
+
+    """
+    utils.clearMatrixCache()
+    for Memory in _Attached.values():
+        try:
+            Memory.close()
+        except BufferError:
+            pass
+    _Attached.clear()
@@ -0,0 +1,475 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: Monte Carlo bit-error-rate simulation.  Pushes batches of random 
+messages through the same encode -> channel -> syndrome -> correct -> decode 
+chain as Hamming.py, entirely with the batch functions in Utilities.py, and 
+counts what went wrong.
+"""
+import functools
+import math
+import os
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import Utilities as utils
+import Channels
+import SharedTables
+
+DEFAULT_BATCH_SIZE = 65536
+DEFAULT_SHARD_BLOCKS = 1048576
+
+#Error rates that the early-stopping simulation can track: the counter of
+#error events and the counter of trials it is measured against.
+METRICS = {'post_ber': ('data_bit_errors', 'data_bits'),
+           'bler': ('block_errors', 'blocks'),
+           'pre_ber': ('channel_errors', 'bits')}
+
+#Error counters kept by the simulation, all plain integers so results from
+#separate runs can simply be added together.
+COUNTERS = ('blocks', 'bits', 'data_bits', 'channel_errors', 'data_bit_errors',
+            'block_errors', 'corrected', 'miscorrected')
+
+def newCounts():
+    """Returns a dictionary with every simulation counter set to 0."""
+    return dict.fromkeys(COUNTERS, 0)
+
+def mergeCounts(Counts, Other):
+    """
+    Adds the counters of Other into Counts.
+
+    Parameters
+    ----------
+    Counts : dictionary
+        The running counters.  Modified in place.
+    Other : dictionary
+        The counters to add.
+
+    Returns
+    -------
+    Counts : dictionary
+        The running counters.
+
+    """
+    for Key in COUNTERS:
+        Counts[Key] = Counts[Key] + Other[Key]
+    return Counts
+
+def simulateBatch(NumBits, NumBlocks, Channel, Rng, Depth=1):
+    """
+    Simulates one batch of random messages through the Hamming code.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The number of data bits per message.
+    NumBlocks : integer
+        The number of messages in the batch.
+    Channel : callable
+        The channel model, Channel(Shape, Rng), returning an error mask.
+    Rng : numpy.random.Generator
+        The random number generator to draw from.
+    Depth : integer
+        The block interleaver depth (see Channels.interleave).  NumBlocks 
+        must be a multiple of it.
+
+    Returns
+    -------
+    Counts : dictionary
+        The simulation counters for the batch.
+
+    """
+    Messages = Rng.integers(0, 2, (NumBlocks, NumBits), dtype=np.uint8)
+    Recvd = utils.genXMatrixBatch(Messages)
+    #The channel acts on the interleaved view, so its errors land in Recvd
+    #already deinterleaved, without copying the codes.
+    Stream = Channels.interleave(Recvd, Depth)
+    Errors = Channel(Stream.shape, Rng)
+    Stream ^= Errors
+    Decoded, Corrected = utils.decodeBatch(Recvd)
+    DataErrors = np.count_nonzero(Decoded != Messages, axis=1)
+    BlockErrors = DataErrors > 0
+    Counts = newCounts()
+    Counts['blocks'] = NumBlocks
+    Counts['bits'] = Recvd.size
+    Counts['data_bits'] = Messages.size
+    Counts['channel_errors'] = int(np.count_nonzero(Errors))
+    Counts['data_bit_errors'] = int(DataErrors.sum())
+    Counts['block_errors'] = int(np.count_nonzero(BlockErrors))
+    Counts['corrected'] = int(np.count_nonzero(Corrected & ~BlockErrors))
+    Counts['miscorrected'] = int(np.count_nonzero(Corrected & BlockErrors))
+    return Counts
+
+def simulateSparseBatch(NumBits, NumBlocks, FlipProb, Rng):
+    """
+    Simulates one batch over a binary symmetric channel using only the error 
+    positions.  The Hamming code is linear and the decoder only looks at the 
+    syndrome, so whether a block decodes correctly depends on its error 
+    pattern alone, not on the message sent.  No messages or codes are built: 
+    the syndromes come from the error positions (calcSyndromeSparseBatch), 
+    so the cost scales with the number of errors rather than the number of 
+    bits.  Gives the same counters, in distribution, as simulateBatch.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The number of data bits per message.
+    NumBlocks : integer
+        The number of messages in the batch.
+    FlipProb : float
+        The probability that the channel flips a bit.
+    Rng : numpy.random.Generator
+        The random number generator to draw from.
+
+    Returns
+    -------
+    Counts : dictionary
+        The simulation counters for the batch.
+
+    """
+    CodeBits, Height = utils.getHMatrixShape(None, NumBits)
+    Rows, ErrorBits = Channels.sparseBinarySymmetricChannel(NumBlocks, CodeBits, Rng, FlipProb)
+    Syndromes = utils.calcSyndromeSparseBatch(Rows, ErrorBits, NumBlocks)
+    ErrorRows = np.unique(Rows)
+    ErrorSyndromes = Syndromes[ErrorRows]
+    CorrectedRows = ErrorRows[(ErrorSyndromes > 0) & (ErrorSyndromes <= CodeBits)]
+    #Bits left wrong after correction: the channel errors and the corrections,
+    #with any bit that was flipped twice cancelling out.
+    Keys = np.concatenate((Rows*(CodeBits + 1) + ErrorBits,
+                           CorrectedRows*(CodeBits + 1) + Syndromes[CorrectedRows]))
+    Keys, Multiplicity = np.unique(Keys, return_counts=True)
+    Residual = Keys[Multiplicity % 2 == 1]
+    ResidualRows, ResidualBits = np.divmod(Residual, CodeBits + 1)
+    IsData = (ResidualBits & (ResidualBits - 1)) != 0
+    BadRows = np.unique(ResidualRows[IsData])
+    Counts = newCounts()
+    Counts['blocks'] = NumBlocks
+    Counts['bits'] = NumBlocks*CodeBits
+    Counts['data_bits'] = NumBlocks*NumBits
+    Counts['channel_errors'] = len(ErrorBits)
+    Counts['data_bit_errors'] = int(np.count_nonzero(IsData))
+    Counts['block_errors'] = len(BadRows)
+    Counts['miscorrected'] = int(np.count_nonzero(np.isin(CorrectedRows, BadRows)))
+    Counts['corrected'] = len(CorrectedRows) - Counts['miscorrected']
+    return Counts
+
+def simulateBERSparse(NumBits, NumBlocks, FlipProb, Seed=None, BatchSize=16*DEFAULT_BATCH_SIZE):
+    """
+    Version of simulateBER using simulateSparseBatch - much faster at low 
+    flip probabilities, where almost every block arrives without errors.
+
+    Returns
+    -------
+    Report : dictionary
+        The simulation counters and error rates, see berReport.
+
+    """
+    Rng = np.random.default_rng(Seed)
+    Counts = newCounts()
+    for Start in range(0, NumBlocks, BatchSize):
+        mergeCounts(Counts, simulateSparseBatch(NumBits, min(BatchSize, NumBlocks - Start),
+                                                FlipProb, Rng))
+    return berReport(Counts)
+
+def simulateChannel(NumBits, NumBlocks, Channel, Rng, BatchSize=DEFAULT_BATCH_SIZE, Depth=1):
+    """
+    Simulates NumBlocks random messages through the Hamming code and a 
+    channel model, a batch at a time.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The number of data bits per message.
+    NumBlocks : integer
+        The total number of messages.
+    Channel : callable
+        The channel model, Channel(Shape, Rng), returning an error mask.
+    Rng : numpy.random.Generator
+        The random number generator to draw from.
+    BatchSize : integer
+        The number of messages per batch (rounded down to a multiple of 
+        Depth).
+    Depth : integer
+        The block interleaver depth.  NumBlocks must be a multiple of it.
+
+    Returns
+    -------
+    Counts : dictionary
+        The simulation counters.
+
+    """
+    BatchSize = max(BatchSize - BatchSize % Depth, Depth)
+    Counts = newCounts()
+    for Start in range(0, NumBlocks, BatchSize):
+        mergeCounts(Counts, simulateBatch(NumBits, min(BatchSize, NumBlocks - Start),
+                                          Channel, Rng, Depth))
+    return Counts
+
+def simulateBER(NumBits, NumBlocks, FlipProb, Seed=None, BatchSize=DEFAULT_BATCH_SIZE):
+    """
+    Monte Carlo bit-error-rate simulation over a binary symmetric channel.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The number of data bits per message.
+    NumBlocks : integer
+        The total number of messages.
+    FlipProb : float
+        The probability that the channel flips a bit.
+    Seed : integer
+        Seed for the random number generator (default: unpredictable).
+    BatchSize : integer
+        The number of messages per batch.
+
+    Returns
+    -------
+    Report : dictionary
+        The simulation counters and error rates, see berReport.
+
+    """
+    Channel = functools.partial(Channels.binarySymmetricChannel, FlipProb=FlipProb)
+    Rng = np.random.default_rng(Seed)
+    return berReport(simulateChannel(NumBits, NumBlocks, Channel, Rng, BatchSize))
+
+def _simulateShard(Task):
+    """Worker: simulates one shard with its own random number stream."""
+    NumBits, NumBlocks, Channel, SeedSeq, BatchSize, Depth = Task
+    return simulateChannel(NumBits, NumBlocks, Channel, np.random.default_rng(SeedSeq),
+                           BatchSize, Depth)
+
+def simulateChannelParallel(NumBits, NumBlocks, Channel, Seed, Workers=None,
+                            ShardBlocks=DEFAULT_SHARD_BLOCKS, BatchSize=DEFAULT_BATCH_SIZE,
+                            Depth=1):
+    """
+    Runs simulateChannel across a pool of processes, reproducibly.  The trials 
+    are split into shards of ShardBlocks messages, and every shard draws from 
+    its own independent random number stream, spawned from Seed.  The shards, 
+    and so the merged counters, do not depend on the number of workers: the 
+    same Seed gives exactly the same counts on 1 core or 64.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The number of data bits per message.
+    NumBlocks : integer
+        The total number of messages.
+    Channel : callable
+        The channel model, Channel(Shape, Rng).  Must be picklable (for 
+        example a functools.partial of a function in Channels.py).
+    Seed : integer
+        The master seed.
+    Workers : integer
+        The number of worker processes (default: one per CPU).  1 runs every 
+        shard in this process.
+    ShardBlocks : integer
+        The number of messages per shard (a multiple of Depth).
+    BatchSize : integer
+        The number of messages per batch within a shard.
+    Depth : integer
+        The block interleaver depth.
+
+    Returns
+    -------
+    Counts : dictionary
+        The merged simulation counters.
+
+    """
+    if ShardBlocks <= 0:
+        raise ValueError("ShardBlocks must be positive")
+    Sizes = [min(ShardBlocks, NumBlocks - Start) for Start in range(0, NumBlocks, ShardBlocks)]
+    Seeds = np.random.SeedSequence(Seed).spawn(len(Sizes))
+    Tasks = [(NumBits, Size, Channel, SeedSeq, BatchSize, Depth)
+             for Size, SeedSeq in zip(Sizes, Seeds)]
+    Counts = newCounts()
+    Workers = Workers or os.cpu_count() or 1
+    if Workers == 1:
+        for Task in Tasks:
+            mergeCounts(Counts, _simulateShard(Task))
+        return Counts
+    with SharedTables.SharedTables() as Registry, \
+         ProcessPoolExecutor(max_workers=Workers, initializer=SharedTables.attachTables,
+                             initargs=(Registry.publishCode(NumBits),)) as Executor:
+        for ShardCounts in Executor.map(_simulateShard, Tasks):
+            mergeCounts(Counts, ShardCounts)
+    return Counts
+
+def simulateBERParallel(NumBits, NumBlocks, FlipProb, Seed, Workers=None,
+                        ShardBlocks=DEFAULT_SHARD_BLOCKS, BatchSize=DEFAULT_BATCH_SIZE):
+    """
+    Parallel, reproducibly seeded version of simulateBER.  See 
+    simulateChannelParallel.
+
+    Returns
+    -------
+    Report : dictionary
+        The simulation counters and error rates, see berReport.
+
+    """
+    Channel = functools.partial(Channels.binarySymmetricChannel, FlipProb=FlipProb)
+    return berReport(simulateChannelParallel(NumBits, NumBlocks, Channel, Seed,
+                                             Workers, ShardBlocks, BatchSize))
+
+def berReport(Counts):
+    """
+    Adds the error rates to a set of simulation counters.
+
+    Parameters
+    ----------
+    Counts : dictionary
+        The simulation counters.
+
+    Returns
+    -------
+    Report : dictionary
+        The counters plus 'pre_ber' (channel bit error rate), 'post_ber' (data 
+        bit error rate after correction) and 'bler' (block error rate).
+
+    """
+    Report = dict(Counts)
+    Report['pre_ber'] = Counts['channel_errors']/Counts['bits'] if Counts['bits'] else 0.0
+    Report['post_ber'] = Counts['data_bit_errors']/Counts['data_bits'] if Counts['data_bits'] else 0.0
+    Report['bler'] = Counts['block_errors']/Counts['blocks'] if Counts['blocks'] else 0.0
+    return Report
+
+def wilsonInterval(Errors, Trials, Confidence=0.95):
+    """
+    Wilson score confidence interval for an error rate.
+
+    Parameters
+    ----------
+    Errors : integer
+        The number of error events seen.
+    Trials : integer
+        The number of trials.
+    Confidence : float
+        The confidence level of the interval.
+
+    Returns
+    -------
+    Low : float
+        The lower bound of the interval.
+    High : float
+        The upper bound of the interval.
+
+    """
+    if Trials == 0:
+        return 0.0, 1.0
+    Z = NormalDist().inv_cdf((1 + Confidence)/2)
+    Rate = Errors/Trials
+    Denominator = 1 + Z*Z/Trials
+    Centre = (Rate + Z*Z/(2*Trials))/Denominator
+    HalfWidth = Z*math.sqrt(Rate*(1 - Rate)/Trials + Z*Z/(4*Trials*Trials))/Denominator
+    return max(0.0, Centre - HalfWidth), min(1.0, Centre + HalfWidth)
+
+def simulateUntilConverged(NumBits, Channel, Rng, TargetRelError=0.1, MinErrors=None,
+                           MaxBlocks=10**9, Metric='post_ber', Confidence=0.95,
+                           BatchSize=DEFAULT_BATCH_SIZE, Depth=1):
+    """
+    Simulates batches of messages until the chosen error rate is known well 
+    enough: the relative half-width of its confidence interval is at most 
+    TargetRelError, or MinErrors error events have been seen (whichever comes 
+    first), or MaxBlocks messages have been simulated.  Bit errors within one 
+    block are not independent, so for the bit error rates the interval is 
+    an approximation.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The number of data bits per message.
+    Channel : callable
+        The channel model, Channel(Shape, Rng), returning an error mask.
+    Rng : numpy.random.Generator
+        The random number generator to draw from.
+    TargetRelError : float
+        Stop once the interval half-width is at most this fraction of the 
+        estimate.  None disables this criterion.
+    MinErrors : integer
+        Stop once this many error events were seen.  None disables this 
+        criterion.
+    MaxBlocks : integer
+        Never simulate more than this many messages.
+    Metric : string
+        The error rate to track: 'post_ber', 'bler' or 'pre_ber'.
+    Confidence : float
+        The confidence level of the interval.
+    BatchSize : integer
+        The number of messages per batch; the stopping rule is checked after 
+        every batch.  BatchSize and MaxBlocks must be multiples of Depth.
+    Depth : integer
+        The block interleaver depth.
+
+    Returns
+    -------
+    Report : dictionary
+        The simulation counters and error rates (see berReport), plus 
+        'ci_low', 'ci_high' and 'rel_error' for the tracked metric and whether 
+        it 'converged' before MaxBlocks.
+
+    """
+    ErrorKey, TrialKey = METRICS[Metric]
+    Counts = newCounts()
+    while True:
+        Batch = min(BatchSize, MaxBlocks - Counts['blocks'])
+        mergeCounts(Counts, simulateBatch(NumBits, Batch, Channel, Rng, Depth))
+        Errors, Trials = Counts[ErrorKey], Counts[TrialKey]
+        Low, High = wilsonInterval(Errors, Trials, Confidence)
+        RelError = (High - Low)/2/(Errors/Trials) if Errors else math.inf
+        Converged = ((TargetRelError is not None and RelError <= TargetRelError) or
+                     (MinErrors is not None and Errors >= MinErrors))
+        if Converged or Counts['blocks'] >= MaxBlocks:
+            break
+    Report = berReport(Counts)
+    Report.update({'metric': Metric, 'ci_low': Low, 'ci_high': High,
+                   'rel_error': RelError, 'converged': Converged})
+    return Report
+
+def sweepBER(NumBits, FlipProbs, Seed=None, **Options):
+    """
+    Generator running simulateUntilConverged over a binary symmetric channel 
+    for each flip probability in turn, yielding each point's report as soon 
+    as it converges.  Every point draws from its own random number stream, 
+    spawned from Seed.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The number of data bits per message.
+    FlipProbs : iterable of floats
+        The flip probabilities to simulate.
+    Seed : integer
+        The master seed (default: unpredictable).
+    **Options
+        Passed on to simulateUntilConverged (TargetRelError, MinErrors, ...).
+
+    Yields
+    ------
+    Report : dictionary
+        The report of simulateUntilConverged, plus the 'flip_prob'.
+
+    """
+    FlipProbs = list(FlipProbs)
+    Seeds = np.random.SeedSequence(Seed).spawn(len(FlipProbs))
+    for FlipProb, SeedSeq in zip(FlipProbs, Seeds):
+        Channel = functools.partial(Channels.binarySymmetricChannel, FlipProb=FlipProb)
+        Report = simulateUntilConverged(NumBits, Channel, np.random.default_rng(SeedSeq), **Options)
+        Report['flip_prob'] = FlipProb
+        yield Report
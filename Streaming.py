@@ -0,0 +1,438 @@
+"""    
+    Program simulating Hamming Error Code detection.
+    Copyright (C) 2021  Jim Leon
+
+    This program is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@description: Streaming encoder/decoder for arbitrary byte streams.  Input is 
+read in fixed-size blocks, and each block is Hamming-encoded (with the batch 
+functions in Utilities.py) into one frame of bit-packed codes.  Only one block 
+is held in memory at a time, whatever the size of the input.
+
+Stream format (all integers big-endian):
+    header : b'HAM2', then data bits per code (uint16) and block size (uint32)
+    frame  : block length in bytes (uint32), then the codes of the block, 
+             bit-packed and padded to a whole byte
+The header fields and the frame lengths are themselves protected with the 
+extended Hamming(8,4) byte code (Codec.encodeBytes74), so single bit errors in 
+them are corrected like errors in the payload.  Every frame holds a full 
+block except the last.
+"""
+import struct
+import numpy as np
+import Utilities as utils
+import Codec
+
+MAGIC = b'HAM2'
+#The fields as packed before protection; each byte takes two bytes on disk.
+HEADER_FIELDS = struct.Struct('>HI')
+FRAME_FIELDS = struct.Struct('>I')
+HEADER_SIZE = len(MAGIC) + 2*HEADER_FIELDS.size
+FRAME_SIZE = 2*FRAME_FIELDS.size
+DEFAULT_BLOCK_SIZE = 65536
+
+def _unprotect(Data, What):
+    """Corrects and decodes protected fields, rejecting uncorrectable ones."""
+    if Codec.checkBytes74(Data, Extended=True)['uncorrectable']:
+        raise ValueError("Corrupt " + What)
+    return Codec.decodeBytes74(Data, Extended=True)
+
+def packHeader(NumBits, BlockSize):
+    """Returns the (protected) stream header."""
+    return MAGIC + Codec.encodeBytes74(HEADER_FIELDS.pack(NumBits, BlockSize), Extended=True)
+
+def unpackHeader(Header):
+    """
+    Checks and decodes a stream header made by packHeader.  Single bit errors 
+    are corrected, in the magic number too.
+
+    Parameters
+    ----------
+    Header : bytes-like
+        The HEADER_SIZE bytes of the header.
+
+    Returns
+    -------
+    NumBits : integer
+        The number of data bits per code.
+    BlockSize : integer
+        The block size the stream was encoded with.
+
+    """
+    Header = bytes(Header)
+    Flipped = int.from_bytes(Header[:len(MAGIC)], 'big') ^ int.from_bytes(MAGIC, 'big')
+    if bin(Flipped).count('1') > 1:
+        raise ValueError("Not a Hamming-encoded stream")
+    NumBits, BlockSize = HEADER_FIELDS.unpack(_unprotect(Header[len(MAGIC):], "stream header"))
+    if NumBits == 0 or BlockSize == 0:
+        raise ValueError("Corrupt stream header")
+    return NumBits, BlockSize
+
+def packFrameLength(Length):
+    """Returns the (protected) length prefix of a frame."""
+    return Codec.encodeBytes74(FRAME_FIELDS.pack(Length), Extended=True)
+
+def unpackFrameLength(Prefix, BlockSize):
+    """
+    Checks and decodes a frame length prefix made by packFrameLength.
+
+    Parameters
+    ----------
+    Prefix : bytes-like
+        The FRAME_SIZE bytes of the prefix.
+    BlockSize : integer
+        The block size from the stream header; no frame can be longer.
+
+    Returns
+    -------
+    Length : integer
+        The size of the original block, in bytes.
+
+    """
+    Length, = FRAME_FIELDS.unpack(_unprotect(Prefix, "frame header"))
+    if Length > BlockSize:
+        raise ValueError("Corrupt frame header: block of %d bytes" % Length)
+    return Length
+
+def codeLength(NumBits):
+    """
+    Returns the length of the Hamming code for NumBits data bits.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The number of data bits per code.
+
+    Returns
+    -------
+    Length : integer
+        The number of bits per code.
+
+    """
+    Width, Height = utils.getHMatrixShape(None, NumBits)
+    return Width
+
+def frameSize(Length, NumBits):
+    """
+    Returns the size (in bytes, excluding the length prefix) of the frame 
+    holding an encoded block of Length bytes.
+
+    Parameters
+    ----------
+    Length : integer
+        The size of the block, in bytes.
+    NumBits : integer
+        The number of data bits per code.
+
+    Returns
+    -------
+    Size : integer
+        The size of the encoded frame payload, in bytes.
+
+    """
+    NumCodes = -(-Length*8 // NumBits)
+    return -(-NumCodes*codeLength(NumBits) // 8)
+
+def readBlocks(Stream, BlockSize):
+    """
+    Generator yielding the contents of a binary stream in blocks of BlockSize 
+    bytes.  Short reads (from pipes, sockets, ...) are filled up, so only the 
+    last block can be shorter.
+
+    Parameters
+    ----------
+    Stream : binary file object
+        The stream to read from.
+    BlockSize : integer
+        The size of each block, in bytes.
+
+    Yields
+    ------
+    Block : bytes
+        The next block of the stream.
+
+    """
+    while True:
+        Block = _readExactly(Stream, BlockSize)
+        if not Block:
+            return
+        yield Block
+        if len(Block) < BlockSize:
+            return
+
+def _readExactly(Stream, Size):
+    """Reads up to Size bytes, stopping early only at the end of the stream."""
+    Chunks = []
+    Remaining = Size
+    while Remaining > 0:
+        Chunk = Stream.read(Remaining)
+        if not Chunk:
+            break
+        Chunks.append(Chunk)
+        Remaining = Remaining - len(Chunk)
+    return b''.join(Chunks)
+
+def bytesToMessages(Block, NumBits):
+    """
+    Splits a block of bytes into NumBits-bit messages, one per row.  The last 
+    message is padded with 0s.
+
+    Parameters
+    ----------
+    Block : bytes-like
+        The data to split.
+    NumBits : integer
+        The number of data bits per message.
+
+    Returns
+    -------
+    Messages : 2D NumPy array (uint8)
+        The messages, one per row.
+
+    """
+    Bits = np.unpackbits(np.frombuffer(Block, dtype=np.uint8))
+    NumCodes = -(-len(Bits) // NumBits)
+    Messages = np.zeros(NumCodes*NumBits, dtype=np.uint8)
+    Messages[:len(Bits)] = Bits
+    return Messages.reshape(NumCodes, NumBits)
+
+def encodeBlock(Block, NumBits):
+    """
+    Hamming-encodes one block of bytes into a frame payload.
+
+    Parameters
+    ----------
+    Block : bytes-like
+        The data to encode.
+    NumBits : integer
+        The number of data bits per code.
+
+    Returns
+    -------
+    Payload : bytes
+        The bit-packed codes.
+
+    """
+    XMatrix = utils.genXMatrixBatch(bytesToMessages(Block, NumBits))
+    return np.packbits(XMatrix.ravel()).tobytes()
+
+def decodeBlock(Payload, Length, NumBits):
+    """
+    Corrects and decodes one frame payload back into the original block.
+
+    Parameters
+    ----------
+    Payload : bytes-like
+        The bit-packed codes, as made by encodeBlock.
+    Length : integer
+        The size of the original block, in bytes.
+    NumBits : integer
+        The number of data bits per code.
+
+    Returns
+    -------
+    Block : bytes
+        The decoded block.
+    NumCorrected : integer
+        The number of codes in which a bit error was corrected.
+
+    """
+    CodeBits = codeLength(NumBits)
+    NumCodes = -(-Length*8 // NumBits)
+    Recvd = np.unpackbits(np.frombuffer(Payload, dtype=np.uint8), count=NumCodes*CodeBits)
+    Decoded, Corrected = utils.decodeBatch(Recvd.reshape(NumCodes, CodeBits))
+    Block = np.packbits(Decoded.ravel()[:Length*8]).tobytes()
+    return Block, int(np.count_nonzero(Corrected))
+
+def encodeBlocks(Blocks, NumBits):
+    """
+    Hamming-encodes several blocks with one matrix product, for callers (such 
+    as Service.py) that coalesce many small blocks into a batch.
+
+    Parameters
+    ----------
+    Blocks : list of bytes-like
+        The blocks to encode.
+    NumBits : integer
+        The number of data bits per code.
+
+    Returns
+    -------
+    Payloads : list of bytes
+        The payload of each block, the same as encodeBlock gives.
+
+    """
+    Messages = [bytesToMessages(Block, NumBits) for Block in Blocks]
+    XMatrix = utils.genXMatrixBatch(np.concatenate(Messages))
+    Ends = np.cumsum([len(Rows) for Rows in Messages])
+    return [np.packbits(Codes.ravel()).tobytes() for Codes in np.split(XMatrix, Ends[:-1])]
+
+def decodeBlocks(Frames, NumBits):
+    """
+    Corrects and decodes several frame payloads with one pass of the batch 
+    functions.
+
+    Parameters
+    ----------
+    Frames : list of (integer, bytes-like)
+        The original block length and payload of each frame.
+    NumBits : integer
+        The number of data bits per code.
+
+    Returns
+    -------
+    Blocks : list of (bytes, integer)
+        The decoded block and number of corrected codes of each frame, the 
+        same as decodeBlock gives.
+
+    """
+    CodeBits = codeLength(NumBits)
+    Recvd = []
+    for Length, Payload in Frames:
+        NumCodes = -(-Length*8 // NumBits)
+        Bits = np.unpackbits(np.frombuffer(Payload, dtype=np.uint8), count=NumCodes*CodeBits)
+        Recvd.append(Bits.reshape(NumCodes, CodeBits))
+    Decoded, Corrected = utils.decodeBatch(np.concatenate(Recvd))
+    Ends = np.cumsum([len(Rows) for Rows in Recvd])[:-1]
+    return [(np.packbits(Block.ravel()[:Length*8]).tobytes(), int(np.count_nonzero(Flags)))
+            for (Length, Payload), Block, Flags
+            in zip(Frames, np.split(Decoded, Ends), np.split(Corrected, Ends))]
+
+def encodeStream(InStream, OutStream, NumBits, BlockSize=DEFAULT_BLOCK_SIZE):
+    """
+    Encodes a whole binary stream, block by block.
+
+    Parameters
+    ----------
+    InStream : binary file object
+        The data to encode.
+    OutStream : binary file object
+        Where the encoded stream is written.
+    NumBits : integer
+        The number of data bits per code.
+    BlockSize : integer
+        The size of each block, in bytes.
+
+    Returns
+    -------
+    Stats : dictionary
+        The number of blocks, bytes read and bytes written.
+
+    """
+    if NumBits <= 0 or NumBits > 0xFFFF:
+        raise ValueError("NumBits must be between 1 and 65535")
+    if BlockSize <= 0:
+        raise ValueError("BlockSize must be positive")
+    OutStream.write(packHeader(NumBits, BlockSize))
+    Stats = {'blocks': 0, 'bytes_in': 0, 'bytes_out': HEADER_SIZE}
+    for Block in readBlocks(InStream, BlockSize):
+        Payload = encodeBlock(Block, NumBits)
+        OutStream.write(packFrameLength(len(Block)))
+        OutStream.write(Payload)
+        Stats['blocks'] = Stats['blocks'] + 1
+        Stats['bytes_in'] = Stats['bytes_in'] + len(Block)
+        Stats['bytes_out'] = Stats['bytes_out'] + FRAME_SIZE + len(Payload)
+    return Stats
+
+def readHeader(Stream):
+    """
+    Reads and checks the header of an encoded stream.
+
+    Parameters
+    ----------
+    Stream : binary file object
+        The encoded stream.
+
+    Returns
+    -------
+    NumBits : integer
+        The number of data bits per code.
+    BlockSize : integer
+        The block size the stream was encoded with.
+
+    """
+    Header = _readExactly(Stream, HEADER_SIZE)
+    if len(Header) < HEADER_SIZE:
+        raise ValueError("Truncated stream header")
+    return unpackHeader(Header)
+
+def readFrames(Stream, NumBits, BlockSize):
+    """
+    Generator yielding the frames of an encoded stream (after the header).  
+    Frame lengths longer than BlockSize, or a short frame that is not the 
+    last, are rejected as corrupt.
+
+    Parameters
+    ----------
+    Stream : binary file object
+        The encoded stream, positioned just after the header.
+    NumBits : integer
+        The number of data bits per code.
+    BlockSize : integer
+        The block size from the stream header.
+
+    Yields
+    ------
+    Length : integer
+        The size of the original block, in bytes.
+    Payload : bytes
+        The bit-packed codes of the block.
+
+    """
+    Length = BlockSize
+    while True:
+        Prefix = _readExactly(Stream, FRAME_SIZE)
+        if not Prefix:
+            return
+        if len(Prefix) < FRAME_SIZE:
+            raise ValueError("Truncated frame header")
+        if Length < BlockSize:
+            raise ValueError("Corrupt frame header: short frame before the end")
+        Length = unpackFrameLength(Prefix, BlockSize)
+        Size = frameSize(Length, NumBits)
+        Payload = _readExactly(Stream, Size)
+        if len(Payload) < Size:
+            raise ValueError("Truncated frame")
+        yield Length, Payload
+
+def decodeStream(InStream, OutStream):
+    """
+    Corrects and decodes a whole encoded stream, frame by frame.
+
+    Parameters
+    ----------
+    InStream : binary file object
+        The encoded stream, as written by encodeStream.
+    OutStream : binary file object
+        Where the decoded data is written.
+
+    Returns
+    -------
+    Stats : dictionary
+        The number of blocks, bytes written and corrected codes.
+
+    """
+    NumBits, BlockSize = readHeader(InStream)
+    Stats = {'blocks': 0, 'bytes_out': 0, 'corrected': 0}
+    for Length, Payload in readFrames(InStream, NumBits, BlockSize):
+        Block, NumCorrected = decodeBlock(Payload, Length, NumBits)
+        OutStream.write(Block)
+        Stats['blocks'] = Stats['blocks'] + 1
+        Stats['bytes_out'] = Stats['bytes_out'] + len(Block)
+        Stats['corrected'] = Stats['corrected'] + NumCorrected
+    return Stats
@@ -25,9 +25,31 @@ Created on Mon Feb  1 21:40:30 2021
 
 @description: Unit test suite for the Hamming.py program.
 """
+import asyncio
+import functools
+import io
+import json
+import operator
+import os
+import random
+import shutil
+import tempfile
+import threading
 import unittest
 import numpy as np
 import Utilities as utils
+import Streaming
+import Parallel
+import Channels
+import Simulation
+import Codec
+import BitSlice
+import GF2
+import MatrixStore
+import SharedTables
+import Service
+import Pipeline
+import Instrumentation
 
 class TestParityBitMatrixMethod(unittest.TestCase):
     
@@ -167,6 +189,18 @@ class TestCalcSyndromeVec(unittest.TestCase):
         Syndrome = utils.calcSyndromeVec(RMessage)
         self.assertTrue(np.array_equal(Syndrome,Act_Syn))
         
+    def test_calcSyndromeVec_nonCodeLengths(self):
+        #Powers of two are not code lengths; the GF(2) path agrees with the loop.
+        OldThreshold = utils.GF2Threshold
+        Rng = np.random.default_rng(15)
+        Messages = [list(Rng.integers(0,2,Length)) for Length in (16,32,64,100)]
+        try:
+            utils.GF2Threshold = 10**9
+            Expected = [utils.calcSyndromeVec(Message) for Message in Messages]
+        finally:
+            utils.GF2Threshold = OldThreshold
+        self.assertEqual([utils.calcSyndromeVec(Message) for Message in Messages],Expected)
+        
 class TestGetHMatrixShape(unittest.TestCase):
     def test_getHMatrixShape_1(self):
         PBitMat = utils.buildParityBitMatrix(1)
@@ -197,6 +231,12 @@ class TestGetHMatrixShape(unittest.TestCase):
         Width, Height = utils.getHMatrixShape(PBitMat,11)
         self.assertEqual(Width,15)
         self.assertEqual(Height,4)
+        
+    def test_getHMatrixShape_numpyInteger(self):
+        self.assertEqual(utils.getHMatrixShape(None,np.int64(4)),(7,3))
+        self.assertEqual(utils.genGMatrix(np.int64(4)),utils.genGMatrix(4))
+        self.assertEqual(utils.genHMatrix(np.int32(4)),utils.genHMatrix(4))
+        self.assertEqual(utils.genRMatrix(np.int64(7)),utils.genRMatrix(7))
 
 class TestTranslateSynVec(unittest.TestCase):
     def test_translateSynVec_0(self):
@@ -304,6 +344,929 @@ class TestDecodeOriginalMessage(unittest.TestCase):
         RMessage = utils.decodeOriginalMessage(SendVec)
         self.assertTrue(np.array_equal(OMessage,RMessage))
         
+    def test_decodeOriginalMessage_matchesRMatrix(self):
+        #Including lengths that are not code lengths (powers of two).
+        for Length in (1,2,4,7,8,16,20,32):
+            Message = [1]*Length
+            RMatrix = utils.genRMatrix(Length)
+            Expected = [sum(Row[j]*Message[j] for j in range(Length)) for Row in RMatrix]
+            self.assertEqual(utils.decodeOriginalMessage(Message),Expected)
+        
+
+class TestMatrixCache(unittest.TestCase):
+    def setUp(self):
+        utils.clearMatrixCache()
+        
+    def test_matrixCache_hitsAndMisses(self):
+        utils.genGMatrix(4)
+        utils.genGMatrix(4)
+        utils.genHMatrix(4)
+        Info = utils.getMatrixCacheInfo()
+        self.assertEqual(Info['hits'],1)
+        self.assertEqual(Info['misses'],2)
+        self.assertEqual(Info['size'],1)
+        self.assertEqual(Info['tables'],2)
+        
+    def test_matrixCache_readOnly(self):
+        GMatrix = utils.genGMatrix(4)
+        with self.assertRaises(TypeError):
+            GMatrix[0][0] = 0
+        self.assertIs(GMatrix,utils.genGMatrix(4))
+        
+    def test_matrixCache_evictsLeastRecentlyUsed(self):
+        OldSize = utils.MatrixCacheSize
+        utils.MatrixCacheSize = 2
+        try:
+            utils.genGMatrix(1)
+            utils.genGMatrix(2)
+            utils.genGMatrix(1)
+            utils.genGMatrix(3)
+            utils.genGMatrix(1)
+            Info = utils.getMatrixCacheInfo()
+            self.assertEqual(Info['size'],2)
+            self.assertEqual(Info['hits'],2)
+            utils.genGMatrix(2)
+            self.assertEqual(utils.getMatrixCacheInfo()['misses'],4)
+        finally:
+            utils.MatrixCacheSize = OldSize
+            
+    def test_matrixCache_boundsCodesNotTables(self):
+        OldSize = utils.MatrixCacheSize
+        utils.MatrixCacheSize = 2
+        try:
+            for NumBits in (4,11):
+                utils.decodeBatch(utils.genXMatrixBatch(np.zeros((2,NumBits),dtype=np.uint8)))
+                utils.genGMatrix(NumBits)
+            Misses = utils.getMatrixCacheInfo()['misses']
+            utils.decodeBatch(utils.genXMatrixBatch(np.zeros((2,4),dtype=np.uint8)))
+            utils.genRMatrix(7)
+            self.assertEqual(utils.getMatrixCacheInfo()['misses'],Misses + 1)
+            self.assertEqual(utils.getMatrixCacheInfo()['size'],2)
+        finally:
+            utils.MatrixCacheSize = OldSize
+            
+    def test_matrixCache_threadedEviction(self):
+        OldSize = utils.MatrixCacheSize
+        utils.MatrixCacheSize = 4
+        Errors = []
+        def Work(Offset):
+            try:
+                for Repeat in range(20):
+                    for NumBits in range(4 + Offset, 40, 3):
+                        Messages = np.ones((2,NumBits),dtype=np.uint8)
+                        Decoded = utils.decodeOriginalMessageBatch(utils.genXMatrixBatch(Messages))
+                        if not (Decoded == 1).all():
+                            Errors.append(NumBits)
+                        if utils._getCached(('Test',NumBits),lambda: (NumBits,)) != (NumBits,):
+                            Errors.append(NumBits)
+            except Exception as Error:
+                Errors.append(Error)
+        Threads = [threading.Thread(target=Work,args=(i % 3,)) for i in range(8)]
+        try:
+            for Thread in Threads:
+                Thread.start()
+            for Thread in Threads:
+                Thread.join()
+            Info = utils.getMatrixCacheInfo()
+            utils.clearMatrixCache()
+            Counting = [threading.Thread(target=lambda: [utils._getCached(('Test',NumBits % 9),lambda: ())
+                                                         for NumBits in range(3000)])
+                        for i in range(8)]
+            for Thread in Counting:
+                Thread.start()
+            for Thread in Counting:
+                Thread.join()
+            Counted = utils.getMatrixCacheInfo()
+        finally:
+            utils.MatrixCacheSize = OldSize
+        self.assertEqual(Errors,[])
+        self.assertLessEqual(Info['size'],4)
+        self.assertEqual(Counted['hits'] + Counted['misses'],8*3000)
+        
+    def test_matrixCache_clear(self):
+        utils.genRMatrix(7)
+        utils.clearMatrixCache()
+        Info = utils.getMatrixCacheInfo()
+        self.assertEqual((Info['hits'],Info['misses'],Info['size']),(0,0,0))
+
+class TestGenXMatrixBatch(unittest.TestCase):
+    def test_genXMatrixBatch_4(self):
+        Messages = [[1,0,1,1],
+                    [0,0,0,0],
+                    [1,1,1,1]]
+        XMatrix = utils.genXMatrixBatch(Messages)
+        self.assertEqual(XMatrix.dtype,np.uint8)
+        self.assertTrue(np.array_equal(XMatrix[0],[0,1,1,0,0,1,1]))
+        for i in range(len(Messages)):
+            self.assertTrue(np.array_equal(XMatrix[i],utils.genXMatrix(Messages[i])))
+            
+    def test_genXMatrixBatch_matchesGenXMatrix(self):
+        Rng = np.random.default_rng(1)
+        for NumBits in (1,5,11,26,300):
+            Messages = Rng.integers(0,2,(20,NumBits),dtype=np.uint8)
+            XMatrix = utils.genXMatrixBatch(Messages)
+            for i in range(len(Messages)):
+                self.assertTrue(np.array_equal(XMatrix[i],utils.genXMatrix(list(Messages[i]))))
+                
+    def test_genXMatrixBatch_not2D(self):
+        with self.assertRaises(ValueError):
+            utils.genXMatrixBatch([1,0,1,1])
+
+class TestDecodeBatch(unittest.TestCase):
+    def test_calcSyndromeVecBatch(self):
+        Recvd = [[0,1,1,0,0,1,1],
+                 [0,1,1,0,0,0,1]]
+        Syndromes = utils.calcSyndromeVecBatch(Recvd)
+        self.assertTrue(np.array_equal(Syndromes,[[0,0,0],[0,1,1]]))
+        
+    def test_translateSynVecBatch(self):
+        SynVecs = [[0,0,0,0,0],
+                   [1,0,1,0,0],
+                   [1,0,0,1,1]]
+        ErrorBits = utils.translateSynVecBatch(SynVecs)
+        self.assertTrue(np.array_equal(ErrorBits,[0,5,25]))
+        
+    def test_correctErrorInMessageBatch_outOfRange(self):
+        Messages = np.zeros((3,5),dtype=np.uint8)
+        Corrected = utils.correctErrorInMessageBatch(Messages,[0,3,7])
+        self.assertTrue(np.array_equal(Corrected,[False,True,False]))
+        self.assertTrue(np.array_equal(Messages,[[0,0,0,0,0],[0,0,1,0,0],[0,0,0,0,0]]))
+        
+    def test_decodeBatch_singleErrors(self):
+        Rng = np.random.default_rng(2)
+        for NumBits in (1,4,6,11,57):
+            OMessages = Rng.integers(0,2,(50,NumBits),dtype=np.uint8)
+            Recvd = utils.genXMatrixBatch(OMessages)
+            Length = Recvd.shape[1]
+            Flips = Rng.integers(-1,Length,50)
+            Rows = np.flatnonzero(Flips >= 0)
+            Recvd[Rows,Flips[Rows]] ^= 1
+            Decoded, Corrected = utils.decodeBatch(Recvd)
+            self.assertTrue(np.array_equal(Decoded,OMessages))
+            self.assertTrue(np.array_equal(Corrected,Flips >= 0))
+            self.assertFalse(utils.calcSyndromeVecBatch(Recvd).any())
+
+class TestPackedCodes(unittest.TestCase):
+    def test_packBits_roundTrip(self):
+        Bits = [1,0,1,1,0,0,0,1,1]
+        Packed = utils.packBits(Bits)
+        self.assertEqual(Packed,0b110001101)
+        self.assertEqual(utils.unpackBits(Packed,len(Bits)),Bits)
+        
+    def test_genParityMasks_4(self):
+        Masks = utils.genParityMasks(4)
+        self.assertEqual(Masks,(0b1010101,0b1100110,0b1111000))
+        
+    def test_genXMatrixPacked_4(self):
+        XMatrix = utils.genXMatrixPacked(utils.packBits([1,0,1,1]),4)
+        self.assertEqual(utils.unpackBits(XMatrix,7),[0,1,1,0,0,1,1])
+        
+    def test_packedPipeline(self):
+        for NumBits in (1,6,11,33,120):
+            Message = utils.genRandMessage(NumBits)
+            XMatrix = utils.genXMatrix(Message)
+            Packed = utils.genXMatrixPacked(utils.packBits(Message),NumBits)
+            self.assertEqual(utils.unpackBits(Packed,len(XMatrix)),XMatrix)
+            for ErrorBit in range(len(XMatrix)+1):
+                Recvd = utils.correctErrorInMessagePacked(Packed,ErrorBit)
+                Syndrome = utils.calcSyndromeVecPacked(Recvd,NumBits)
+                self.assertEqual(Syndrome,ErrorBit)
+                Recvd = utils.correctErrorInMessagePacked(Recvd,Syndrome)
+                OMessage = utils.decodeOriginalMessagePacked(Recvd,NumBits)
+                self.assertEqual(utils.unpackBits(OMessage,NumBits),Message)
+
+class TestCalcSyndromeXor(unittest.TestCase):
+    def test_calcSyndromeXor_noError(self):
+        Syndrome = utils.calcSyndromeXor([0,1,1,0,0,1,1])
+        self.assertEqual(Syndrome,0)
+        self.assertEqual(utils.calcSyndromeXor([0,0,0]),0)
+        
+    def test_calcSyndromeXor_matchesCalcSyndromeVec(self):
+        for NumBits in (1,4,7,26,100):
+            XMatrix = utils.genXMatrix(utils.genRandMessage(NumBits))
+            for ErrorBit in range(len(XMatrix)+1):
+                Recvd = XMatrix.copy()
+                utils.correctErrorInMessage(Recvd,ErrorBit)
+                Syndrome = utils.calcSyndromeXor(Recvd)
+                self.assertEqual(Syndrome,utils.translateSynVec(utils.calcSyndromeVec(Recvd)))
+                self.assertEqual(utils.translateSynVec(Syndrome),ErrorBit)
+                
+    def test_calcSyndromeXor_largeFrame(self):
+        Recvd = np.zeros(2**20,dtype=np.uint8)
+        Recvd[[4,9,700000]] = 1
+        self.assertEqual(utils.calcSyndromeXor(Recvd),5^10^700001)
+
+class TestGenDataIndex(unittest.TestCase):
+    def test_genDataIndex_11(self):
+        DataIndex = utils.genDataIndex(11)
+        self.assertTrue(np.array_equal(DataIndex,[2,4,5,6,8,9,10]))
+        self.assertFalse(DataIndex.flags.writeable)
+        
+    def test_genDataIndex_matchesRMatrix(self):
+        for MessLength in (3,5,7,12,31,100):
+            RMatrix = np.array(utils.genRMatrix(MessLength))
+            DataIndex = utils.genDataIndex(MessLength)
+            Messages = np.random.default_rng(MessLength).integers(0,2,(10,MessLength),dtype=np.uint8)
+            self.assertTrue(np.array_equal(utils.decodeOriginalMessageBatch(Messages),Messages @ RMatrix.T))
+            self.assertEqual(utils.decodeOriginalMessage(list(Messages[0])),list(Messages[0][DataIndex]))
+
+class TestStreaming(unittest.TestCase):
+    def test_encodeDecodeStream_roundTrip(self):
+        Data = np.random.default_rng(3).integers(0,256,10001,dtype=np.uint8).tobytes()
+        for NumBits in (1,4,11,57):
+            Encoded = io.BytesIO()
+            Stats = Streaming.encodeStream(io.BytesIO(Data),Encoded,NumBits,1024)
+            self.assertEqual(Stats['blocks'],10)
+            Decoded = io.BytesIO()
+            Stats = Streaming.decodeStream(io.BytesIO(Encoded.getvalue()),Decoded)
+            self.assertEqual(Decoded.getvalue(),Data)
+            self.assertEqual(Stats['corrected'],0)
+            
+    def test_decodeStream_correctsErrors(self):
+        Data = bytes(range(256))*4
+        Encoded = io.BytesIO()
+        Streaming.encodeStream(io.BytesIO(Data),Encoded,4,512)
+        Corrupt = bytearray(Encoded.getvalue())
+        #Flips bits 80 and 87 of the frame, which fall in different 7-bit codes.
+        Corrupt[Streaming.HEADER_SIZE + Streaming.FRAME_SIZE + 10] ^= 0x81
+        Decoded = io.BytesIO()
+        Stats = Streaming.decodeStream(io.BytesIO(bytes(Corrupt)),Decoded)
+        self.assertEqual(Decoded.getvalue(),Data)
+        self.assertEqual(Stats['corrected'],2)
+        
+    def test_decodeStream_correctsHeaderAndFrameLengths(self):
+        Data = bytes(range(256))*5
+        Encoded = io.BytesIO()
+        Streaming.encodeStream(io.BytesIO(Data),Encoded,4,512)
+        Second = Streaming.HEADER_SIZE + Streaming.FRAME_SIZE + Streaming.frameSize(512,4)
+        for Index in (0,5,Streaming.HEADER_SIZE - 1,Streaming.HEADER_SIZE,Second + 3):
+            for Bit in (0,7):
+                Corrupt = bytearray(Encoded.getvalue())
+                Corrupt[Index] ^= 1 << Bit
+                Decoded = io.BytesIO()
+                Streaming.decodeStream(io.BytesIO(bytes(Corrupt)),Decoded)
+                self.assertEqual(Decoded.getvalue(),Data)
+                
+    def test_decodeStream_rejectsBadFrameLengths(self):
+        Header = Streaming.packHeader(4,16)
+        Long = Streaming.packFrameLength(17) + Streaming.encodeBlock(bytes(17),4)
+        with self.assertRaises(ValueError):
+            Streaming.decodeStream(io.BytesIO(Header + Long),io.BytesIO())
+        Short = Streaming.packFrameLength(3) + Streaming.encodeBlock(bytes(3),4)
+        with self.assertRaises(ValueError):
+            Streaming.decodeStream(io.BytesIO(Header + Short + Short),io.BytesIO())
+            
+    def test_encodeStream_emptyInput(self):
+        Encoded = io.BytesIO()
+        Streaming.encodeStream(io.BytesIO(b''),Encoded,4)
+        Decoded = io.BytesIO()
+        Streaming.decodeStream(io.BytesIO(Encoded.getvalue()),Decoded)
+        self.assertEqual(Decoded.getvalue(),b'')
+        
+    def test_decodeStream_badHeader(self):
+        with self.assertRaises(ValueError):
+            Streaming.decodeStream(io.BytesIO(b'NOPE\x00\x04\x00\x00\x01\x00'),io.BytesIO())
+
+class TestParallel(unittest.TestCase):
+    def test_encodeParallel_matchesStreaming(self):
+        Data = np.random.default_rng(4).integers(0,256,50000,dtype=np.uint8).tobytes()
+        Expected = io.BytesIO()
+        Streaming.encodeStream(io.BytesIO(Data),Expected,11,1000)
+        Encoded = io.BytesIO()
+        Report = Parallel.encodeParallel(Data,Encoded,11,1000,Workers=2,ShardBlocks=3)
+        self.assertEqual(Encoded.getvalue(),Expected.getvalue())
+        self.assertEqual(Report['shards'],17)
+        self.assertEqual(Report['bytes'],len(Data))
+        self.assertEqual(sum(Worker['bytes'] for Worker in Report['workers'].values()),len(Data))
+        
+    def test_decodeParallel_roundTrip(self):
+        Data = np.random.default_rng(5).integers(0,256,20000,dtype=np.uint8).tobytes()
+        Encoded = io.BytesIO()
+        Streaming.encodeStream(io.BytesIO(Data),Encoded,4,999)
+        Corrupt = bytearray(Encoded.getvalue())
+        Corrupt[-1] ^= 0x02
+        Decoded = io.BytesIO()
+        Report = Parallel.decodeParallel(bytes(Corrupt),Decoded,Workers=2,ShardBlocks=4)
+        self.assertEqual(Decoded.getvalue(),Data)
+        self.assertEqual(Report['corrected'],1)
+        
+    def test_shardTask_sendsOnlyTheShard(self):
+        Data = bytearray(range(256))*4
+        self.assertEqual(Parallel._shardTask(Data,100,50),(bytes(Data[100:150]),0))
+        self.assertEqual(Parallel._shardTask('input.bin',100,50),('input.bin',100))
+
+class TestSimulation(unittest.TestCase):
+    def test_binarySymmetricChannel(self):
+        Rng = np.random.default_rng(6)
+        Errors = Channels.binarySymmetricChannel((1000,100),Rng,0.1)
+        self.assertEqual(Errors.dtype,np.uint8)
+        self.assertAlmostEqual(Errors.mean(),0.1,delta=0.005)
+        self.assertFalse(Channels.binarySymmetricChannel((10,7),Rng,0.0).any())
+        
+    def test_simulateBER_noiseless(self):
+        Report = Simulation.simulateBER(4,1000,0.0,Seed=1)
+        self.assertEqual(Report['bits'],7000)
+        self.assertEqual((Report['block_errors'],Report['corrected'],Report['post_ber']),(0,0,0.0))
+        
+    def test_simulateBER_matchesTheory(self):
+        FlipProb = 0.02
+        Report = Simulation.simulateBER(4,200000,FlipProb,Seed=2,BatchSize=30000)
+        self.assertEqual(Report['blocks'],200000)
+        self.assertAlmostEqual(Report['pre_ber'],FlipProb,delta=0.001)
+        #Hamming(7,4) is perfect: a block fails iff 2 or more bits flip.
+        Expected = 1 - (1-FlipProb)**7 - 7*FlipProb*(1-FlipProb)**6
+        self.assertAlmostEqual(Report['bler'],Expected,delta=0.0015)
+        self.assertLessEqual(Report['miscorrected'],Report['block_errors'])
+        
+    def test_simulateBER_reproducible(self):
+        First = Simulation.simulateBER(11,5000,0.05,Seed=9)
+        Second = Simulation.simulateBER(11,5000,0.05,Seed=9)
+        self.assertEqual(First,Second)
+
+class TestParallelSimulation(unittest.TestCase):
+    def test_simulateBERParallel_independentOfWorkers(self):
+        Serial = Simulation.simulateBERParallel(4,50000,0.03,Seed=7,Workers=1,ShardBlocks=6000,BatchSize=2500)
+        Pooled = Simulation.simulateBERParallel(4,50000,0.03,Seed=7,Workers=3,ShardBlocks=6000,BatchSize=2500)
+        self.assertEqual(Serial,Pooled)
+        self.assertEqual(Serial['blocks'],50000)
+        
+    def test_simulateBERParallel_seedMatters(self):
+        First = Simulation.simulateBERParallel(4,20000,0.03,Seed=7,Workers=1,ShardBlocks=5000)
+        Second = Simulation.simulateBERParallel(4,20000,0.03,Seed=8,Workers=1,ShardBlocks=5000)
+        self.assertNotEqual(First['channel_errors'],Second['channel_errors'])
+        
+    def test_genRandMessage_seededRng(self):
+        First = utils.genRandMessage(50,random.Random(3))
+        Second = utils.genRandMessage(50,random.Random(3))
+        self.assertEqual(First,Second)
+        SendVec = utils.genPossibleTransError(utils.genXMatrix(First),random.Random(3))
+        self.assertEqual(SendVec,utils.genPossibleTransError(utils.genXMatrix(Second),random.Random(3)))
+
+class TestEarlyStopping(unittest.TestCase):
+    def test_wilsonInterval(self):
+        Low, High = Simulation.wilsonInterval(50,1000)
+        self.assertTrue(Low < 0.05 < High)
+        self.assertAlmostEqual(Low,0.0381,places=3)
+        self.assertAlmostEqual(High,0.0653,places=3)
+        self.assertEqual(Simulation.wilsonInterval(0,0),(0.0,1.0))
+        
+    def test_simulateUntilConverged_targetRelError(self):
+        Channel = functools.partial(Channels.binarySymmetricChannel,FlipProb=0.05)
+        Report = Simulation.simulateUntilConverged(4,Channel,np.random.default_rng(1),TargetRelError=0.1,BatchSize=1000)
+        self.assertTrue(Report['converged'])
+        self.assertLessEqual(Report['rel_error'],0.1)
+        self.assertTrue(Report['ci_low'] <= Report['post_ber'] <= Report['ci_high'])
+        
+    def test_simulateUntilConverged_minErrorsAndMaxBlocks(self):
+        Channel = functools.partial(Channels.binarySymmetricChannel,FlipProb=0.05)
+        Report = Simulation.simulateUntilConverged(4,Channel,np.random.default_rng(1),TargetRelError=None,
+                                                   MinErrors=30,Metric='bler',BatchSize=100)
+        self.assertGreaterEqual(Report['block_errors'],30)
+        self.assertLess(Report['block_errors'] - 30,100)
+        Report = Simulation.simulateUntilConverged(4,Channel,np.random.default_rng(1),TargetRelError=0.0001,
+                                                   MaxBlocks=2500,BatchSize=1000)
+        self.assertFalse(Report['converged'])
+        self.assertEqual(Report['blocks'],2500)
+        
+    def test_sweepBER_yieldsEachPoint(self):
+        Reports = list(Simulation.sweepBER(4,[0.1,0.02],Seed=3,MinErrors=50,TargetRelError=None,BatchSize=2000))
+        self.assertEqual([Report['flip_prob'] for Report in Reports],[0.1,0.02])
+        self.assertGreater(Reports[1]['blocks'],Reports[0]['blocks'])
+
+class TestBurstChannels(unittest.TestCase):
+    def test_fixedBurstChannel(self):
+        Errors = Channels.fixedBurstChannel((50,8),np.random.default_rng(1),0.01,3)
+        Positions = np.flatnonzero(Errors.ravel())
+        self.assertGreater(len(Positions),0)
+        #Every flipped bit belongs to a run of at least 3 (except at the end).
+        Runs = np.split(Positions,np.flatnonzero(np.diff(Positions) > 1) + 1)
+        for Run in Runs:
+            self.assertTrue(len(Run) >= 3 or Run[-1] == Errors.size - 1)
+            
+    def test_gilbertElliottChannel_averageRate(self):
+        Errors = Channels.gilbertElliottChannel((200000,7),np.random.default_rng(2),0.01,0.3,0.0,0.5)
+        Expected = 0.01/(0.01 + 0.3)*0.5
+        self.assertAlmostEqual(Errors.mean(),Expected,delta=0.002)
+        with self.assertRaises(ValueError):
+            Channels.gilbertElliottChannel((10,7),np.random.default_rng(2),0.0,0.3)
+            
+    def test_interleave_isView(self):
+        Codes = np.arange(24,dtype=np.uint8).reshape(6,4)
+        Stream = Channels.interleave(Codes,3)
+        self.assertEqual(Stream.shape,(2,4,3))
+        self.assertTrue(np.shares_memory(Stream,Codes))
+        self.assertTrue(np.array_equal(Stream[0,0],[0,4,8]))
+        Stream[0,0,1] = 99
+        self.assertEqual(Codes[1,0],99)
+        self.assertTrue(np.array_equal(Channels.deinterleave(Stream),Codes))
+        with self.assertRaises(ValueError):
+            Channels.interleave(Codes,4)
+            
+    def test_interleavingBeatsBursts(self):
+        Channel = functools.partial(Channels.fixedBurstChannel,BurstRate=0.002,BurstLength=4)
+        Plain = Simulation.simulateChannel(4,40000,Channel,np.random.default_rng(1),Depth=1)
+        Interleaved = Simulation.simulateChannel(4,40000,Channel,np.random.default_rng(1),Depth=8)
+        self.assertLess(Interleaved['block_errors']*4,Plain['block_errors'])
+
+class TestUpdateSyndrome(unittest.TestCase):
+    def test_updateSyndrome_matchesRecompute(self):
+        XMatrix = utils.genXMatrix(utils.genRandMessage(26))
+        Syndrome = utils.calcSyndromeVec(XMatrix)
+        Recvd = XMatrix.copy()
+        Flips = [3,17,30,3,8]
+        for Bit in Flips:
+            Recvd[Bit-1] = Recvd[Bit-1]^1
+        self.assertEqual(utils.updateSyndrome(Syndrome,Flips),utils.calcSyndromeVec(Recvd))
+        self.assertEqual(utils.updateSyndrome(0,Flips),utils.calcSyndromeXor(Recvd))
+        
+    def test_updateSyndrome_outOfRange(self):
+        with self.assertRaises(ValueError):
+            utils.updateSyndrome([0,0,0],[8])
+        for Flips in ([-1],[0],[8,8]):
+            with self.assertRaises(ValueError):
+                utils.updateSyndrome([0,0,0],Flips)
+        for Flips in ([-1],[0],[8]):
+            with self.assertRaises(ValueError):
+                utils.updateSyndrome(0,Flips,MessLength=7)
+        with self.assertRaises(ValueError):
+            utils.updateSyndrome([0,0,0],[7],MessLength=6)
+        self.assertEqual(utils.updateSyndrome(0,[5,3]),6)
+            
+    def test_correctErrorInMessage_keepsSyndrome(self):
+        Recvd = [0,1,1,0,0,0,1]
+        Syndrome = utils.calcSyndromeVec(Recvd)
+        utils.correctErrorInMessage(Recvd,utils.translateSynVec(Syndrome),Syndrome)
+        self.assertEqual(Recvd,[0,1,1,0,0,1,1])
+        self.assertEqual(Syndrome,[0,0,0])
+
+class TestSparseSyndromes(unittest.TestCase):
+    def test_calcSyndromeSparse_matchesCalcSyndromeVec(self):
+        XMatrix = utils.genXMatrix(utils.genRandMessage(11))
+        Recvd = XMatrix.copy()
+        for Bit in (2,9,14):
+            Recvd[Bit-1] = Recvd[Bit-1]^1
+        self.assertEqual(utils.calcSyndromeSparse([2,9,14],11),utils.calcSyndromeVec(Recvd))
+        self.assertEqual(utils.calcSyndromeSparse([],11),[0,0,0,0])
+        with self.assertRaises(ValueError):
+            utils.calcSyndromeSparse([16],11)
+            
+    def test_calcSyndromeSparseBatch(self):
+        Syndromes = utils.calcSyndromeSparseBatch([0,0,2,2,2],[3,5,1,2,4],4)
+        self.assertTrue(np.array_equal(Syndromes,[6,0,7,0]))
+        
+    def test_sparseBinarySymmetricChannel(self):
+        Rows, ErrorBits = Channels.sparseBinarySymmetricChannel(100000,7,np.random.default_rng(4),0.01)
+        self.assertAlmostEqual(len(Rows)/700000,0.01,delta=0.001)
+        self.assertTrue(np.all(np.diff(Rows*8 + ErrorBits) > 0))
+        self.assertTrue(ErrorBits.min() >= 1 and ErrorBits.max() <= 7)
+        
+    def test_simulateBERSparse_matchesTheory(self):
+        FlipProb = 0.02
+        Report = Simulation.simulateBERSparse(4,300000,FlipProb,Seed=5)
+        Expected = 1 - (1-FlipProb)**7 - 7*FlipProb*(1-FlipProb)**6
+        self.assertAlmostEqual(Report['pre_ber'],FlipProb,delta=0.001)
+        self.assertAlmostEqual(Report['bler'],Expected,delta=0.0015)
+        self.assertLessEqual(Report['miscorrected'],Report['block_errors'])
+        
+    def test_simulateBERSparse_agreesWithDense(self):
+        Dense = Simulation.simulateBER(11,200000,0.01,Seed=6)
+        Sparse = Simulation.simulateBERSparse(11,200000,0.01,Seed=6)
+        self.assertEqual(Dense['bits'],Sparse['bits'])
+        self.assertAlmostEqual(Dense['bler'],Sparse['bler'],delta=0.002)
+        self.assertAlmostEqual(Dense['post_ber'],Sparse['post_ber'],delta=0.0005)
+
+class TestHammingCode(unittest.TestCase):
+    def test_HammingCode_shape(self):
+        Code = Codec.HammingCode(4)
+        self.assertEqual((Code.Length,Code.NumParity),(7,3))
+        self.assertEqual(Code.DataIndex,(2,4,5,6))
+        self.assertFalse(hasattr(Code,'__dict__'))
+        with self.assertRaises(ValueError):
+            Codec.HammingCode(0)
+            
+    def test_HammingCode_encode_4(self):
+        Code = Codec.HammingCode(4)
+        XMatrix = Code.encode(utils.packBits([1,0,1,1]))
+        self.assertEqual(utils.unpackBits(XMatrix,7),[0,1,1,0,0,1,1])
+        
+    def test_HammingCode_matchesUtilities(self):
+        for NumBits in (1,5,11,26,57):
+            Code = Codec.HammingCode(NumBits)
+            Message = utils.genRandMessage(NumBits)
+            XMatrix = utils.genXMatrix(Message)
+            Packed = Code.encode(utils.packBits(Message))
+            self.assertEqual(utils.unpackBits(Packed,Code.Length),XMatrix)
+            for ErrorBit in range(Code.Length+1):
+                Recvd = utils.correctErrorInMessagePacked(Packed,ErrorBit)
+                self.assertEqual(Code.syndrome(Recvd),ErrorBit)
+                self.assertEqual(Code.correct(Recvd),Packed)
+                self.assertEqual(utils.unpackBits(Code.decode(Code.correct(Recvd)),NumBits),Message)
+                
+    def test_HammingCode_syndromePastEnd(self):
+        Code = Codec.HammingCode(5)
+        #Positions 7 and 8 flipped in the (9,5) code: syndrome 15 is past the end.
+        Recvd = (1 << 6) | (1 << 7)
+        self.assertEqual(Code.syndrome(Recvd),15)
+        self.assertEqual(Code.correct(Recvd),Recvd)
+
+class TestTableCodec74(unittest.TestCase):
+    def test_ENCODE74_matchesGenXMatrix(self):
+        for Nibble in range(16):
+            Message = [(Nibble >> Shift) & 1 for Shift in (3,2,1,0)]
+            Code = np.unpackbits(np.array([Codec.ENCODE74[0][Nibble]],dtype=np.uint8)).tolist()
+            self.assertEqual(Code[:7],utils.genXMatrix(Message))
+            self.assertEqual(Code[7],0)
+            Code = np.unpackbits(np.array([Codec.ENCODE74[1][Nibble]],dtype=np.uint8)).tolist()
+            self.assertEqual(sum(Code) % 2,0)
+            
+    def test_encodeBytes74_matchesBatchEncoder(self):
+        Data = bytes(range(256))
+        Encoded = np.frombuffer(Codec.encodeBytes74(bytearray(Data)),dtype=np.uint8)
+        Codes = np.unpackbits(Encoded).reshape(-1,8)[:,:7]
+        self.assertTrue(np.array_equal(Codes,utils.genXMatrixBatch(Streaming.bytesToMessages(Data,4))))
+        
+    def test_decodeBytes74_correctsSingleErrors(self):
+        Data = np.random.default_rng(7).integers(0,256,4096,dtype=np.uint8).tobytes()
+        for Extended in (False,True):
+            Encoded = np.frombuffer(Codec.encodeBytes74(Data,Extended),dtype=np.uint8).copy()
+            Flips = np.random.default_rng(8).integers(1,8,len(Encoded))
+            Encoded ^= np.left_shift(1,Flips).astype(np.uint8)
+            self.assertEqual(Codec.decodeBytes74(memoryview(Encoded),Extended),Data)
+            self.assertEqual(Codec.checkBytes74(Encoded,Extended),{'corrected':len(Encoded),'uncorrectable':0})
+            
+    def test_checkBytes74_detectsDoubleErrors(self):
+        Encoded = bytearray(Codec.encodeBytes74(b'\x5a',Extended=True))
+        Encoded[1] ^= 0b00110000
+        self.assertEqual(Codec.checkBytes74(Encoded,Extended=True),{'corrected':0,'uncorrectable':1})
+
+class TestBitSlice(unittest.TestCase):
+    def test_sliceBits_roundTrip(self):
+        Rows = np.random.default_rng(9).integers(0,2,(130,5),dtype=np.uint8)
+        Slices = BitSlice.sliceBits(Rows)
+        self.assertEqual(Slices.shape,(5,3))
+        self.assertEqual(int(Slices[2,1]) & 1,Rows[64,2])
+        self.assertTrue(np.array_equal(BitSlice.unsliceBits(Slices,130),Rows))
+        
+    def test_encodeBatchSliced_matchesBatch(self):
+        for NumBits in (1,4,11,57):
+            Messages = np.random.default_rng(NumBits).integers(0,2,(200,NumBits),dtype=np.uint8)
+            self.assertTrue(np.array_equal(BitSlice.encodeBatchSliced(Messages),utils.genXMatrixBatch(Messages)))
+            
+    def test_decodeBatchSliced_singleErrors(self):
+        Rng = np.random.default_rng(10)
+        for NumBits in (4,6,26):
+            Messages = Rng.integers(0,2,(300,NumBits),dtype=np.uint8)
+            Recvd = utils.genXMatrixBatch(Messages)
+            Flips = Rng.integers(-1,Recvd.shape[1],300)
+            Rows = np.flatnonzero(Flips >= 0)
+            Recvd[Rows,Flips[Rows]] ^= 1
+            Decoded, Corrected = BitSlice.decodeBatchSliced(Recvd)
+            self.assertTrue(np.array_equal(Decoded,Messages))
+            self.assertTrue(np.array_equal(Corrected,Flips >= 0))
+
+class TestGF2(unittest.TestCase):
+    def test_multiply_matchesIntegerProduct(self):
+        Rng = np.random.default_rng(11)
+        for Shape in ((5,3,7),(40,77,130),(1,9,1),(6,0,3)):
+            Left = Rng.integers(0,2,Shape[:2],dtype=np.uint8)
+            Right = Rng.integers(0,2,Shape[1:],dtype=np.uint8)
+            Product = GF2.multiply(Left,Right)
+            self.assertTrue(np.array_equal(Product,(Left.astype(int) @ Right) % 2))
+            
+    def test_multiplyVector(self):
+        Matrix = np.array(utils.genHMatrix(4))
+        Syndrome = GF2.multiplyVector(GF2.packRows(Matrix),[0,1,1,0,0,0,1])
+        self.assertTrue(np.array_equal(Syndrome,[0,1,1]))
+        
+    def test_multiplyPacked_out(self):
+        Rng = np.random.default_rng(13)
+        Left = Rng.integers(0,2,(30,20),dtype=np.uint8)
+        Right = Rng.integers(0,2,(20,13),dtype=np.uint8)
+        Buffer = np.full((30,16),7,dtype=np.uint8)
+        Product = GF2.multiplyPacked(Left,GF2.packRows(Right),13,Out=Buffer[:,2:15])
+        self.assertTrue(np.shares_memory(Product,Buffer))
+        self.assertTrue(np.array_equal(Buffer[:,2:15],(Left.astype(int) @ Right) % 2))
+        self.assertTrue((Buffer[:,:2] == 7).all() and (Buffer[:,15] == 7).all())
+        with self.assertRaises(ValueError):
+            GF2.multiplyPacked(Left,GF2.packRows(Right),13,Out=Buffer)
+            
+    def test_multiply_shapeMismatch(self):
+        with self.assertRaises(ValueError):
+            GF2.multiply(np.ones((2,3)),np.ones((4,2)))
+        Packed = GF2.packRows(np.ones((3,7),dtype=np.uint8))
+        for Vector in ([1]*6,[1]*9):
+            with self.assertRaises(ValueError):
+                GF2.multiplyVector(Packed,Vector,7)
+        with self.assertRaises(ValueError):
+            GF2.multiplyVector(Packed,[1]*9)
+            
+    def test_multiplyPacked_tables(self):
+        Rng = np.random.default_rng(14)
+        Left = Rng.integers(0,2,(50,21),dtype=np.uint8)
+        Right = Rng.integers(0,2,(21,19),dtype=np.uint8)
+        Packed = GF2.packRows(Right)
+        Tables = GF2.buildTables(Packed)
+        self.assertEqual(Tables.shape,(3,256,3))
+        self.assertTrue(np.array_equal(GF2.multiplyPacked(Left,Packed,19,Tables=Tables),
+                                       (Left.astype(int) @ Right) % 2))
+        with self.assertRaises(ValueError):
+            GF2.multiplyPacked(Left[:,:16],Packed[:16],19,Tables=Tables)
+            
+    def test_largeCodesUseGF2(self):
+        OldThreshold = utils.GF2Threshold
+        Messages = np.random.default_rng(12).integers(0,2,(utils.GF2RowThreshold,40),dtype=np.uint8)
+        try:
+            utils.GF2Threshold = 10**9
+            Expected = utils.genXMatrixBatch(Messages)
+            ExpectedSyn = utils.calcSyndromeVec(list(Expected[0] ^ 1))
+        finally:
+            utils.GF2Threshold = OldThreshold
+        self.assertTrue(np.array_equal(utils.genXMatrixBatch(Messages),Expected))
+        self.assertTrue(np.array_equal(utils.genXMatrixBatch(Messages[:5]),Expected[:5]))
+        self.assertEqual(utils.genXMatrix(list(Messages[3])),list(Expected[3]))
+        self.assertEqual(utils.calcSyndromeVec(list(Expected[0] ^ 1)),ExpectedSyn)
+
+class TestMatrixStore(unittest.TestCase):
+    def setUp(self):
+        self.Directory = tempfile.mkdtemp()
+        
+    def tearDown(self):
+        shutil.rmtree(self.Directory)
+        utils.clearMatrixCache()
+        
+    def test_getMatrix_roundTrip(self):
+        Matrix = MatrixStore.getMatrix('G',11,self.Directory)
+        self.assertIsInstance(Matrix,np.memmap)
+        self.assertFalse(Matrix.flags.writeable)
+        self.assertTrue(np.array_equal(Matrix,utils.genGMatrix(11)))
+        self.assertTrue(np.array_equal(MatrixStore.loadMatrix('G',11,self.Directory),Matrix))
+        
+    def test_loadMatrix_missingOrCorrupt(self):
+        self.assertIsNone(MatrixStore.loadMatrix('H',4,self.Directory))
+        Path = MatrixStore.saveMatrix('H',4,np.array(utils.genHMatrix(4)),self.Directory)
+        Stat = os.stat(Path)
+        with open(Path,'r+b') as File:
+            File.seek(-1,2)
+            File.write(b'\x07')
+        #Within one clock tick the write may not move the modification time.
+        os.utime(Path,ns=(Stat.st_atime_ns,Stat.st_mtime_ns + 1))
+        self.assertIsNone(MatrixStore.loadMatrix('H',4,self.Directory))
+        self.assertTrue(np.array_equal(MatrixStore.getMatrix('H',4,self.Directory),utils.genHMatrix(4)))
+        
+    def test_loadMatrix_hashesOnce(self):
+        Path = MatrixStore.saveMatrix('G',8,np.array(utils.genGMatrix(8)),self.Directory)
+        with open(Path + '.sha256','rb') as File:
+            Digest = File.read().split()[0]
+        #A checksum file without a stamp (or a stale one) is checked once, then adopted.
+        with open(Path + '.sha256','wb') as File:
+            File.write(Digest)
+        Calls = []
+        Original = MatrixStore._fileDigest
+        MatrixStore._fileDigest = lambda Path: Calls.append(Path) or Original(Path)
+        try:
+            for Repeat in range(3):
+                self.assertIsNotNone(MatrixStore.loadMatrix('G',8,self.Directory))
+        finally:
+            MatrixStore._fileDigest = Original
+        self.assertEqual(len(Calls),1)
+        
+    def test_loadCodeTables(self):
+        utils.clearMatrixCache()
+        MatrixStore.loadCodeTables(8,self.Directory)
+        #Building the store does not leave the tuple matrices in the cache.
+        self.assertEqual(utils.getMatrixCacheInfo()['tables'],3)
+        utils.clearMatrixCache()
+        MatrixStore.loadCodeTables(8,self.Directory)
+        Messages = np.random.default_rng(13).integers(0,2,(5,8),dtype=np.uint8)
+        Encoded = utils.genXMatrixBatch(Messages)
+        self.assertEqual(utils.getMatrixCacheInfo()['misses'],0)
+        self.assertTrue(np.array_equal(utils.decodeOriginalMessageBatch(Encoded),Messages))
+        
+    def test_unknownKind(self):
+        with self.assertRaises(ValueError):
+            MatrixStore.matrixPath('X',4,self.Directory)
+        
+
+class TestSharedTables(unittest.TestCase):
+    def tearDown(self):
+        SharedTables.detachTables()
+        
+    def test_attachTables_sharesMemory(self):
+        with SharedTables.SharedTables() as Registry:
+            Handle = Registry.publishCode(8)
+            Tables = SharedTables.attachTables(Handle,Install=False)
+            Other = SharedTables.attachTables(Handle,Install=False)
+            for Key, Table in utils.getCodeTables(8).items():
+                self.assertTrue(np.array_equal(Tables[Key],Table))
+                self.assertFalse(Tables[Key].flags.writeable)
+                self.assertTrue(np.shares_memory(Tables[Key],Other[Key]))
+                
+    def test_installedTablesAreUsed(self):
+        with SharedTables.SharedTables() as Registry:
+            Handle = Registry.publishCode(11)
+            utils.clearMatrixCache()
+            SharedTables.attachTables(Handle)
+            Messages = np.random.default_rng(14).integers(0,2,(6,11),dtype=np.uint8)
+            Decoded, Corrected = utils.decodeBatch(utils.genXMatrixBatch(Messages))
+            self.assertTrue(np.array_equal(Decoded,Messages))
+            self.assertEqual(utils.getMatrixCacheInfo()['misses'],0)
+            
+    def test_referenceCounting(self):
+        with SharedTables.SharedTables() as Registry:
+            First = Registry.publishCode(4)
+            Second = Registry.publishCode(4)
+            self.assertEqual(First,Second)
+            self.assertEqual(Registry.refCount(('GArray',4)),2)
+            Registry.release(First)
+            self.assertEqual(Registry.refCount(('GArray',4)),1)
+            Registry.release(Second)
+            self.assertEqual(Registry.refCount(('GArray',4)),0)
+            
+
+class TestBufferAPI(unittest.TestCase):
+    def test_encodeInto_matchesBatch(self):
+        for NumBits in (4,26):
+            Messages = np.random.default_rng(15).integers(0,2,(9,NumBits),dtype=np.uint8)
+            Out = bytearray(9*len(utils.genGMatrix(NumBits)))
+            View = utils.encodeInto(memoryview(Messages.tobytes()),Out,NumBits)
+            self.assertTrue(np.shares_memory(View,np.frombuffer(Out,dtype=np.uint8)))
+            self.assertEqual(bytes(Out),utils.genXMatrixBatch(Messages).tobytes())
+            
+    def test_decodeInto_correctsIntoOut(self):
+        Messages = np.random.default_rng(16).integers(0,2,(8,4),dtype=np.uint8)
+        Recvd = utils.genXMatrixBatch(Messages)
+        for Row in range(7):
+            Recvd[Row,Row] ^= 1
+        Received = Recvd.tobytes()
+        Out = np.empty((8,4),dtype=np.uint8)
+        Corrected = np.empty(8,dtype=bool)
+        utils.decodeInto(Received,Out,4,Corrected)
+        self.assertTrue(np.array_equal(Out,Messages))
+        self.assertEqual(Corrected.tolist(),[True]*7+[False])
+        self.assertEqual(Received,Recvd.tobytes())
+        
+    def test_badBuffers(self):
+        with self.assertRaises(ValueError):
+            utils.encodeInto(bytes(8),bytearray(7),4)
+        with self.assertRaises(ValueError):
+            utils.encodeInto(bytes(8),bytes(14),4)
+        with self.assertRaises(ValueError):
+            utils.decodeInto(bytes(10),bytearray(4),4)
+            
+
+class TestService(unittest.TestCase):
+    def test_processBatch_isolatesFailures(self):
+        Good = [Streaming.encodeBlock(Block,4) for Block in (b'abc',b'hi')]
+        #A payload that is not bytes-like makes its whole group fail at first.
+        Batch = [(Service.OP_DECODE,4,3,Good[0],None),(Service.OP_DECODE,4,3,'abc',None),
+                 (Service.OP_DECODE,4,2,Good[1],None),(Service.OP_ENCODE,4,2,b'hi',None)]
+        Results = Service._processBatch(Batch)
+        self.assertEqual(Results[0],(0,b'abc'))
+        self.assertIsInstance(Results[1],Exception)
+        self.assertEqual(Results[2],(0,b'hi'))
+        self.assertEqual(Results[3],(0,Good[1]))
+        
+    def test_encodeBlocks_matchesEncodeBlock(self):
+        Blocks = [b'', b'a', bytes(range(50)), b'xyz']
+        Payloads = Streaming.encodeBlocks(Blocks,11)
+        self.assertEqual(Payloads,[Streaming.encodeBlock(Block,11) for Block in Blocks])
+        Frames = [(len(Block),Payload) for Block, Payload in zip(Blocks,Payloads)]
+        self.assertEqual(Streaming.decodeBlocks(Frames,11),[(Block,0) for Block in Blocks])
+        
+    def test_roundTripAndErrors(self):
+        async def Run():
+            async with Service.FECServer() as Server:
+                Host, Port = (await Server.start())[:2]
+                Client = await Service.FECClient.connect(Host,Port)
+                Blocks = [bytes([i])*i for i in range(1,20)]
+                Payloads = await asyncio.gather(*[Client.encode(Block,4) for Block in Blocks])
+                Bad = bytearray(Payloads[5])
+                Bad[0] ^= 0x80
+                Decoded = await Client.decode(bytes(Bad),len(Blocks[5]),4)
+                with self.assertRaises(ValueError):
+                    await Client.request(Service.OP_DECODE,4,5,b'x')
+                Final = await Client.encode(b'end',4)
+                await Client.close()
+            return Blocks, Payloads, Decoded, Final
+        Blocks, Payloads, Decoded, Final = asyncio.run(Run())
+        self.assertEqual(list(Payloads),[Streaming.encodeBlock(Block,4) for Block in Blocks])
+        self.assertEqual(Decoded,(Blocks[5],1))
+        self.assertEqual(Final,Streaming.encodeBlock(b'end',4))
+        
+    def test_loopbackTest(self):
+        Report = asyncio.run(Service.loopbackTest(NumBits=8,FrameSize=64,NumFrames=200,
+                                                  Connections=2,Concurrency=8,
+                                                  Op=Service.OP_DECODE))
+        self.assertEqual(Report['frames'],200)
+        self.assertEqual(Report['server']['requests'],200)
+        self.assertLessEqual(Report['server']['batches'],200)
+        self.assertLessEqual(Report['p50_ms'],Report['p99_ms'])
+        
+    def test_rejectsOversizedCodes(self):
+        self.assertIsNotNone(Service._checkRequest(Service.OP_ENCODE,65535,0,0))
+        self.assertIsNotNone(Service._checkRequest(Service.OP_ENCODE,0,0,0))
+        self.assertIsNone(Service._checkRequest(Service.OP_ENCODE,Service.DEFAULT_MAX_NUMBITS,0,0))
+        async def Run():
+            async with Service.FECServer(MaxNumBits=16) as Server:
+                Host, Port = (await Server.start())[:2]
+                Client = await Service.FECClient.connect(Host,Port)
+                with self.assertRaises(ValueError):
+                    await Client.encode(b'',65535)
+                with self.assertRaises(ValueError):
+                    await Client.encode(b'ab',17)
+                Final = await Client.encode(b'ab',16)
+                await Client.close()
+            return Final
+        self.assertEqual(asyncio.run(Run()),Streaming.encodeBlock(b'ab',16))
+        
+
+class TestPipeline(unittest.TestCase):
+    def test_runPipeline_ordered(self):
+        Stages = [Pipeline.Stage('double',functools.partial(operator.mul,2),Workers=3),
+                  Pipeline.Stage('inc',functools.partial(operator.add,1),QueueSize=2)]
+        Report = Pipeline.runPipeline(range(50),Stages,Ordered=True)
+        self.assertEqual(Report['results'],[2*i + 1 for i in range(50)])
+        self.assertEqual(Report['items'],50)
+        self.assertEqual(Report['stages']['double']['items'],50)
+        self.assertLessEqual(Report['stages']['inc']['max_queue_depth'],2)
+        
+    def test_runPipeline_error(self):
+        with self.assertRaises(ZeroDivisionError):
+            Pipeline.runPipeline(range(-5,5),[Pipeline.Stage('inv',functools.partial(operator.truediv,1))])
+            
+    def test_hammingPipeline_matchesStages(self):
+        Counts, Report = Pipeline.hammingPipeline(4,5000,0.02,Seed=17,BatchSize=512,
+                                                  Workers={'channel':2})
+        self.assertEqual(Counts['blocks'],5000)
+        self.assertEqual(Counts['bits'],35000)
+        self.assertGreater(Counts['corrected'],0)
+        self.assertEqual(list(Report['stages']),['generate','encode','channel','syndrome','correct','decode'])
+        for Stats in Report['stages'].values():
+            self.assertEqual(Stats['items'],10)
+            self.assertGreaterEqual(Stats['utilisation'],0.0)
+            
+    def test_processStage(self):
+        Counts, Report = Pipeline.hammingPipeline(4,2000,0.0,Seed=18,BatchSize=500,
+                                                  Kinds={'encode':'process'})
+        self.assertEqual(Counts['block_errors'],0)
+        self.assertEqual(Report['stages']['encode']['kind'],'process')
+        
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        Instrumentation.reset()
+        
+    def tearDown(self):
+        Instrumentation.disable()
+        Instrumentation.reset()
+        
+    def test_enableDisable(self):
+        Original = utils.genXMatrixBatch
+        Instrumentation.enable()
+        self.assertTrue(Instrumentation.isEnabled())
+        self.assertIsNot(utils.genXMatrixBatch,Original)
+        Instrumentation.disable()
+        self.assertIs(utils.genXMatrixBatch,Original)
+        utils.genXMatrixBatch(np.zeros((3,4),dtype=np.uint8))
+        self.assertEqual(Instrumentation.snapshot()['functions'],{})
+        
+    def test_countsCallsBytesAndBlocks(self):
+        Messages = np.random.default_rng(19).integers(0,2,(10,4),dtype=np.uint8)
+        Instrumentation.enable()
+        utils.clearMatrixCache()
+        for i in range(3):
+            Decoded, Corrected = utils.decodeBatch(utils.genXMatrixBatch(Messages))
+        Metrics = Instrumentation.snapshot()
+        Encode = Metrics['functions']['genXMatrixBatch']
+        self.assertEqual(Encode['calls'],3)
+        self.assertEqual(Encode['blocks'],30)
+        self.assertEqual(Encode['bytes'],120)
+        self.assertLessEqual(Encode['self_seconds'],Encode['seconds'])
+        self.assertLessEqual(Encode['p50'],Encode['p99'])
+        self.assertEqual(Metrics['functions']['calcSyndromeVecBatch']['calls'],3)
+        self.assertEqual(Metrics['functions']['_buildMatrixArray']['calls'],2)
+        self.assertGreater(Metrics['build_seconds'],0)
+        self.assertGreater(Metrics['multiply_seconds'],0)
+        self.assertGreater(Metrics['matrix_cache']['hits'],0)
+        
+    def test_exporters(self):
+        Instrumentation.enable()
+        utils.genXMatrix([1,0,1,1])
+        Text = Instrumentation.toPrometheus()
+        self.assertIn('hamming_latency_seconds_count{function="genXMatrix"} 1',Text)
+        self.assertIn('# TYPE hamming_matrix_cache_hits_total counter',Text)
+        Cache = utils.getMatrixCacheInfo()
+        self.assertIn('hamming_matrix_cache_codes %d' % Cache['size'],Text)
+        self.assertIn('hamming_matrix_cache_tables %d' % Cache['tables'],Text)
+        Directory = tempfile.mkdtemp()
+        try:
+            Path = Directory + '/metrics.json'
+            Instrumentation.writeMetrics(Path)
+            with open(Path) as File:
+                self.assertEqual(json.load(File)['functions']['genXMatrix']['calls'],1)
+        finally:
+            shutil.rmtree(Directory)
+            
         
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -28,12 +28,336 @@ methods and business logic used in Hamming.py are defined in this file.
 """
 import random
 import math
+import numbers
+import operator
+import threading
+from collections import OrderedDict
+import numpy as np
+import GF2
+
+#Bounded LRU cache shared by genGMatrix, genHMatrix, genRMatrix and the 
+#tables derived from them.  Tables are grouped per code (by its number of 
+#data bits), and MatrixCacheSize bounds the number of codes, so all the tables 
+#of a code are kept or evicted together.  Entries are stored read-only (tuples 
+#of tuples or read-only arrays), so callers can never corrupt a matrix handed 
+#out to someone else.  _MatrixCacheLock guards the cache and its counters; 
+#entries are built outside it, so a slow build does not hold up other codes.
+MatrixCacheSize = 64
+_MatrixCache = OrderedDict()
+_MatrixCacheLock = threading.Lock()
+_MatrixCacheHits = 0
+_MatrixCacheMisses = 0
+
+#Codes with at least GF2Threshold data bits are multiplied with the 
+#bit-packed GF(2) routines in GF2.py instead of the element-by-element 
+#products; the batch functions also need GF2RowThreshold messages, since 
+#below that a uint8 matrix product is faster.  The lookup tables of the GF(2) 
+#products are cached with the matrices while they take at most GF2TableBytes.
+GF2Threshold = 16
+GF2RowThreshold = 256
+GF2TableBytes = 1 << 26
+
+#Cache kinds whose size is the code (message) length rather than the number 
+#of data bits.
+_CODE_LENGTH_KINDS = ('R', 'RArray', 'DataIndex', 'DataColumns')
+
+def _cacheCode(Key):
+    """Returns the code (number of data bits) a cache key belongs to."""
+    Kind, Size = Key[0], operator.index(Key[1])
+    if Kind in _CODE_LENGTH_KINDS:
+        return Size - max(Size - 1, 0).bit_length()
+    return Size
+
+def _getCached(Key, Builder):
+    """
+    Returns the cached entry for Key, building (and caching) it with Builder 
+    on a miss.  The tables of the least recently used code are evicted once 
+    the cache holds more than MatrixCacheSize codes.
+
+    Parameters
+    ----------
+    Key : tuple
+        The cache key, (kind, size).
+    Builder : callable
+        Zero-argument function producing the (read-only) entry.
+
+    Returns
+    -------
+    Entry : object
+        The cached entry.
+
+    """
+    global _MatrixCacheHits, _MatrixCacheMisses
+    Code = _cacheCode(Key)
+    with _MatrixCacheLock:
+        Entry = _MatrixCache.get(Code, {}).get(Key)
+        if Entry is not None:
+            _MatrixCacheHits = _MatrixCacheHits + 1
+            _MatrixCache.move_to_end(Code)
+            return Entry
+        _MatrixCacheMisses = _MatrixCacheMisses + 1
+    Entry = Builder()
+    with _MatrixCacheLock:
+        #Another thread may have built the same entry meanwhile; keep theirs.
+        Entry = _MatrixCache.get(Code, {}).get(Key, Entry)
+        _storeLocked(Code, Key, Entry)
+    return Entry
+
+def _storeLocked(Code, Key, Entry):
+    """Inserts Entry under Key, evicting the least recently used codes.  The 
+    caller holds _MatrixCacheLock."""
+    _MatrixCache.setdefault(Code, {})[Key] = Entry
+    _MatrixCache.move_to_end(Code)
+    while len(_MatrixCache) > max(MatrixCacheSize, 0):
+        _MatrixCache.popitem(last=False)
+
+def _storeCached(Key, Entry):
+    """Inserts Entry under Key, evicting the least recently used codes."""
+    Code = _cacheCode(Key)
+    with _MatrixCacheLock:
+        _storeLocked(Code, Key, Entry)
+
+def _freezeMatrix(Matrix):
+    """Converts a list-of-lists matrix into an immutable tuple of tuples."""
+    return tuple(tuple(Row) for Row in Matrix)
+
+def _dataSegments(NumBits):
+    """
+    Returns the runs of consecutive data bits in the Hamming code of NumBits 
+    data bits, as cached (message bit, code bit, width) triples.  Data bits 
+    fill every code position between two parity bits, so a message can be 
+    scattered into (or gathered out of) a packed code a run at a time.
+
+    """
+    def Builder():
+        Segments = []
+        DataBit = 0
+        Parity = 1
+        while DataBit < NumBits:
+            Width = min(2**Parity - 1, NumBits - DataBit)
+            Segments.append((DataBit, 2**Parity, Width))
+            DataBit = DataBit + Width
+            Parity = Parity + 1
+        return tuple(Segments)
+    return _getCached(('Segments', NumBits), Builder)
+
+def _dataPositions(NumBits):
+    """
+    Returns the positions (starting at 1) of the NumBits data bits in the code - 
+    every position that is not a power of two.
+
+    """
+    Positions = []
+    Position = 3
+    while len(Positions) < NumBits:
+        if Position & (Position - 1) != 0:
+            Positions.append(Position)
+        Position = Position + 1
+    return Positions
+
+def _genMatrixArray(Kind, Size):
+    """
+    Returns the cached G, H or R matrix as a read-only uint8 NumPy array, for 
+    use by the batch (vectorized) functions.
+
+    Parameters
+    ----------
+    Kind : string
+        'G', 'H' or 'R'.
+    Size : integer
+        The argument passed to the matching gen*Matrix function.
+
+    Returns
+    -------
+    Matrix : 2D NumPy array
+        The matrix, with the writeable flag cleared.
+
+    """
+    def Builder():
+        Matrix = _buildMatrixArray(Kind, Size)
+        Matrix.flags.writeable = False
+        return Matrix
+    return _getCached((Kind + 'Array', Size), Builder)
+
+def _buildMatrixArray(Kind, Size):
+    """
+    Builds the G, H or R matrix for _genMatrixArray directly as a uint8 
+    array, bypassing the cache (and the tuple-of-tuples matrices).
+    """
+    if Kind == 'R':
+        NumRows = Size - max(operator.index(Size) - 1, 0).bit_length()
+        Positions = np.array(_dataPositions(NumRows), dtype=np.intp)
+        Matrix = np.zeros((len(Positions), Size), dtype=np.uint8)
+        Rows = np.flatnonzero(Positions <= Size)
+        Matrix[Rows, Positions[Rows] - 1] = 1
+        return Matrix
+    Width, Height = getHMatrixShape(None, Size)
+    if Kind == 'H':
+        #Column j of H is the binary form of position j+1.
+        Positions = np.arange(1, Width + 1)
+        return ((Positions >> np.arange(Height)[:, None]) & 1).astype(np.uint8)
+    if Width == 0:
+        return np.zeros((0, 0), dtype=np.uint8)
+    DataPositions = np.array(_dataPositions(Size), dtype=np.intp)
+    Matrix = np.zeros((Width, Size), dtype=np.uint8)
+    Matrix[DataPositions - 1, np.arange(Size)] = 1
+    for Shift in range(Height):
+        #Parity bit 2^Shift checks every data bit whose position shares its bit.
+        Matrix[2**Shift - 1] = (DataPositions >> Shift) & 1
+    return Matrix
+
+#int.bit_count is only available from Python 3.10 onwards.
+_popcount = getattr(int, 'bit_count', lambda Value: bin(Value).count('1'))
+
+def _parity(Value):
+    """Returns the parity (popcount modulo 2) of a non-negative integer."""
+    return _popcount(Value) & 1
+
+def _genPackedMatrix(Kind, Size, Transposed=False):
+    """
+    Returns the cached G or H matrix (or its transpose) with its rows packed 
+    by GF2.packRows, for the GF(2) products used on large codes.
+    """
+    def Builder():
+        Matrix = _genMatrixArray(Kind, Size)
+        Packed = GF2.packRows(Matrix.T if Transposed else Matrix)
+        Packed.flags.writeable = False
+        return Packed
+    return _getCached((Kind + ('PackedT' if Transposed else 'Packed'), Size), Builder)
+
+def _useGF2(NumBits, NumRows):
+    """Returns True when a batch of NumRows messages of the code of NumBits 
+    data bits is multiplied faster by the GF(2) routines."""
+    return NumBits >= GF2Threshold and NumRows >= GF2RowThreshold
+
+def _multiplyGF2(Left, Kind, NumBits, Out=None):
+    """
+    Multiplies a batch (one message per row) by the transpose of the G or H 
+    matrix with GF2.multiplyPacked, using cached lookup tables unless they 
+    would take more than GF2TableBytes.
+    """
+    Packed = _genPackedMatrix(Kind, NumBits, True)
+    Width = _genMatrixArray(Kind, NumBits).shape[0]
+    Tables = None
+    if 256*(-(-Packed.shape[0] // 8))*Packed.shape[1] <= GF2TableBytes:
+        def Builder():
+            Built = GF2.buildTables(Packed)
+            Built.flags.writeable = False
+            return Built
+        Tables = _getCached((Kind + 'Tables', NumBits), Builder)
+    return GF2.multiplyPacked(Left, Packed, Width, Out=Out, Tables=Tables)
+
+def _bitView(Buffer, Width, Writable=False):
+    """
+    Returns a (rows x Width) uint8 view of a buffer-protocol object (bytes, 
+    bytearray, memoryview, NumPy array, ...) holding one bit per byte, without 
+    copying it.  Output buffers must be writable and contiguous.
+    """
+    Array = Buffer if isinstance(Buffer, np.ndarray) else np.frombuffer(Buffer, dtype=np.uint8)
+    if Array.dtype != np.uint8:
+        raise ValueError("Buffers must hold uint8 (one bit per byte)")
+    if Width == 0 or Array.size % Width != 0:
+        raise ValueError("Buffer size is not a multiple of %d" % Width)
+    if Writable and not (Array.flags.writeable and Array.flags.c_contiguous):
+        raise ValueError("Output buffer must be writable and contiguous")
+    return Array.reshape(-1, Width)
+
+def _dataColumns(MessLength):
+    """
+    Returns a cached table mapping every possible error position (syndrome) 
+    of a received message of the given length to the column of the decoded 
+    message holding that bit, or -1 for parity bits and impossible positions.
+    """
+    def Builder():
+        DataIndex = genDataIndex(MessLength)
+        Columns = np.full(2**math.ceil(math.log2(MessLength + 1)), -1, dtype=np.intp)
+        Columns[DataIndex + 1] = np.arange(len(DataIndex))
+        Columns.flags.writeable = False
+        return Columns
+    return _getCached(('DataColumns', MessLength), Builder)
+
+def clearMatrixCache():
+    """
+    Empties the matrix cache and resets its hit/miss counters.
+
+    Returns
+    -------
+    None.
+
+    """
+    global _MatrixCacheHits, _MatrixCacheMisses
+    with _MatrixCacheLock:
+        _MatrixCache.clear()
+        _MatrixCacheHits = 0
+        _MatrixCacheMisses = 0
+
+def getCodeTables(NumBits):
+    """
+    Collects the (read-only) NumPy tables used by the batch functions for the 
+    Hamming code of NumBits data bits, building any that are not yet cached.  
+    Together with loadCodeTables, this lets one process build the tables and 
+    hand them to others.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The size (in number of bits) of the original message.
+
+    Returns
+    -------
+    Tables : dictionary
+        The tables, keyed by their matrix cache key.
+
+    """
+    Width, Height = getHMatrixShape(None, NumBits)
+    return {('GArray', NumBits): _genMatrixArray('G', NumBits),
+            ('HArray', NumBits): _genMatrixArray('H', NumBits),
+            ('DataIndex', Width): genDataIndex(Width)}
+
+def loadCodeTables(Tables):
+    """
+    Stores tables made by getCodeTables in this process's matrix cache, so the 
+    batch functions use them instead of building their own.
+
+    Parameters
+    ----------
+    Tables : dictionary
+        The tables, keyed by their matrix cache key.
+
+    Returns
+    -------
+    None.
+
+    """
+    for Key, Table in Tables.items():
+        if isinstance(Table, np.ndarray):
+            Table.flags.writeable = False
+        _storeCached(Key, Table)
+
+def getMatrixCacheInfo():
+    """
+    Reports the state of the matrix cache.
+
+    Returns
+    -------
+    Info : dictionary
+        The number of cache hits and misses, the number of codes cached and 
+        the maximum ('hits', 'misses', 'size', 'maxsize'), and the number of 
+        tables held for them ('tables').
+
+    """
+    with _MatrixCacheLock:
+        return {'hits': _MatrixCacheHits, 'misses': _MatrixCacheMisses,
+                'size': len(_MatrixCache), 'maxsize': MatrixCacheSize,
+                'tables': sum(len(Record) for Record in _MatrixCache.values())}
 
 def buildParityBitMatrix(NumBits):
     """
     Constructs the parity and data bit matrix based on the number of bits requested
     by the user.  This matrix is used throughout by other methods to construct 
-    the other matrices used for error detection and correction.
+    the other matrices used for error detection and correction.  Row 0 marks the 
+    parity bits (the powers of two), and column j belongs to row r whenever bit 
+    r-1 of j is set, so each entry is computed directly.
 
     Parameters
     ----------
@@ -46,47 +370,16 @@ def buildParityBitMatrix(NumBits):
         The parity/data bit matrix.
 
     """
-    #First row of Matrix defines parity bits as 1, all else as 0
-    #This row will be unused, except as a 
-    #reference to which bits are parity bits and which not.
     ParityBitMatrix = []
     if NumBits <= 0:
         return ParityBitMatrix
-    #Make the matrix roughly twice the size it needs to be, to handle potential
-    #overflow/overrun.
+    #The table keeps its historical width (roughly twice the code length);
+    #the G, H and R builders no longer read it and use _dataPositions instead.
     NumCols = 2*(math.floor(math.log2(NumBits)) + 2 + NumBits)
     NumRows = math.floor(math.log2(NumBits)) + 3
-    p = 0
-    Row = []
-    for ColIndex in range(NumCols):
-        if 2**p == ColIndex:
-            Row.append(1)
-            p = p + 1
-        else:
-            Row.append(0)
-    ParityBitMatrix.append(Row)
-    #Build remainder of Matrix.  Index 0 will always be 0 and is, again,
-    #unused by future constructions.
-    RowIndex = 1
-    while RowIndex < NumRows:
-        CurrRow = []
-        Ticker = 2**(RowIndex-1)
-        TickerLimit = -(2**(RowIndex-1))
-        j = 0
-        while j < NumCols:
-            if j < Ticker:
-                CurrRow.append(0)
-            elif Ticker > 0:
-                CurrRow.append(1)
-                Ticker = Ticker - 1
-            else:
-                CurrRow.append(0)
-                Ticker = Ticker - 1      
-            if Ticker == TickerLimit:
-                Ticker = 2**(RowIndex-1)
-            j = j + 1
-        ParityBitMatrix.append(CurrRow)
-        RowIndex = RowIndex + 1
+    ParityBitMatrix.append([int(j > 0 and (j & (j-1)) == 0) for j in range(NumCols)])
+    for RowIndex in range(1, NumRows):
+        ParityBitMatrix.append([(j >> (RowIndex-1)) & 1 for j in range(NumCols)])
     return ParityBitMatrix
 
 def calcSyndromeVec(Recvd):
@@ -108,6 +401,13 @@ def calcSyndromeVec(Recvd):
     Syndrome = []
     #Calculate the size of the original message, generate H
     NumBits = len(Recvd) - math.ceil(math.log2(len(Recvd)))
+    if NumBits >= GF2Threshold:
+        #A length that is not a code length (a power of two) is one column 
+        #short of H; the missing bit counts as 0, as in the loop below.
+        Width = getHMatrixShape(None, NumBits)[0]
+        Recvd = np.concatenate((np.asarray(Recvd, dtype=np.uint8),
+                                np.zeros(Width - len(Recvd), dtype=np.uint8)))
+        return GF2.multiplyVector(_genPackedMatrix('H', NumBits), Recvd, Width).tolist()
     HMatrix = genHMatrix(NumBits)
     for i in range(len(HMatrix)):
         Sum = 0
@@ -118,7 +418,139 @@ def calcSyndromeVec(Recvd):
         Syndrome.append(Sum)  
     return Syndrome
 
-def correctErrorInMessage(Message, ErrorBit):
+def calcSyndromeVecBatch(Recvd):
+    """
+    Batch version of calcSyndromeVec - calculates the syndrome vector of every 
+    received message (row) with a single matrix product.
+
+    Parameters
+    ----------
+    Recvd : 2D array
+        The received messages, one per row, as 1s and 0s.
+
+    Returns
+    -------
+    Syndromes : 2D NumPy array (uint8)
+        The syndrome vectors, one per row.
+
+    """
+    Recvd = np.asarray(Recvd, dtype=np.uint8)
+    if Recvd.ndim != 2:
+        raise ValueError("Recvd must be a 2D array, one message per row")
+    NumBits = Recvd.shape[1] - math.ceil(math.log2(Recvd.shape[1]))
+    HMatrix = _genMatrixArray('H', NumBits)
+    if _useGF2(NumBits, Recvd.shape[0]):
+        return _multiplyGF2(Recvd, 'H', NumBits)
+    Syndromes = Recvd @ HMatrix.T
+    Syndromes &= 1
+    return Syndromes
+
+def calcSyndromeVecPacked(Recvd, NumBits):
+    """
+    Packed version of calcSyndromeVec - each syndrome bit is the parity 
+    (popcount) of the received code ANDed with one row mask of the H-matrix.
+
+    Parameters
+    ----------
+    Recvd : integer
+        The received message, packed with packBits.
+    NumBits : integer
+        The size (in number of bits) of the original message.
+
+    Returns
+    -------
+    Syndrome : integer
+        The syndrome vector packed into an integer (bit i is row i), which is 
+        also the position of the bit error.
+
+    """
+    Syndrome = 0
+    for i, Mask in enumerate(genParityMasks(NumBits)):
+        Syndrome = Syndrome | (_parity(Recvd & Mask) << i)
+    return Syndrome
+
+def calcSyndromeSparse(ErrorBits, NumBits):
+    """
+    Calculates the syndrome straight from a sparse transmission error - the 
+    list of flipped bit positions - by adding up the matching columns of the 
+    H-matrix.  The sent code itself has a syndrome of 0, so this is the 
+    syndrome of the received message, without building it or multiplying by 
+    H.  Costs O(e log n) for e errors.
+
+    Parameters
+    ----------
+    ErrorBits : iterable of integers
+        The bit numbers flipped by the transmission, starting at position 1.
+    NumBits : integer
+        The size (in number of bits) of the original message.
+
+    Returns
+    -------
+    Syndrome : 1D array (vector)
+        The syndrome vector, as calcSyndromeVec would give for the received 
+        message.
+
+    """
+    Width, Height = getHMatrixShape(None, NumBits)
+    Syndrome = 0
+    for Bit in ErrorBits:
+        if not 0 < Bit <= Width:
+            raise ValueError("Error position is outside the code")
+        Syndrome = Syndrome ^ Bit
+    return [(Syndrome >> i) & 1 for i in range(Height)]
+
+def calcSyndromeSparseBatch(Rows, ErrorBits, NumCodes):
+    """
+    Batch version of calcSyndromeSparse, for simulating many codes at once.  
+    The transmission errors of all the codes are given as two parallel 
+    arrays, so the cost scales with the number of errors, not with the 
+    number or length of the codes.
+
+    Parameters
+    ----------
+    Rows : 1D array (vector)
+        The code (row) each error belongs to.
+    ErrorBits : 1D array (vector)
+        The flipped bit number of each error, starting at position 1.
+    NumCodes : integer
+        The number of codes.
+
+    Returns
+    -------
+    Syndromes : 1D NumPy array (int64)
+        The syndrome of each code, as an integer (the position of the bit 
+        error, as from translateSynVec).
+
+    """
+    Syndromes = np.zeros(NumCodes, dtype=np.int64)
+    np.bitwise_xor.at(Syndromes, np.asarray(Rows), np.asarray(ErrorBits, dtype=np.int64))
+    return Syndromes
+
+def calcSyndromeXor(Recvd):
+    """
+    Calculates the syndrome without building the H-matrix.  Column j of H is 
+    just the binary form of position j (starting at 1), so the syndrome is the 
+    XOR of the positions of every bit set in the received message.  Runs in 
+    O(n) time and memory, for codes too large to build H for.
+
+    Parameters
+    ----------
+    Recvd : 1D array (vector)
+        The received message, as 1s and 0s.
+
+    Returns
+    -------
+    Syndrome : integer
+        The syndrome, as an integer (bit i is row i of the syndrome vector).  
+        It can be passed straight to translateSynVec.
+
+    """
+    Positions = np.flatnonzero(np.asarray(Recvd)) + 1
+    if Positions.size == 0:
+        return 0
+    return int(np.bitwise_xor.reduce(Positions))
+
+def correctErrorInMessage(Message, ErrorBit, Syndrome=None):
     """
     Given the bit number that is in error and the recieved message, correct (bit-flip) 
     the bit in error.
@@ -129,6 +561,10 @@ def correctErrorInMessage(Message, ErrorBit):
         The recieved message.
     ErrorBit : integer
         The bit number that is in error, starting at position 1.
+    Syndrome : 1D array (vector)
+        Optional syndrome vector of the message (from calcSyndromeVec).  If 
+        given, it is updated in place to stay consistent with the corrected 
+        message.
 
     Returns
     -------
@@ -138,11 +574,128 @@ def correctErrorInMessage(Message, ErrorBit):
     if ErrorBit == 0:
         return
     Message[ErrorBit-1] = Message[ErrorBit-1]^1
+    if Syndrome is not None:
+        for i in range(len(Syndrome)):
+            Syndrome[i] = Syndrome[i] ^ ((ErrorBit >> i) & 1)
     
+def correctErrorInMessageBatch(Messages, ErrorBits):
+    """
+    Batch version of correctErrorInMessage - bit-flips, in place, the bit in 
+    error of every message (row).  Error positions of 0 (no error) or beyond 
+    the end of the message (uncorrectable) are left alone.
+
+    Parameters
+    ----------
+    Messages : 2D NumPy array
+        The received messages, one per row.  Modified in place.
+    ErrorBits : 1D array (vector)
+        The bit number in error for each message, starting at position 1.
+
+    Returns
+    -------
+    Corrected : 1D NumPy array (bool)
+        True for every row that had a bit flipped.
+
+    """
+    ErrorBits = np.asarray(ErrorBits)
+    Corrected = (ErrorBits > 0) & (ErrorBits <= Messages.shape[1])
+    Rows = np.flatnonzero(Corrected)
+    Messages[Rows, ErrorBits[Rows] - 1] ^= 1
+    return Corrected
+
+def correctErrorInMessagePacked(Message, ErrorBit):
+    """
+    Packed version of correctErrorInMessage.  Packed codes are immutable 
+    integers, so the corrected code is returned instead of modified in place.
+
+    Parameters
+    ----------
+    Message : integer
+        The received message, packed with packBits.
+    ErrorBit : integer
+        The bit number that is in error, starting at position 1.
+
+    Returns
+    -------
+    Message : integer
+        The corrected message.
+
+    """
+    if ErrorBit == 0:
+        return Message
+    return Message ^ (1 << (ErrorBit-1))
+
+def decodeBatch(Recvd):
+    """
+    Runs the whole receive side (syndrome, correction and decoding) over many 
+    received messages in one vectorized pass.
+
+    Parameters
+    ----------
+    Recvd : 2D array
+        The received messages, one per row.  If this is a uint8 NumPy array 
+        the bad bits are corrected in place.
+
+    Returns
+    -------
+    Decoded : 2D NumPy array (uint8)
+        The decoded original messages, one per row.
+    Corrected : 1D NumPy array (bool)
+        True for every row in which a bit error was corrected.
+
+    """
+    Recvd = np.asarray(Recvd, dtype=np.uint8)
+    Syndromes = calcSyndromeVecBatch(Recvd)
+    ErrorBits = translateSynVecBatch(Syndromes)
+    Corrected = correctErrorInMessageBatch(Recvd, ErrorBits)
+    Decoded = decodeOriginalMessageBatch(Recvd)
+    return Decoded, Corrected
+
+def decodeInto(Recvd, Out, NumBits, Corrected=None):
+    """
+    Buffer version of decodeBatch - corrects and decodes received messages 
+    straight into a caller-supplied buffer, so a receive loop can reuse the 
+    same buffers for every block.  Recvd is only read (never corrected in 
+    place), and only the small per-message syndromes are allocated.
+
+    Parameters
+    ----------
+    Recvd : buffer (bytes, bytearray, memoryview, NumPy array, ...)
+        The received messages, one bit per byte, one message after another.
+    Out : writable buffer
+        Where the decoded messages are written, NumBits bytes per message.
+    NumBits : integer
+        The size (in number of bits) of the original message.
+    Corrected : writable 1D NumPy array (bool), optional
+        If given, set to True for every message in which a bit error was 
+        corrected.
+
+    Returns
+    -------
+    Out : 2D NumPy array (uint8)
+        A view of Out, one decoded message per row.
+
+    """
+    CodeBits = getHMatrixShape(None, NumBits)[0]
+    Recvd = _bitView(Recvd, CodeBits)
+    Decoded = _bitView(Out, NumBits, Writable=True)
+    if len(Decoded) != len(Recvd):
+        raise ValueError("Out must hold %d messages" % len(Recvd))
+    np.take(Recvd, genDataIndex(CodeBits), axis=1, out=Decoded)
+    ErrorBits = translateSynVecBatch(calcSyndromeVecBatch(Recvd))
+    if Corrected is not None:
+        np.logical_and(ErrorBits > 0, ErrorBits <= CodeBits, out=Corrected)
+    #Errors in parity bits need no change to the decoded message.
+    Columns = _dataColumns(CodeBits)[ErrorBits]
+    Rows = np.flatnonzero(Columns >= 0)
+    Decoded[Rows, Columns[Rows]] ^= 1
+    return Decoded
+
 def decodeOriginalMessage(Message):
     """
     After error correction, decode the recieved Hamming 
-    code to the original message.
+    code to the original message.  Each row of the R-matrix just picks out one 
+    data bit, so the data bits are gathered directly using genDataIndex.
 
     Parameters
     ----------
@@ -155,19 +708,117 @@ def decodeOriginalMessage(Message):
         The decoded original message.
 
     """
-    RMatrix = genRMatrix(len(Message))
-    OMessage = []
-    for i in range(len(RMatrix)):
-        Sum = 0
-        for j in range(len(Message)):
-            Sum = Sum + RMatrix[i][j]*Message[j]
-        OMessage.append(Sum)
+    OMessage = [Message[i] for i in genDataIndex(len(Message)).tolist()]
+    #A length that is not a code length (a power of two) gives the R-matrix 
+    #rows past the end of the message, which decode to 0 as in the product.
+    NumRows = len(Message) - math.ceil(math.log2(len(Message)))
+    return OMessage + [0]*(NumRows - len(OMessage))
+
+def decodeOriginalMessageBatch(Messages):
+    """
+    Batch version of decodeOriginalMessage - decodes every error-corrected 
+    message (row) back to the original message.
+
+    Parameters
+    ----------
+    Messages : 2D array
+        The error-corrected codes, one per row.
+
+    Returns
+    -------
+    OMessages : 2D NumPy array (uint8)
+        The decoded original messages, one per row.
+
+    """
+    Messages = np.asarray(Messages, dtype=np.uint8)
+    if Messages.ndim != 2:
+        raise ValueError("Messages must be a 2D array, one message per row")
+    return Messages[:, genDataIndex(Messages.shape[1])]
+
+def decodeOriginalMessagePacked(Message, NumBits):
+    """
+    Packed version of decodeOriginalMessage - gathers the data bits out of the 
+    packed code a run at a time.
+
+    Parameters
+    ----------
+    Message : integer
+        The error-corrected code, packed with packBits.
+    NumBits : integer
+        The size (in number of bits) of the original message.
+
+    Returns
+    -------
+    OMessage : integer
+        The decoded original message, packed.
+
+    """
+    OMessage = 0
+    for DataBit, CodeBit, Width in _dataSegments(NumBits):
+        OMessage = OMessage | (((Message >> CodeBit) & ((1 << Width) - 1)) << DataBit)
     return OMessage
 
+def encodeInto(Messages, Out, NumBits):
+    """
+    Buffer version of genXMatrixBatch - encodes messages straight into a 
+    caller-supplied buffer, so a send loop can reuse the same buffers for 
+    every block.
+
+    Parameters
+    ----------
+    Messages : buffer (bytes, bytearray, memoryview, NumPy array, ...)
+        The original messages, one bit per byte, one message after another.
+    Out : writable buffer
+        Where the coded messages are written, one after another.
+    NumBits : integer
+        The size (in number of bits) of the original message.
+
+    Returns
+    -------
+    Out : 2D NumPy array (uint8)
+        A view of Out, one coded message per row.
+
+    """
+    Messages = _bitView(Messages, NumBits)
+    XMatrix = _bitView(Out, getHMatrixShape(None, NumBits)[0], Writable=True)
+    if len(XMatrix) != len(Messages):
+        raise ValueError("Out must hold %d messages" % len(Messages))
+    if _useGF2(NumBits, len(Messages)):
+        return _multiplyGF2(Messages, 'G', NumBits, Out=XMatrix)
+    np.matmul(Messages, _genMatrixArray('G', NumBits).T, out=XMatrix)
+    XMatrix &= 1
+    return XMatrix
+
+def genDataIndex(MessLength):
+    """
+    Generates the index (starting at 0) of every data bit in a received 
+    message of the given length - the columns picked out by the R-matrix.  
+    Results are cached per message length.
+
+    Parameters
+    ----------
+    MessLength : integer
+        The length of the recieved message.
+
+    Returns
+    -------
+    DataIndex : 1D NumPy array (intp)
+        The read-only data bit index, so that Message[DataIndex] gives the 
+        same result as multiplying by genRMatrix(MessLength).
+
+    """
+    def Builder():
+        NumBits = MessLength - math.ceil(math.log2(MessLength))
+        DataIndex = np.array([Position - 1 for Position in _dataPositions(NumBits)
+                              if Position <= MessLength], dtype=np.intp)
+        DataIndex.flags.writeable = False
+        return DataIndex
+    return _getCached(('DataIndex', MessLength), Builder)
+
 def genGMatrix(NumBits):
     """
     Generates the G-matrix used to construct the Hamming code from the original 
-    message.
+    message.  Results are cached per message size and returned read-only.
 
     Parameters
     ----------
@@ -177,48 +828,35 @@ def genGMatrix(NumBits):
     Returns
     -------
     GMatrix : 2D array
-        The G-matrix
+        The G-matrix, as a tuple of tuples.
 
     """
-    PBitMatrix = buildParityBitMatrix(NumBits)
+    return _getCached(('G', NumBits), lambda: _freezeMatrix(_buildGMatrix(NumBits)))
+
+def _buildGMatrix(NumBits):
+    """Builds the G-matrix for genGMatrix, bypassing the cache."""
+    DataPositions = _dataPositions(NumBits)
     GMatrix = []
-    if len(PBitMatrix) == 0:
+    if len(DataPositions) == 0:
         return GMatrix
-    PRow = 1
-    Bit = 1
+    Width, Height = getHMatrixShape(None, NumBits)
     IdMatrixCol = 0
-    while IdMatrixCol < NumBits:
-        PCol = 1
-        Row = []
-        if PBitMatrix[0][Bit] == 1:
-            DataBitCount = 0
-            while DataBitCount < NumBits:
-                if PBitMatrix[0][PCol] == 1:
-                    PCol = PCol + 1
-                else:
-                    Row.append(PBitMatrix[PRow][PCol])
-                    DataBitCount = DataBitCount + 1
-                    PCol = PCol + 1
-            PRow = PRow + 1
+    for Position in range(1, Width + 1):
+        if Position & (Position - 1) == 0:
+            #Parity bit: checks every data bit whose position shares its bit.
+            Shift = Position.bit_length() - 1
+            Row = [(DataPosition >> Shift) & 1 for DataPosition in DataPositions]
         else:
-            DataBitCount = 0
-            while DataBitCount < NumBits:
-                if IdMatrixCol == DataBitCount:
-                    Row.append(1)
-                else:
-                    Row.append(0)
-                DataBitCount = DataBitCount + 1
-            
+            Row = [0]*NumBits
+            Row[IdMatrixCol] = 1
             IdMatrixCol = IdMatrixCol + 1
-        
-        Bit = Bit + 1
         GMatrix.append(Row)
-    
     return GMatrix
 
 def genHMatrix(NumBits):
     """
-    Generates the H-matrix; also called the parity-check matrix.
+    Generates the H-matrix; also called the parity-check matrix.  Results are 
+    cached per message size and returned read-only.
 
     Parameters
     ----------
@@ -228,37 +866,32 @@ def genHMatrix(NumBits):
     Returns
     -------
     HMatrix : 2D array
-        The (parity-bit) H-matrix
+        The (parity-bit) H-matrix, as a tuple of tuples.
 
     """
-    PBitMatrix = buildParityBitMatrix(NumBits)
-    HMatrix = []
-    
-    #Special case...
-    if len(PBitMatrix) == 0:
-        return HMatrix
-    
-    NumCols, NumRows = getHMatrixShape(PBitMatrix,NumBits)
-    PRow = 1
-    while PRow < (NumRows + 1):
-        HRow = []
-        PCol = 1
-        while PCol < (NumCols + 1):
-            HRow.append(PBitMatrix[PRow][PCol])
-            PCol = PCol + 1 
-        HMatrix.append(HRow)
-        PRow = PRow + 1
-    return HMatrix
+    return _getCached(('H', NumBits), lambda: _freezeMatrix(_buildHMatrix(NumBits)))
+
+def _buildHMatrix(NumBits):
+    """Builds the H-matrix for genHMatrix, bypassing the cache."""
+    if NumBits <= 0:
+        return []
+    #Column j of H is the binary form of position j+1.
+    NumCols, NumRows = getHMatrixShape(None, NumBits)
+    return [[(Position >> PRow) & 1 for Position in range(1, NumCols + 1)]
+            for PRow in range(NumRows)]
 
 def getHMatrixShape(PBitMatrix, DataBits):
     """
     Helper function that describes the shape (width and height) of the H-matrix, 
-    based on the number of databits in the original message.
+    based on the number of databits in the original message.  The height is the 
+    smallest number of parity bits, r, with 2^r >= DataBits + r + 1, so the shape 
+    is computed directly.
 
     Parameters
     ----------
     PBitMatrix : TYPE 2D array
-        DESCRIPTION.  The table generated at the beginning of the program.
+        DESCRIPTION.  The table generated at the beginning of the program.  No 
+        longer needed; kept so existing callers keep working.
     DataBits : TYPE integer
         DESCRIPTION.  The number of data bits in the original message.
 
@@ -270,18 +903,35 @@ def getHMatrixShape(PBitMatrix, DataBits):
         The height of the new H-matrix.
 
     """
-    Width = 0
-    Height = 0
-    Num = 0
-    while( Num < DataBits):
-        if(PBitMatrix[0][Width+1] == 0):
-            Num = Num + 1
-        else:
-            Height = Height + 1
-        Width = Width + 1
-    return Width, Height
+    DataBits = operator.index(DataBits)
+    if DataBits <= 0:
+        return 0, 0
+    #2^r > DataBits, so the bit length of DataBits is a lower bound for r.
+    Height = DataBits.bit_length()
+    while 2**Height < DataBits + Height + 1:
+        Height = Height + 1
+    return DataBits + Height, Height
 
-def genPossibleTransError(XMatrix):
+def genParityMasks(NumBits):
+    """
+    Generates one packed bit mask per row of the H-matrix, used by the packed 
+    (integer) functions.  Results are cached per message size.
+
+    Parameters
+    ----------
+    NumBits : integer
+        The size (in number of bits) of the original message.
+
+    Returns
+    -------
+    Masks : tuple of integers
+        Mask i has bit j set when genHMatrix(NumBits)[i][j] is 1.
+
+    """
+    return _getCached(('Masks', NumBits),
+                      lambda: tuple(packBits(Row) for Row in genHMatrix(NumBits)))
+
+def genPossibleTransError(XMatrix, Rng=random):
     """
     Randomly generates an error in the sent (coded) message.  Its also possible 
     that it will NOT generate an error at all.
@@ -291,6 +941,10 @@ def genPossibleTransError(XMatrix):
     XMatrix : 2D array
         Technically just a vector, which represents the sent coded 
         message.
+    Rng : random.Random
+        The random number generator to draw from.  Defaults to the global 
+        one in the random module; pass a seeded random.Random for 
+        reproducible (or per-process independent) runs.
 
     Returns
     -------
@@ -299,11 +953,11 @@ def genPossibleTransError(XMatrix):
 
     """
     TransMessage = XMatrix.copy()
-    BitFlip = random.randint(0,len(TransMessage)-1)
+    BitFlip = Rng.randint(0,len(TransMessage)-1)
     TransMessage[BitFlip] = TransMessage[BitFlip] | 1
     return TransMessage
 
-def genRandMessage(NumBits):
+def genRandMessage(NumBits, Rng=random):
     """
     Based on user requested size, generates a random message - made up of 1s and 
     0s.
@@ -312,6 +966,9 @@ def genRandMessage(NumBits):
     ----------
     NumBits : integer
         The number of data bits in the message.
+    Rng : random.Random
+        The random number generator to draw from.  Defaults to the global 
+        one in the random module.
 
     Returns
     -------
@@ -321,13 +978,14 @@ def genRandMessage(NumBits):
     """
     Message = []
     for i in range(NumBits):
-        Message.append(random.randint(0,1))
+        Message.append(Rng.randint(0,1))
     return Message
 
 def genRMatrix(MessLength):
     """
     Generates the r-matrix (vector), which is the received message in the 
-    transmission.
+    transmission.  Results are cached per message length and returned 
+    read-only.
 
     Parameters
     ----------
@@ -337,26 +995,19 @@ def genRMatrix(MessLength):
     Returns
     -------
     RMatrix : 2D array
-        The r-matrix (vector).
+        The r-matrix (vector), as a tuple of tuples.
 
     """
+    return _getCached(('R', MessLength), lambda: _freezeMatrix(_buildRMatrix(MessLength)))
+
+def _buildRMatrix(MessLength):
+    """Builds the r-matrix for genRMatrix, bypassing the cache."""
     NumRows = MessLength - math.ceil(math.log2(MessLength))
-    PBitMatrix = buildParityBitMatrix(NumRows)
     RMatrix = []
-    IdBit = 1
-    for i in range(NumRows):
-        Row = []
-        Bit = 1
-        for j in range(MessLength):
-            if PBitMatrix[0][j+1] == 1:
-                Row.append(0)
-            elif IdBit == Bit:
-                Row.append(1)
-                Bit = Bit + 1
-            else:
-                Row.append(0)
-                Bit = Bit + 1
-        IdBit = IdBit + 1
+    for Position in _dataPositions(NumRows):
+        Row = [0]*MessLength
+        if Position <= MessLength:
+            Row[Position-1] = 1
         RMatrix.append(Row)
     return RMatrix
 
@@ -377,6 +1028,8 @@ def genXMatrix(Message):
 
     """
     XMatrix = []
+    if len(Message) >= GF2Threshold:
+        return GF2.multiplyVector(_genPackedMatrix('G', len(Message)), Message).tolist()
     GMatrix = genGMatrix(len(Message))
     for i in range(len(GMatrix)):
         Sum = 0
@@ -387,6 +1040,82 @@ def genXMatrix(Message):
         XMatrix.append(Sum)    
     return XMatrix
 
+def genXMatrixBatch(Messages):
+    """
+    Batch version of genXMatrix - encodes many messages of the same size with 
+    a single GF(2) matrix product.
+
+    Parameters
+    ----------
+    Messages : 2D array
+        The original messages, one per row, as 1s and 0s.
+
+    Returns
+    -------
+    XMatrix : 2D NumPy array (uint8)
+        The coded messages, one per row.  Row i equals genXMatrix(Messages[i]).
+
+    """
+    Messages = np.asarray(Messages, dtype=np.uint8)
+    if Messages.ndim != 2:
+        raise ValueError("Messages must be a 2D array, one message per row")
+    GMatrix = _genMatrixArray('G', Messages.shape[1])
+    if GMatrix.size == 0:
+        return np.zeros((Messages.shape[0], 0), dtype=np.uint8)
+    if _useGF2(Messages.shape[1], Messages.shape[0]):
+        return _multiplyGF2(Messages, 'G', Messages.shape[1])
+    #uint8 sums wrap modulo 256, which leaves their parity intact.
+    XMatrix = Messages @ GMatrix.T
+    XMatrix &= 1
+    return XMatrix
+
+def genXMatrixPacked(Message, NumBits):
+    """
+    Packed version of genXMatrix - scatters the data bits into the code a run 
+    at a time, then sets each parity bit to the popcount parity of the code 
+    ANDed with its H-matrix row mask.
+
+    Parameters
+    ----------
+    Message : integer
+        The original message, packed with packBits.
+    NumBits : integer
+        The size (in number of bits) of the original message.
+
+    Returns
+    -------
+    XMatrix : integer
+        The packed coded message; unpackBits(XMatrix, n) equals 
+        genXMatrix(unpackBits(Message, NumBits)).
+
+    """
+    XMatrix = 0
+    for DataBit, CodeBit, Width in _dataSegments(NumBits):
+        XMatrix = XMatrix | (((Message >> DataBit) & ((1 << Width) - 1)) << CodeBit)
+    for i, Mask in enumerate(genParityMasks(NumBits)):
+        XMatrix = XMatrix | (_parity(XMatrix & Mask) << (2**i - 1))
+    return XMatrix
+
+def packBits(Bits):
+    """
+    Packs a message of 1s and 0s into a single integer, bit i of the integer 
+    holding element i of the message.  Uses one bit of memory per bit, rather 
+    than one Python integer.
+
+    Parameters
+    ----------
+    Bits : 1D array (vector)
+        The message, as 1s and 0s.
+
+    Returns
+    -------
+    Packed : integer
+        The packed message.
+
+    """
+    Bytes = np.packbits(np.asarray(Bits, dtype=np.uint8), bitorder='little')
+    return int.from_bytes(Bytes.tobytes(), 'little')
+
 def translateSynVec(SynVec):
     """
     Translates the syndrome vector into an index, representing the position 
@@ -394,8 +1123,10 @@ def translateSynVec(SynVec):
 
     Parameters
     ----------
-    SynVec : 1D array (vector)
-        The syndrome vector.
+    SynVec : 1D array (vector) or integer
+        The syndrome vector.  Integer syndromes (from calcSyndromeXor or 
+        calcSyndromeVecPacked) already are the position, and are returned 
+        as-is.
 
     Returns
     -------
@@ -403,9 +1134,87 @@ def translateSynVec(SynVec):
         The position in the tranmistted message where the bit error occurred.
 
     """
+    if isinstance(SynVec, numbers.Integral):
+        return int(SynVec)
     ErrorBit = 0
     for i in range(len(SynVec)):
         ErrorBit = ErrorBit + SynVec[i]*(2**i)
     return ErrorBit
-    
-    
\ No newline at end of file
+
+def translateSynVecBatch(SynVecs):
+    """
+    Batch version of translateSynVec - translates every syndrome vector (row) 
+    into the position of the bit error.
+
+    Parameters
+    ----------
+    SynVecs : 2D array
+        The syndrome vectors, one per row.
+
+    Returns
+    -------
+    ErrorBits : 1D NumPy array (int64)
+        The position of the bit error in each message, 0 meaning no error.
+
+    """
+    SynVecs = np.asarray(SynVecs)
+    Weights = np.left_shift(1, np.arange(SynVecs.shape[1], dtype=np.int64))
+    return SynVecs.astype(np.int64) @ Weights
+
+def unpackBits(Packed, Length):
+    """
+    Unpacks an integer made by packBits back into a message of 1s and 0s, so 
+    it can be used by the list-based functions (and printed by UI.py).
+
+    Parameters
+    ----------
+    Packed : integer
+        The packed message.
+    Length : integer
+        The number of bits in the message.
+
+    Returns
+    -------
+    Bits : 1D array (vector)
+        The message, as a list of 1s and 0s.
+
+    """
+    Bytes = Packed.to_bytes((Length + 7)//8, 'little')
+    return np.unpackbits(np.frombuffer(Bytes, dtype=np.uint8), count=Length,
+                         bitorder='little').tolist()
+
+def updateSyndrome(Syndrome, FlippedBits, MessLength=None):
+    """
+    Incrementally updates a syndrome after some bits of the message were 
+    flipped, without recomputing it from scratch.  Flipping bit j adds column 
+    j of the H-matrix - the binary form of j - to the syndrome, so this costs 
+    O(k log n) for k flipped bits.
+
+    Parameters
+    ----------
+    Syndrome : 1D array (vector) or integer
+        The syndrome of the message before the flips (from calcSyndromeVec, 
+        calcSyndromeXor or calcSyndromeVecPacked).
+    FlippedBits : iterable of integers
+        The bit numbers that were flipped, starting at position 1.
+    MessLength : integer
+        The length of the message, to check the flipped bits against.  By 
+        default a syndrome vector allows any position it can hold, and an 
+        integer syndrome any positive one.
+
+    Returns
+    -------
+    Syndrome : 1D array (vector) or integer
+        The updated syndrome, of the same type as the one given.
+
+    """
+    if MessLength is None and not isinstance(Syndrome, numbers.Integral):
+        MessLength = 2**len(Syndrome) - 1
+    Change = 0
+    for Bit in FlippedBits:
+        if Bit <= 0 or (MessLength is not None and Bit > MessLength):
+            raise ValueError("Flipped bit position is outside the code")
+        Change = Change ^ Bit
+    if isinstance(Syndrome, numbers.Integral):
+        return Syndrome ^ Change
+    return [Syndrome[i] ^ ((Change >> i) & 1) for i in range(len(Syndrome))]